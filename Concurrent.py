@@ -1,4 +1,7 @@
 from itertools import permutations
+from typing import Optional
+
+import numpy as np
 
 
 # XXX: We're not wrapping all set methods, so some methods might return a
@@ -30,3 +33,126 @@ class Concurrent(set):
 
     def difference(self, other):
         return Concurrent(super().dfference(other))
+
+
+class ActivityAlphabet:
+    """Interns activity names into integer codes 0..n-1, once per log."""
+
+    def __init__(self, activities=()):
+        self.codes = {}
+        self.activities = []
+        for activity in activities:
+            self.code(activity)
+
+    def __len__(self):
+        return len(self.activities)
+
+    def code(self, activity):
+        """Returns the code of `activity`, adding it to the alphabet if it is new."""
+
+        code = self.codes.get(activity)
+        if code is None:
+            code = len(self.activities)
+            self.codes[activity] = code
+            self.activities.append(activity)
+        return code
+
+    def encode(self, variant):
+        """Returns the codes of a sequence of activities, -1 for activities not in the alphabet."""
+
+        return np.fromiter(
+            (self.codes.get(activity, -1) for activity in variant),
+            dtype=np.int64,
+            count=len(variant),
+        )
+
+
+class ConcurrencyMatrix:
+    """Compact form of a Concurrent relation: a symmetric boolean matrix over the codes of an ActivityAlphabet.
+    Concurrency of two activities and the concurrent activities of one activity are looked up in constant time
+    and vectorized, respectively."""
+
+    def __init__(self, alphabet: Optional[ActivityAlphabet] = None):
+        self.alphabet = ActivityAlphabet() if alphabet is None else alphabet
+        self.matrix = np.zeros((len(self.alphabet), len(self.alphabet)), dtype=bool)
+
+    @classmethod
+    def from_concurrent(cls, concurrent, alphabet: Optional[ActivityAlphabet] = None):
+        relation = cls(alphabet)
+        # intern all activities first, so that the matrix is allocated once
+        pairs = [tuple(pair) * 2 if len(pair) == 1 else tuple(pair) for pair in concurrent]
+        codes = np.array(
+            [[relation.alphabet.code(item) for item in pair] for pair in pairs], dtype=np.int64
+        ).reshape(-1, 2)
+        relation._grow()
+        relation.matrix[codes[:, 0], codes[:, 1]] = True
+        relation.matrix[codes[:, 1], codes[:, 0]] = True
+        return relation
+
+    def _grow(self):
+        """Extends the matrix to activities added to the alphabet since, which may be shared with other relations."""
+
+        size = len(self.alphabet)
+        if size > len(self.matrix):
+            matrix = np.zeros((size, size), dtype=bool)
+            matrix[: len(self.matrix), : len(self.matrix)] = self.matrix
+            self.matrix = matrix
+
+    def add_pair(self, *concurrent_items):
+        if len(concurrent_items) == 1:
+            # self-concurrent activity
+            concurrent_items = concurrent_items * 2
+        a, b = (self.alphabet.code(item) for item in concurrent_items)
+        self._grow()
+        self.matrix[a, b] = True
+        self.matrix[b, a] = True
+
+    def is_concurrent(self, a, b):
+        code_a = self.alphabet.codes.get(a)
+        code_b = self.alphabet.codes.get(b)
+        if code_a is None or code_b is None:
+            return False
+        self._grow()
+        return bool(self.matrix[code_a, code_b])
+
+    def row(self, activity):
+        """Boolean array over the alphabet, True for the activities concurrent to `activity`."""
+
+        self._grow()
+        code = self.alphabet.codes.get(activity)
+        if code is None:
+            return np.zeros(len(self.matrix), dtype=bool)
+        return self.matrix[code]
+
+    def submatrix(self, variant):
+        """Boolean matrix of concurrent event pairs of a sequence of activities."""
+
+        self._grow()
+        codes = self.alphabet.encode(variant)
+        known = codes >= 0
+        events = np.zeros((len(codes), len(codes)), dtype=bool)
+        events[np.ix_(known, known)] = self.matrix[np.ix_(codes[known], codes[known])]
+        return events
+
+    def _pairs(self):
+        for a, b in zip(*np.nonzero(np.triu(self.matrix))):
+            yield self.alphabet.activities[a], self.alphabet.activities[b]
+
+    def __len__(self):
+        return int(np.count_nonzero(np.triu(self.matrix)))
+
+    def __iter__(self):
+        for a, b in self._pairs():
+            yield frozenset((a, b))
+
+    def to_tuples(self):
+        """Return an iterable of 2-tuples in all allowed, concurrent realizations"""
+        for a, b in self._pairs():
+            if a == b:
+                yield (a, a)
+            else:
+                yield (a, b)
+                yield (b, a)
+
+    def to_concurrent(self):
+        return Concurrent(iter(self))
@@ -1,3 +1,3 @@
-from .cco import cco
+from .cco import cco, sweep
 
-__all__ = ["cco"]
+__all__ = ["cco", "sweep"]
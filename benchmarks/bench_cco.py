@@ -0,0 +1,328 @@
+"""Benchmarks of the cco on seeded synthetic logs, run from the repository root:
+
+    python -m benchmarks.bench_cco run results.json
+    python -m benchmarks.bench_cco compare baseline.json results.json
+"""
+
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Annotated, Optional
+
+import pm4py
+import typer
+
+import cco_concurrency_finders
+import cco_partialorder_handlers
+import cco_preparators
+import cco_stream
+import cco_transformer
+from benchmarks import synthetic
+from cco import cco
+
+app = typer.Typer()
+
+BENCHMARKS = {}
+
+
+def benchmark(**params):
+    """Registers a benchmark for every combination of the given parameter values. The decorated function gets one
+    combination, prepares its input and returns the function to time. The first value of each parameter is used
+    for quick runs."""
+
+    def register(setup):
+        BENCHMARKS[setup.__name__] = (setup, params)
+        return setup
+
+    return register
+
+
+def _param_grid(params, quick):
+    if quick:
+        return [{name: values[0] for name, values in params.items()}]
+    names = list(params)
+    return [dict(zip(names, values)) for values in itertools.product(*params.values())]
+
+
+@contextlib.contextmanager
+def _quiet():
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def _alpha_partial_orders(variants, engine):
+    concurrent = cco_concurrency_finders.DirectlyFollowsIndex().add_variants(variants)
+    if engine == "bitset":
+        create = cco_partialorder_handlers.createPObyactivities_Bitset
+    else:
+        create = cco_partialorder_handlers.createPObyactivities_NxDiGraph
+    return concurrent, create
+
+
+@benchmark(trace_length=[20, 80], n_cases=[200, 1000], block_size=[3, 6])
+def find_alpha_concurrency(trace_length, n_cases, block_size):
+    variants = synthetic.generate_variants(n_cases, trace_length=trace_length, block_size=block_size)
+
+    def run():
+        successors, concurrent = {}, None
+        for var in variants:
+            successors, concurrent = cco_concurrency_finders.findAlphaConcurrency(
+                var, successors, concurrent
+            )
+
+    return run
+
+
+@benchmark(trace_length=[20, 80], n_cases=[200, 1000], block_size=[3, 6])
+def lifecycle_concurrency_finder(trace_length, n_cases, block_size):
+    variants = synthetic.generate_variants(
+        n_cases, lifecycle=True, trace_length=trace_length, block_size=block_size
+    )
+
+    def run():
+        for var in variants:
+            cco_concurrency_finders.LifecycleConcurrencyFinder(var, "_complete", "_start").find()
+
+    return run
+
+
+@benchmark(trace_length=[20, 80], n_cases=[200, 1000], block_size=[3, 6])
+def log_lifecycle_concurrency_finder(trace_length, n_cases, block_size):
+    variants = synthetic.generate_variants(
+        n_cases, lifecycle=True, trace_length=trace_length, block_size=block_size
+    )
+
+    def run():
+        cco_concurrency_finders.LogLifecycleConcurrencyFinder(variants, "_complete", "_start").find()
+
+    return run
+
+
+@benchmark(engine=["networkx", "bitset", "trie"], trace_length=[20, 80], block_size=[3, 6])
+def create_po_by_activities(engine, trace_length, block_size):
+    variants = synthetic.generate_variants(200, trace_length=trace_length, block_size=block_size)
+    concurrent, create = _alpha_partial_orders(variants, engine)
+
+    def run():
+        if engine == "trie":
+            list(cco_partialorder_handlers.createPOsbyactivities_Trie(variants, concurrent))
+            return
+        for var in variants:
+            create(var, concurrent)
+
+    return run
+
+
+@benchmark(engine=["networkx", "bitset"], trace_length=[20, 80], block_size=[3, 6])
+def create_po_by_positions(engine, trace_length, block_size):
+    variants = synthetic.generate_variants(
+        200, lifecycle=True, trace_length=trace_length, block_size=block_size
+    )
+    results = cco_concurrency_finders.LogLifecycleConcurrencyFinder(
+        variants, "_complete", "_start"
+    ).find()
+    if engine == "bitset":
+        create = cco_partialorder_handlers.createPObypositions_Bitset
+    else:
+        create = cco_partialorder_handlers.createPObypositions_NxDiGraph
+
+    def run():
+        for var, result in zip(variants, results):
+            create(var, result["positional_concurrencies"], result["positional_equivalences"])
+
+    return run
+
+
+@benchmark(n_cases=[200, 1000], alphabet_size=[10, 40])
+def check_for_po_isomorphs(n_cases, alphabet_size):
+    variants = synthetic.generate_variants(
+        n_cases, trace_length=20, alphabet_size=alphabet_size, parallel_share=0.8
+    )
+    concurrent, create = _alpha_partial_orders(variants, "networkx")
+    pos = [create(var, concurrent)[1:] for var in variants]
+
+    def run():
+        povariants = cco_partialorder_handlers.POVariantIndex()
+        po_id = 1
+        for partialorder, pograph in pos:
+            pograph.graph.clear()
+            _, po_id, _ = cco_partialorder_handlers.check_for_po_isomorphs(
+                partialorder, po_id, pograph, povariants
+            )
+
+    return run
+
+
+@benchmark(n_cases=[1000, 5000], trace_length=[20, 80])
+def write_po_info(n_cases, trace_length):
+    log = synthetic.generate_log(n_cases, trace_length=trace_length)
+    filog_towrite, _, vars_wlc, caseid_dict, keyword_c, keyword_s = cco_preparators.prepare_log(
+        log, "alpha", "logwise"
+    )
+    vars = pm4py.get_variants(filog_towrite, activity_key="concept:name")
+    with _quiet():
+        partialorders, _, _ = cco_transformer.generate_partial_orders(
+            "alpha", "logwise", vars, vars_wlc, keyword_c, keyword_s, concurrencies_file=os.devnull
+        )
+
+    def run():
+        cco_transformer.write_partial_orders(filog_towrite.copy(), partialorders, caseid_dict)
+
+    return run
+
+
+@benchmark(mode=["alpha", "lifecycle"], scope=["logwise", "tracewise"], n_cases=[500, 2000])
+def cco_end_to_end(mode, scope, n_cases):
+    directory = tempfile.mkdtemp(prefix="cco_benchmark_")
+    infilename = os.path.join(directory, "log.xes")
+    with _quiet():
+        synthetic.write_log(infilename, n_cases, lifecycle=True, trace_length=20)
+
+    def run():
+        cwd = os.getcwd()
+        os.chdir(directory)  # the concurrencies are exported to the working directory
+        try:
+            with _quiet():
+                cco(infilename, os.path.join(directory, "out.xes"), mode, scope, "all", False)
+        finally:
+            os.chdir(cwd)
+
+    return run
+
+
+@benchmark(mode=["alpha", "lifecycle"], scope=["logwise", "tracewise"], open_cases=[50, 500])
+def stream_oracle(mode, scope, open_cases):
+    events = synthetic.generate_events(1000, open_cases, lifecycle=True, trace_length=20)
+
+    def run():
+        oracle = cco_stream.StreamingOracle(mode, scope)
+        for event in events:
+            oracle.process(event)
+        oracle.flush()
+
+    return run
+
+
+@benchmark(command=["help", "stats_only"])
+def cli_startup(command):
+    directory = tempfile.mkdtemp(prefix="cco_benchmark_")
+    args = ["--help"]
+    if command == "stats_only":
+        args = [os.path.join(directory, "log.xes"), os.path.join(directory, "out.xes")]
+        with _quiet():
+            synthetic.write_log(args[0], 50, trace_length=10)
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    def run():
+        subprocess.run(
+            [sys.executable, "-m", "cco", *args], cwd=directory, env=env, capture_output=True, check=True
+        )
+
+    return run
+
+
+def time_benchmark(run, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@app.command()
+def run(
+    outfilename: Annotated[str, typer.Argument(help="Output .json filename")],
+    repeats: Annotated[int, typer.Option(help="Timed runs per benchmark, the minimum is compared")] = 5,
+    quick: Annotated[bool, typer.Option(help="Only run the smallest parameter combination")] = False,
+    only: Annotated[
+        Optional[list[str]], typer.Option("--only", help="Names of the benchmarks to run, all by default")
+    ] = None,
+):
+    """Runs the benchmarks and writes their timings as json."""
+
+    results = []
+    for name, (setup, params) in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        for combination in _param_grid(params, quick):
+            run_benchmark = setup(**combination)
+            with _quiet():
+                run_benchmark()  # warm up
+                times = time_benchmark(run_benchmark, repeats)
+            result = dict(
+                benchmark=name,
+                params=combination,
+                repeats=repeats,
+                min_s=min(times),
+                median_s=statistics.median(times),
+            )
+            results.append(result)
+            print(f"{name} {combination}: {result['min_s']:.4f}s")
+
+    with open(outfilename, "w") as f:
+        json.dump(
+            dict(
+                commit=_commit(),
+                timestamp=datetime.now(timezone.utc).isoformat(),
+                python=platform.python_version(),
+                platform=platform.platform(),
+                results=results,
+            ),
+            f,
+            indent=1,
+        )
+
+
+def _by_key(results):
+    return {(r["benchmark"], json.dumps(r["params"], sort_keys=True)): r for r in results["results"]}
+
+
+@app.command()
+def compare(
+    baseline: Annotated[str, typer.Argument(help="Results .json of the baseline commit")],
+    current: Annotated[str, typer.Argument(help="Results .json to compare")],
+    threshold: Annotated[
+        float, typer.Option(help="Ratio of minimum times above which a benchmark counts as regression")
+    ] = 1.2,
+):
+    """Compares the minimum times of two result files and fails if any benchmark regressed."""
+
+    with open(baseline) as f:
+        old = _by_key(json.load(f))
+    with open(current) as f:
+        new = _by_key(json.load(f))
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key]["min_s"] / old[key]["min_s"]
+        flag = ""
+        if ratio > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key[0]} {key[1]}: {old[key]['min_s']:.4f}s -> {new[key]['min_s']:.4f}s ({ratio:.2f}x){flag}")
+
+    if regressions > 0:
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,147 @@
+import random
+
+import pandas as pd
+import pm4py
+
+
+def generate_model(trace_length, alphabet_size=10, block_size=3, parallel_share=0.5, rng=None):
+    """Sequence of blocks over `trace_length` activity slots. A block is a list of activities, blocks with more
+    than one activity are executed in parallel. Slots are labelled with the alphabet in turn, so activities repeat
+    when the trace is longer than the alphabet."""
+
+    rng = random.Random(0) if rng is None else rng
+    activities = [f"a{i}" for i in range(alphabet_size)]
+    model = []
+    slot = 0
+    while slot < trace_length:
+        size = 1
+        if block_size > 1 and rng.random() < parallel_share:
+            size = min(block_size, trace_length - slot)
+        model.append([activities[(slot + i) % alphabet_size] for i in range(size)])
+        slot += size
+    return model
+
+
+def _interleave_intervals(block, rng):
+    """Random interleaving of the start and complete events of all activities of a parallel block."""
+
+    events = []
+    unstarted = list(block)
+    running = []
+    while unstarted or running:
+        choice = rng.randrange(len(unstarted) + len(running))
+        if choice < len(unstarted):
+            activity = unstarted.pop(choice)
+            running.append(activity)
+            events.append((activity, "start"))
+        else:
+            activity = running.pop(choice - len(unstarted))
+            events.append((activity, "complete"))
+    return events
+
+
+def generate_traces(
+    n_cases,
+    trace_length=10,
+    alphabet_size=10,
+    block_size=3,
+    parallel_share=0.5,
+    lifecycle=False,
+    seed=0,
+):
+    """Traces of a model with parallel blocks, each a list of (activity, transition) events.
+    Without lifecycle, the activities of a parallel block are shuffled and all events are complete events.
+    With lifecycle, every activity has a start and a complete event and the intervals of a parallel block overlap
+    in a random interleaving. The same seed always generates the same traces."""
+
+    rng = random.Random(seed)
+    model = generate_model(trace_length, alphabet_size, block_size, parallel_share, rng)
+    traces = []
+    for _ in range(n_cases):
+        trace = []
+        for block in model:
+            if lifecycle:
+                if len(block) == 1:
+                    trace.extend([(block[0], "start"), (block[0], "complete")])
+                else:
+                    trace.extend(_interleave_intervals(block, rng))
+            else:
+                block = list(block)
+                rng.shuffle(block)
+                trace.extend((activity, "complete") for activity in block)
+        traces.append(trace)
+    return traces
+
+
+def generate_variants(n_cases, lifecycle=False, keyword_c="_complete", keyword_s="_start", **kwargs):
+    """Distinct variants of generated traces as tuples of activities, in the form the concurrency finders expect,
+    i.e. with `keyword_s` and `keyword_c` appended to the activities for lifecycle traces."""
+
+    suffix = {"start": keyword_s, "complete": keyword_c}
+    variants = {}
+    for trace in generate_traces(n_cases, lifecycle=lifecycle, **kwargs):
+        if lifecycle:
+            variant = tuple(activity + suffix[transition] for activity, transition in trace)
+        else:
+            variant = tuple(activity for activity, _ in trace)
+        variants[variant] = None
+    return list(variants)
+
+
+def generate_events(n_cases, open_cases=50, lifecycle=False, seed=0, **kwargs):
+    """Generated traces as a stream of event dicts for the streaming oracle, with up to `open_cases` cases
+    running at the same time and their events interleaved at random. The last event of a case ends it."""
+
+    rng = random.Random(seed)
+    traces = generate_traces(n_cases, lifecycle=lifecycle, seed=seed, **kwargs)
+    events = []
+    running = {}
+    next_case = 0
+    while next_case < len(traces) or running:
+        while len(running) < open_cases and next_case < len(traces):
+            running[next_case] = 0
+            next_case += 1
+        case = rng.choice(list(running))
+        position = running[case]
+        activity, transition = traces[case][position]
+        event = {
+            "case:concept:name": f"case_{case}",
+            "concept:name": activity,
+            "time:timestamp": len(events),
+        }
+        if lifecycle:
+            event["lifecycle:transition"] = transition
+        if position == len(traces[case]) - 1:
+            event["case:end"] = True
+            del running[case]
+        else:
+            running[case] = position + 1
+        events.append(event)
+    return events
+
+
+def generate_log(n_cases, lifecycle=False, **kwargs):
+    """Generated traces as event log DataFrame as pm4py reads it from .xes, one minute between events."""
+
+    rows = []
+    start = pd.Timestamp("2024-01-01", tz="UTC")
+    for case, trace in enumerate(generate_traces(n_cases, lifecycle=lifecycle, **kwargs)):
+        for position, (activity, transition) in enumerate(trace):
+            rows.append(
+                {
+                    "case:concept:name": f"case_{case}",
+                    "concept:name": activity,
+                    "lifecycle:transition": transition,
+                    "time:timestamp": start + pd.Timedelta(minutes=case * 10000 + position),
+                }
+            )
+    log = pd.DataFrame(rows)
+    if not lifecycle:
+        log = log.drop(columns="lifecycle:transition")
+    return log
+
+
+def write_log(filename, n_cases, lifecycle=False, **kwargs):
+    """Writes a generated log as .xes file."""
+
+    pm4py.write_xes(generate_log(n_cases, lifecycle=lifecycle, **kwargs), filename)
@@ -1,13 +1,20 @@
+import sys
 import typer
-import pm4py
-import pandas as pd
+from contextlib import nullcontext
+from copy import deepcopy
 from enum import Enum
+from typing import Annotated, Optional
 
-import cco_transformer
-import cco_preparators
-import cco_writers
+import cco_cache
+import cco_profiling
+
+# The analysis modules load pandas and networkx, and pm4py only where logs are read or exported, which takes
+# seconds. The commands import them, so that the cli answers `--help` or invalid arguments right away.
 
 app = typer.Typer()
+sweep_app = typer.Typer()
+stream_app = typer.Typer()
+serve_app = typer.Typer()
 
 
 class Mode(str, Enum):
@@ -26,10 +33,26 @@ class Keep(str, Enum):
     one_per_po_variant = "one_per_po_variant"
 
 
+class POEngine(str, Enum):
+    networkx = "networkx"
+    bitset = "bitset"
+    trie = "trie"
+
+
+def _check_jobs(jobs):
+    if jobs == 0:
+        raise typer.BadParameter("use a positive number of worker processes, or -1 for all cores")
+    return jobs
+
+
 @app.command()
 def cco(
-    infilename: str = typer.Argument(help="Input .xes filename"),
-    outfilename: str = typer.Argument(help="Output .xes filename"),
+    infilename: str = typer.Argument(
+        help="Input .xes, .parquet or Arrow IPC (.arrow, .feather) filename"
+    ),
+    outfilename: str = typer.Argument(
+        help="Output .xes, .parquet or Arrow IPC (.arrow, .feather) filename"
+    ),
     mode: Mode = typer.Option(
         Mode.alpha,
         help="Algorithm used to detect concurrencies, either `alpha` or `lifecycle`",
@@ -45,12 +68,120 @@ def cco(
     stats_only: bool = typer.Option(
         True, help="If True, only print statistics without generating an output file"
     ),
+    po_engine: Annotated[
+        POEngine,
+        typer.Option(
+            help="Engine used to construct partial orders, either `networkx`, `bitset` or `trie`"
+        ),
+    ] = POEngine.networkx,
+    jobs: Annotated[
+        int,
+        typer.Option(
+            callback=_check_jobs,
+            help="Number of worker processes used to generate partial orders, -1 uses all cores",
+        ),
+    ] = 1,
+    cache_dir: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Directory to cache the parsed log in, reruns on an unchanged input file skip parsing"
+        ),
+    ] = None,
+    cache_size_mb: Annotated[
+        int,
+        typer.Option(
+            help="Size limit of the cache directory, least recently used logs are evicted first"
+        ),
+    ] = 2048,
+    po_cache_size: Annotated[
+        int,
+        typer.Option(
+            help="Number of partial orders memoized by the normal form of their variant in logwise scope, 0 disables memoization"
+        ),
+    ] = 10000,
+    iso_timeout: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Seconds after which a single isomorphism check is given up, the variant gets a provisional po id"
+        ),
+    ] = None,
+    iso_budget: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Total seconds for isomorphism checks, afterwards undecided checks are given up as with --iso-timeout"
+        ),
+    ] = None,
+    iso_recheck_timeout: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Re-check given up isomorphism checks at the end with this many seconds each, merging provisional po ids"
+        ),
+    ] = None,
+    po_canonical_ids: Annotated[
+        bool,
+        typer.Option(
+            help="Write the canonical id of the partially ordered variant of every case as `case:po_canonical_id`, which is the same for isomorphic variants in any log"
+        ),
+    ] = False,
+    coverage: Annotated[
+        Optional[float],
+        typer.Option(
+            min=0.0,
+            max=1.0,
+            help="Only analyse the most frequent variants which together cover this share of the cases",
+        ),
+    ] = None,
+    top_variants: Annotated[
+        Optional[int],
+        typer.Option(min=1, help="Only analyse this many of the most frequent variants"),
+    ] = None,
+    resume: Annotated[
+        Optional[str],
+        typer.Option(
+            help="State file of earlier runs on the same log, only new variants are analysed and the state is updated; created if it does not exist"
+        ),
+    ] = None,
+    case_column: Annotated[
+        Optional[str], typer.Option(help="Column of the case id in a .parquet or Arrow IPC input log")
+    ] = None,
+    activity_column: Annotated[
+        Optional[str], typer.Option(help="Column of the activity in a .parquet or Arrow IPC input log")
+    ] = None,
+    lifecycle_column: Annotated[
+        Optional[str],
+        typer.Option(help="Column of the lifecycle transition in a .parquet or Arrow IPC input log"),
+    ] = None,
+    timestamp_column: Annotated[
+        Optional[str], typer.Option(help="Column of the timestamp in a .parquet or Arrow IPC input log")
+    ] = None,
+    profile_report: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Write wall time, CPU time and memory per stage and per-variant statistics as json to this file"
+        ),
+    ] = None,
+    profile_pstats: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Profile the partial order generation with cProfile and write the pstats to this file"
+        ),
+    ] = None,
+    profile_memory: Annotated[
+        bool,
+        typer.Option(
+            help="Trace allocations with tracemalloc for --profile-report, which slows the run down and inflates its times"
+        ),
+    ] = False,
 ):
     """Transforms the sequentially ordered log from .xes input to a partially ordered log and prints analysis report on console,
     writes an .xes file containing additional partial order information based on the chosen parameters,
     possibly reduces the log to one representative of the same sequential or partial variant.
     """
 
+    import cco_preparators
+    import cco_state
+    import cco_transformer
+
     # TODO: Use exceptions instead of asserts
     # TODO: refactor to use enums
     modes = "alpha", "lifecycle"
@@ -62,70 +193,481 @@ def cco(
 
     assert outfilename is not None or stats_only, "Provide an outfilename!"
 
-    # read log and prepare for analysis and transformation
-    filog_towrite, filog_wlc, vars_wlc, caseid_dict, keyword_c, keyword_s = (
-        cco_preparators.read_log(infilename, mode, scope)
+    profile = (
+        cco_profiling.profiling(profile_report, profile_pstats, trace_memory=profile_memory)
+        if profile_report is not None or profile_pstats is not None
+        else nullcontext()
     )
-    vars = pm4py.get_variants(filog_towrite, activity_key="concept:name")
+    with profile:
+        # read log and prepare for analysis and transformation
+        cache_bytes = cache_size_mb * 1024**2
+        column_mapping = cco_preparators.column_mapping(
+            case_column, activity_column, lifecycle_column, timestamp_column
+        )
+        mapping_key = (tuple(sorted(column_mapping.items())),) if column_mapping else ()
+        if stats_only:
+            # no log is written, so only the variants are extracted while streaming through the file
+            filog_towrite = None
+            with cco_profiling.stage("load_log"):
+                vars, vars_wlc, caseid_dict, keyword_c, keyword_s = cco_cache.load_or_compute(
+                    cache_dir,
+                    infilename,
+                    ("read_log_variants", mode, scope, *mapping_key),
+                    lambda: cco_preparators.read_log_variants(infilename, mode, scope, column_mapping),
+                    cache_bytes,
+                )
+        else:
+            with cco_profiling.stage("load_log"):
+                prepared, vars = cco_cache.load_or_compute(
+                    cache_dir,
+                    infilename,
+                    ("read_log", mode, scope, *mapping_key),
+                    lambda: cco_preparators.read_log_and_variants(
+                        infilename, mode, scope, column_mapping
+                    ),
+                    cache_bytes,
+                )
+            filog_towrite, filog_wlc, vars_wlc, caseid_dict, keyword_c, keyword_s = prepared
+
+        # restrict the analysis and the output log to the most frequent variants
+        omitted_cases = None
+        if coverage is not None or top_variants is not None:
+            with cco_profiling.stage("select_variants"):
+                vars, vars_wlc, caseid_dict, omitted_cases = cco_preparators.select_variants(
+                    mode, scope, vars, vars_wlc, caseid_dict, coverage, top_variants
+                )
+                if filog_towrite is not None:
+                    kept_caseids = [caseid for caseids in caseid_dict.values() for caseid in caseids]
+                    filog_towrite = filog_towrite[
+                        filog_towrite["case:concept:name"].isin(kept_caseids)
+                    ]
 
-    if not stats_only and keep != "all":
-        # reduce log to one representative per sequential trace variant
-        filog_towrite, caseid_dict = cco_preparators.reduce_log_seq_variants(
-            filog_towrite, mode, scope, vars, vars_wlc, caseid_dict
+        state = None
+        if resume is not None:
+            with cco_profiling.stage("load_state"):
+                state = cco_state.AnalysisState.load(resume, mode, scope)
+
+        # analyse concurrency, transform into partial orders, identify isomorphs
+        partialorders, povariants, _ = cco_transformer.generate_partial_orders(
+            mode,
+            scope,
+            vars,
+            vars_wlc,
+            keyword_c,
+            keyword_s,
+            po_engine,
+            jobs,
+            po_cache_size=po_cache_size,
+            iso_timeout=iso_timeout,
+            iso_budget=iso_budget,
+            iso_recheck_timeout=iso_recheck_timeout,
+            state=state,
         )
 
-    # analyse concurrency, transform into partial orders, identify isomorphs, write into log
-    filog_towrite, povariants = cco_transformer.transform(
-        filog_towrite,
-        mode,
-        scope,
-        vars,
-        vars_wlc,
-        stats_only,
-        caseid_dict,
-        keyword_c,
-        keyword_s,
-    )
+        if state is not None:
+            with cco_profiling.stage("save_state"):
+                state.save(resume)
 
-    # analysis report
-    if mode == "lifecycle" and scope == "tracewise":
-        print("Number of sequential variants with start and complete lc info:")
-        print(len(vars_wlc))
-    else:
-        print("Number of sequential variants:")
-        print(len(vars))
+        # analysis report
+        if mode == "lifecycle" and scope == "tracewise":
+            print("Number of sequential variants with start and complete lc info:")
+            print(len(vars_wlc))
+        else:
+            print("Number of sequential variants:")
+            print(len(vars))
+        if omitted_cases is not None:
+            analysed_cases = sum(len(caseids) for caseids in caseid_dict.values())
+            print("Cases omitted by the variant selection:")
+            print(
+                f"{omitted_cases} of {analysed_cases + omitted_cases} "
+                f"({omitted_cases / (analysed_cases + omitted_cases):.1%})"
+            )
 
-    if stats_only:
-        return
+        if stats_only:
+            return
 
-    # reduce log to one representative per partially ordered variant
-    if keep == "one_per_po_variant":
-        filog_towrite = cco_preparators.reduce_log_po_variants(filog_towrite)
+        with cco_profiling.stage("write_log"):
+            cco_transformer.write_partially_ordered_log(
+                filog_towrite,
+                mode,
+                scope,
+                keep,
+                vars,
+                vars_wlc,
+                caseid_dict,
+                partialorders,
+                outfilename,
+                cco_transformer.canonical_ids(povariants) if po_canonical_ids else None,
+                column_mapping,
+            )
 
-    # drop analysis column
-    if mode == "lifecycle" and scope == "tracewise":
-        vars_at_end = pm4py.get_variants(
-            filog_towrite, activity_key="new:activity:identifier"
+
+@sweep_app.command()
+def sweep(
+    infilename: Annotated[
+        str, typer.Argument(help="Input .xes, .parquet or Arrow IPC (.arrow, .feather) filename")
+    ],
+    outprefix: Annotated[
+        str,
+        typer.Argument(
+            help="Prefix of the output files, which are named `<outprefix>_<mode>_<scope>_<keep><extension>`"
+        ),
+    ],
+    modes: Annotated[
+        list[Mode], typer.Option("--mode", help="Modes to run, all by default")
+    ] = list(Mode),
+    scopes: Annotated[
+        list[Scope], typer.Option("--scope", help="Scopes to run, all by default")
+    ] = list(Scope),
+    keeps: Annotated[
+        list[Keep], typer.Option("--keep", help="Reductions to run, all by default")
+    ] = list(Keep),
+    po_engine: Annotated[
+        POEngine,
+        typer.Option(
+            help="Engine used to construct partial orders, either `networkx`, `bitset` or `trie`"
+        ),
+    ] = POEngine.networkx,
+    jobs: Annotated[
+        int,
+        typer.Option(
+            callback=_check_jobs,
+            help="Number of worker processes used to generate partial orders, -1 uses all cores",
+        ),
+    ] = 1,
+    po_cache_size: Annotated[
+        int,
+        typer.Option(
+            help="Number of partial orders memoized by the normal form of their variant in logwise scope, 0 disables memoization"
+        ),
+    ] = 10000,
+    iso_timeout: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Seconds after which a single isomorphism check is given up, the variant gets a provisional po id"
+        ),
+    ] = None,
+    iso_budget: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Total seconds for isomorphism checks, afterwards undecided checks are given up as with --iso-timeout"
+        ),
+    ] = None,
+    iso_recheck_timeout: Annotated[
+        Optional[float],
+        typer.Option(
+            help="Re-check given up isomorphism checks at the end with this many seconds each, merging provisional po ids"
+        ),
+    ] = None,
+    po_canonical_ids: Annotated[
+        bool,
+        typer.Option(
+            help="Write the canonical id of the partially ordered variant of every case as `case:po_canonical_id`, which is the same for isomorphic variants in any log"
+        ),
+    ] = False,
+    extension: Annotated[
+        str,
+        typer.Option(
+            help="Extension of the output files, which determines their format: .xes, .xes.gz, .parquet or .arrow"
+        ),
+    ] = ".xes",
+    case_column: Annotated[
+        Optional[str], typer.Option(help="Column of the case id in a .parquet or Arrow IPC input log")
+    ] = None,
+    activity_column: Annotated[
+        Optional[str], typer.Option(help="Column of the activity in a .parquet or Arrow IPC input log")
+    ] = None,
+    lifecycle_column: Annotated[
+        Optional[str],
+        typer.Option(help="Column of the lifecycle transition in a .parquet or Arrow IPC input log"),
+    ] = None,
+    timestamp_column: Annotated[
+        Optional[str], typer.Option(help="Column of the timestamp in a .parquet or Arrow IPC input log")
+    ] = None,
+    profile_report: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Write wall time, CPU time and memory per stage and per-variant statistics as json to this file"
+        ),
+    ] = None,
+    profile_pstats: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Profile the partial order generation with cProfile and write the pstats to this file"
+        ),
+    ] = None,
+    profile_memory: Annotated[
+        bool,
+        typer.Option(
+            help="Trace allocations with tracemalloc for --profile-report, which slows the run down and inflates its times"
+        ),
+    ] = False,
+):
+    """Runs the cco for all combinations of the given modes, scopes and keeps and writes one output file each.
+    The log is parsed once, lifecycle information is prepared once, and concurrency detection and partial order
+    generation run once per mode and scope and are shared by all keeps. Logwise configurations reuse the partial
+    order of a variant whose concurrent activity pairs agree with an earlier configuration.
+    Returns the names of the written files.
+    """
+
+    import pm4py
+
+    import cco_partialorder_handlers
+    import cco_preparators
+    import cco_transformer
+
+    profile = (
+        cco_profiling.profiling(profile_report, profile_pstats, trace_memory=profile_memory)
+        if profile_report is not None or profile_pstats is not None
+        else nullcontext()
+    )
+    with profile:
+        modes = [Mode(m).value for m in modes]
+        scopes = [Scope(s).value for s in scopes]
+        keeps = [Keep(k).value for k in keeps]
+
+        column_mapping = cco_preparators.column_mapping(
+            case_column, activity_column, lifecycle_column, timestamp_column
         )
-        filog_towrite = filog_towrite.drop(columns="new:activity:identifier")
-    else:
-        vars_at_end = pm4py.get_variants(filog_towrite, activity_key="concept:name")
-
-    # check output and report
-    print("Number of variants contained in the exported log:")
-    print(len(vars_at_end))
-
-    # write xes file
-    filog_towrite.reset_index(inplace=True)
-    filog_towrite["is_part_of_po"] = pd.Series(dtype=bool)
-    # print(filog_towrite["po_successors"])
-    # print(filog_towrite["is_part_of_po"])
-    filog_towrite["is_part_of_po"] = filog_towrite["po_successors"].notna()
-    filog_towrite["po_successors"] = filog_towrite["po_successors"].apply(
-        lambda x: {"value": None, "children": []} if pd.isna(x) else x
+        if not extension.startswith("."):
+            extension = f".{extension}"
+
+        with cco_profiling.stage("read_log"):
+            log = cco_preparators.read_event_log(infilename, column_mapping)
+        lifecycle = None
+        if "lifecycle" in modes:
+            # fail before the outputs of the other modes are written
+            if "lifecycle:transition" not in log.columns:
+                raise ValueError(
+                    "Lifecycle oracle mode is not executable due to missing lifecycle information in log."
+                )
+            with cco_profiling.stage("preprocess_lifecycle"):
+                lifecycle = cco_preparators.preprocess_lifecycle(log)
+
+        po_graphs = cco_partialorder_handlers.POGraphCache()
+        prepared_logs = {}
+        outfilenames = []
+        for mode in modes:
+            for scope in scopes:
+                print(f"*** Configuration: {mode}, {scope} ***")
+                with cco_profiling.stage(f"{mode}_{scope}"):
+                    # the prepared log only depends on the scope for lifecycle mode
+                    prepared_key = (mode, scope if mode == "lifecycle" else None)
+                    if prepared_key not in prepared_logs:
+                        with cco_profiling.stage("prepare_log"):
+                            prepared = cco_preparators.prepare_log(log, mode, scope, lifecycle)
+                            vars = pm4py.get_variants(prepared[0], activity_key="concept:name")
+                        prepared_logs[prepared_key] = prepared, vars
+                    prepared, vars = prepared_logs[prepared_key]
+                    filog_towrite, filog_wlc, vars_wlc, caseid_dict, keyword_c, keyword_s = prepared
+
+                    partialorders, povariants, _ = cco_transformer.generate_partial_orders(
+                        mode,
+                        scope,
+                        vars,
+                        vars_wlc,
+                        keyword_c,
+                        keyword_s,
+                        po_engine,
+                        jobs,
+                        concurrencies_file=f"{outprefix}_{mode}_{scope}_concurrencies.csv",
+                        po_cache_size=po_cache_size,
+                        iso_timeout=iso_timeout,
+                        iso_budget=iso_budget,
+                        iso_recheck_timeout=iso_recheck_timeout,
+                        po_graphs=po_graphs,
+                    )
+
+                    canonical_ids = None
+                    if po_canonical_ids:
+                        canonical_ids = cco_transformer.canonical_ids(povariants)
+
+                    for keep in keeps:
+                        outfilename = f"{outprefix}_{mode}_{scope}_{keep}{extension}"
+                        with cco_profiling.stage(f"write_log_{keep}"):
+                            cco_transformer.write_partially_ordered_log(
+                                filog_towrite.copy(),
+                                mode,
+                                scope,
+                                keep,
+                                vars,
+                                vars_wlc,
+                                deepcopy(caseid_dict),
+                                partialorders,
+                                outfilename,
+                                canonical_ids,
+                                column_mapping,
+                            )
+                        outfilenames.append(outfilename)
+
+    return outfilenames
+
+
+@stream_app.command()
+def stream(
+    infilename: Annotated[
+        str, typer.Argument(help="JSON lines file of events, `-` reads them from stdin")
+    ] = "-",
+    outfilename: Annotated[
+        str, typer.Argument(help="JSON lines file for the results of closed cases, `-` writes them to stdout")
+    ] = "-",
+    mode: Annotated[
+        Mode, typer.Option(help="Algorithm used to detect concurrencies, either `alpha` or `lifecycle`")
+    ] = Mode.alpha,
+    scope: Annotated[
+        Scope, typer.Option(help="Scope of concurrency detection, either `logwise` or `tracewise`")
+    ] = Scope.logwise,
+    case_timeout: Annotated[
+        Optional[float],
+        typer.Option(help="Close cases without events for this many seconds of stream time"),
+    ] = None,
+    max_open_cases: Annotated[
+        int, typer.Option(help="Close the least recently active case when more cases are open")
+    ] = 10000,
+    po_cache_size: Annotated[
+        int, typer.Option(help="Number of partial orders memoized by their variant")
+    ] = 10000,
+    po_engine: Annotated[
+        POEngine,
+        typer.Option(
+            help="Engine used to construct partial orders, either `networkx`, `bitset` or `trie`"
+        ),
+    ] = POEngine.bitset,
+):
+    """Follows concurrency over a stream of events, one JSON object per line with the keys `case:concept:name`,
+    `concept:name` and optionally `lifecycle:transition`, `time:timestamp` and `case:end`.
+    Writes one JSON line per closed case with its po name and the concurrencies added to the relation,
+    and prints the throughput when the stream ends.
+    """
+
+    import cco_stream
+
+    oracle = cco_stream.StreamingOracle(
+        Mode(mode).value,
+        Scope(scope).value,
+        case_timeout,
+        max_open_cases,
+        po_cache_size,
+        POEngine(po_engine).value,
+    )
+    infile = sys.stdin if infilename == "-" else open(infilename)
+    outfile = sys.stdout if outfilename == "-" else open(outfilename, "w")
+    try:
+        stats = cco_stream.run_stream(infile, outfile, oracle)
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    print(
+        f"{stats['events']} events in {stats['elapsed_s']:.2f}s ({stats['events_per_s'] or 0:.0f} events/s), "
+        f"{stats['closed_cases']} closed cases, {stats['po_variants']} partially ordered variants, "
+        f"latency per closed case mean {1000 * (stats['mean_latency_s'] or 0):.2f}ms, "
+        f"max {1000 * stats['max_latency_s']:.2f}ms",
+        file=sys.stderr,
+    )
+    return stats
+
+
+@serve_app.command()
+def serve(
+    host: Annotated[str, typer.Option(help="Address the HTTP server listens on")] = "127.0.0.1",
+    port: Annotated[int, typer.Option(help="Port the HTTP server listens on")] = 8765,
+    socket: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Listen on this Unix socket instead of host and port, a stale socket at the path is replaced"
+        ),
+    ] = None,
+    max_logs: Annotated[
+        int, typer.Option(min=1, help="Number of loaded logs, the least recently used are evicted first")
+    ] = 4,
+    max_memory_mb: Annotated[
+        Optional[int],
+        typer.Option(help="Size limit of the event data of the loaded logs, the least recently used are evicted first"),
+    ] = None,
+    po_engine: Annotated[
+        POEngine,
+        typer.Option(
+            help="Engine used to construct partial orders, either `networkx`, `bitset` or `trie`"
+        ),
+    ] = POEngine.networkx,
+    jobs: Annotated[
+        int,
+        typer.Option(
+            callback=_check_jobs,
+            help="Number of worker processes used to generate partial orders, -1 uses all cores",
+        ),
+    ] = 1,
+    cache_dir: Annotated[
+        Optional[str],
+        typer.Option(
+            help="Directory to cache the parsed logs in, loading an unchanged log again skips parsing"
+        ),
+    ] = None,
+    cache_size_mb: Annotated[
+        int,
+        typer.Option(
+            help="Size limit of the cache directory, least recently used logs are evicted first"
+        ),
+    ] = 2048,
+    case_column: Annotated[
+        Optional[str], typer.Option(help="Column of the case id in a .parquet or Arrow IPC input log")
+    ] = None,
+    activity_column: Annotated[
+        Optional[str], typer.Option(help="Column of the activity in a .parquet or Arrow IPC input log")
+    ] = None,
+    lifecycle_column: Annotated[
+        Optional[str],
+        typer.Option(help="Column of the lifecycle transition in a .parquet or Arrow IPC input log"),
+    ] = None,
+    timestamp_column: Annotated[
+        Optional[str], typer.Option(help="Column of the timestamp in a .parquet or Arrow IPC input log")
+    ] = None,
+    verbose: Annotated[bool, typer.Option(help="Log every request")] = False,
+):
+    """Keeps analysed logs in memory and answers queries over a local JSON API: `POST /logs` loads a log,
+    `GET /case`, `/concurrencies` and `/po_variants` query it and `POST /export` writes its partially ordered log.
+    Logs are loaded on their first query, identified by `path`, `mode` and `scope`; see cco_server.CCOClient.
+    """
+
+    import cco_preparators
+    import cco_server
+
+    store = cco_server.LogStore(
+        max_logs,
+        max_memory_mb,
+        po_engine=POEngine(po_engine).value,
+        jobs=jobs,
+        cache_dir=cache_dir,
+        cache_bytes=cache_size_mb * 1024**2,
+        column_mapping=cco_preparators.column_mapping(
+            case_column, activity_column, lifecycle_column, timestamp_column
+        ),
     )
-    cco_writers.write_xes_and_drop_NaNs(filog_towrite, outfilename)
+    server = cco_server.make_server(store, host, port, socket, verbose)
+    print(f"cco serve listening on {socket or f'http://{host}:{server.server_port}'}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+SUBCOMMANDS = {"sweep": sweep_app, "stream": stream_app, "serve": serve_app}
+
+
+def main(args=None):
+    """Runs the cco command, or the subcommand given as first argument, e.g. `python -m cco sweep ...`."""
+
+    args = sys.argv[1:] if args is None else args
+    if len(args) > 0 and args[0] in SUBCOMMANDS:
+        SUBCOMMANDS[args[0]](args=args[1:], prog_name=f"cco {args[0]}")
+    else:
+        app(args=args)
 
 
 if __name__ == "__main__":
-    app()
+    main()
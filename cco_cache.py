@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+MANIFEST = "manifest.json"
+LOCK = "manifest.lock"
+# version of the cached results, increased whenever the prepared logs or variants change, so that entries
+# written by an older cco are not used
+CACHE_VERSION = 1
+
+
+def _plain(part):
+    """Enum members are stored by value, so keys do not depend on how the cco was called."""
+
+    return getattr(part, "value", part)
+
+
+def file_hash(filename, blocksize=1 << 20):
+    """sha256 of the file content, read in blocks."""
+
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(blocksize), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LogCache:
+    """On-disk cache for results derived from an input log, e.g. the prepared log and its variants.
+
+    Entries are pickled into `cache_dir` and described in a json manifest. An entry is keyed by the input
+    file's path and the given key parts (e.g. mode and scope) and is valid as long as the file has the same
+    size and mtime, or the same content hash if only its mtime changed, and was written with the current
+    CACHE_VERSION. The least recently used entries are evicted once the cache grows beyond `max_bytes`.
+    Several processes can share the cache: the manifest is read, modified and written under a file lock.
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        """Locks the cache directory and re-reads the manifest, which is written back at the end."""
+
+        with open(os.path.join(self.cache_dir, LOCK), "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # released when the lock file is closed
+            self.manifest = self._read_manifest()
+            yield
+            self._write_manifest()
+
+    def _write_manifest(self):
+        path = os.path.join(self.cache_dir, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+    def _entry_id(self, infilename, key_parts):
+        key = json.dumps([os.path.abspath(infilename)] + [_plain(p) for p in key_parts])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _is_valid(self, entry, infilename):
+        if entry.get("version") != CACHE_VERSION:
+            return False
+        stat = os.stat(infilename)
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns != entry["mtime_ns"]:
+            # touched, but maybe not changed
+            if file_hash(infilename) != entry["sha256"]:
+                return False
+            entry["mtime_ns"] = stat.st_mtime_ns
+        return os.path.exists(os.path.join(self.cache_dir, entry["file"]))
+
+    def _remove(self, entry_id):
+        entry = self.manifest.pop(entry_id)
+        try:
+            os.remove(os.path.join(self.cache_dir, entry["file"]))
+        except FileNotFoundError:
+            pass
+
+    def load(self, infilename, key_parts):
+        """Returns (True, value) for a valid entry, (False, None) otherwise. Invalid entries are removed."""
+
+        entry_id = self._entry_id(infilename, key_parts)
+        with self._locked():
+            entry = self.manifest.get(entry_id)
+            if entry is None:
+                return False, None
+            if not self._is_valid(entry, infilename):
+                self._remove(entry_id)
+                return False, None
+            entry["last_used"] = time.time()
+
+        try:
+            with open(os.path.join(self.cache_dir, entry["file"]), "rb") as f:
+                return True, pickle.load(f)
+        except FileNotFoundError:  # evicted by another process meanwhile
+            return False, None
+
+    def store(self, infilename, key_parts, value):
+        entry_id = self._entry_id(infilename, key_parts)
+        stat = os.stat(infilename)
+        filename = entry_id + ".pkl"
+        path = os.path.join(self.cache_dir, filename)
+        # written under a unique name first, other processes and threads may store the same entry
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        sha256 = file_hash(infilename)
+
+        with self._locked():
+            os.replace(f.name, path)
+            self.manifest[entry_id] = dict(
+                path=os.path.abspath(infilename),
+                key=[_plain(p) for p in key_parts],
+                version=CACHE_VERSION,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                sha256=sha256,
+                file=filename,
+                bytes=os.path.getsize(path),
+                last_used=time.time(),
+            )
+            self._evict(keep=entry_id)
+
+    def _evict(self, keep=None):
+        """Removes least recently used entries until the cache fits into max_bytes."""
+
+        total = sum(entry["bytes"] for entry in self.manifest.values())
+        by_age = sorted(self.manifest, key=lambda e: self.manifest[e]["last_used"])
+        for entry_id in by_age:
+            if total <= self.max_bytes:
+                break
+            if entry_id == keep:
+                continue
+            total -= self.manifest[entry_id]["bytes"]
+            self._remove(entry_id)
+
+    def clear(self):
+        with self._locked():
+            for entry_id in list(self.manifest):
+                self._remove(entry_id)
+
+
+def load_or_compute(cache_dir, infilename, key_parts, compute, max_bytes=2 * 1024**3):
+    """Returns the cached result of `compute()` for this input file and key, computing and storing it on a miss.
+    Without a `cache_dir`, `compute()` is always called."""
+
+    if cache_dir is None:
+        return compute()
+
+    cache = LogCache(cache_dir, max_bytes)
+    hit, value = cache.load(infilename, key_parts)
+    if not hit:
+        value = compute()
+        cache.store(infilename, key_parts, value)
+    return value
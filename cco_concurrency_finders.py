@@ -1,5 +1,8 @@
 from typing import Optional
-from Concurrent import Concurrent
+
+import numpy as np
+
+from Concurrent import ActivityAlphabet, Concurrent
 
 from warnings import warn
 
@@ -11,10 +14,18 @@ def findAlphaConcurrency(
 ):
     """Analyses if activity pairs occur in both orders and are thus to be considered concurrent (on trace or log level).
     Here, the concurrency is stored based on name of activity only, not on positions in trace i.e. instances of activites.
+    Only directly-follows pairs which are new to `successorlist` are checked against their reverse, so
+    `concurrencies` has to contain the concurrencies of the pairs already in `successorlist`.
     """
 
     if concurrencies is None:
         concurrencies = Concurrent()
+        if successorlist:
+            # concurrencies of the given successors are unknown
+            for k, successors_of_k in successorlist.items():
+                for s in successors_of_k:
+                    if k != s and k in successorlist.get(s, ()):
+                        concurrencies.add_pair(k, s)
     if successorlist is None:
         successorlist = dict()
 
@@ -23,22 +34,108 @@ def findAlphaConcurrency(
         if previous in successorlist:
             if activity not in successorlist[previous]:
                 successorlist[previous].append(activity)
+                # if k occurs as successor of s and v.v., they are concurrent
+                if previous != activity and previous in successorlist.get(activity, ()):
+                    concurrencies.add_pair(previous, activity)
         else:
             successorlist[previous] = [activity]
+            if previous != activity and previous in successorlist.get(activity, ()):
+                concurrencies.add_pair(previous, activity)
         previous = activity
 
-    # if k occurs as successor of s and v.v., they are concurrent
-    for k, successors_of_k in successorlist.items():
-        for s in successors_of_k:
-            if k == s:
-                continue
-            if s in successorlist:
-                successors_of_s = successorlist[s]
-                if k in successors_of_s:
-                    concurrencies.add_pair(k, s)
     return successorlist, concurrencies
 
 
+class DirectlyFollowsIndex:
+    """Incremental directly-follows relation of a log for logwise alpha concurrency detection.
+    Every new directly-follows pair is only checked against its reverse, so detecting the concurrencies
+    of a whole log takes time linear in its length."""
+
+    def __init__(self):
+        self.directly_follows = set()
+        self.concurrencies = Concurrent()
+
+    def add_variant(self, variant):
+        """Adds the directly-follows pairs of one variant and returns all concurrencies found so far."""
+
+        directly_follows = self.directly_follows
+        for pair in zip(variant, variant[1:]):
+            if pair in directly_follows:
+                continue
+            directly_follows.add(pair)
+            a, b = pair
+            if a != b and (b, a) in directly_follows:
+                self.concurrencies.add_pair(a, b)
+        return self.concurrencies
+
+    def add_directly_follows(self, a, b):
+        """Adds a single directly-follows pair, e.g. of an event stream, and returns the concurrency it completes,
+        None if it completes none."""
+
+        pair = (a, b)
+        if pair in self.directly_follows:
+            return None
+        self.directly_follows.add(pair)
+        if a != b and (b, a) in self.directly_follows:
+            concurrency = frozenset(pair)
+            self.concurrencies.add(concurrency)
+            return concurrency
+        return None
+
+    def add_variants(self, variants):
+        """Adds all variants at once and returns the concurrencies."""
+
+        for variant in variants:
+            self.add_variant(variant)
+        return self.concurrencies
+
+    def successors(self):
+        """Directly-follows relation as successor lists per activity, like findAlphaConcurrency returns it."""
+
+        successorlist = {}
+        for a, b in self.directly_follows:
+            successorlist.setdefault(a, []).append(b)
+        return successorlist
+
+
+def findAlphaConcurrencyByPrefix(trie):
+    """Tracewise alpha concurrencies of all variants of a PrefixTrie, as findAlphaConcurrency finds them for each
+    variant. Directly-follows pairs and concurrencies are extended along the trie and taken back when leaving a
+    node, so a prefix shared by several variants is only analysed once."""
+
+    ends = set(trie.ends)
+    directly_follows = set()
+    concurrent = Concurrent()
+    added = {}
+    concurrencies_at = {0: Concurrent()}
+
+    def enter(node):
+        parent = trie.parent[node]
+        pair_added = concurrency_added = None
+        if parent > 0:
+            pair = (trie.activity[parent], trie.activity[node])
+            if pair not in directly_follows:
+                directly_follows.add(pair)
+                pair_added = pair
+                a, b = pair
+                if a != b and (b, a) in directly_follows and frozenset(pair) not in concurrent:
+                    concurrency_added = frozenset(pair)
+                    concurrent.add(concurrency_added)
+        added[node] = pair_added, concurrency_added
+        if node in ends:
+            concurrencies_at[node] = Concurrent(concurrent)
+
+    def leave(node):
+        pair_added, concurrency_added = added.pop(node)
+        if pair_added is not None:
+            directly_follows.discard(pair_added)
+        if concurrency_added is not None:
+            concurrent.discard(concurrency_added)
+
+    trie.walk(enter, leave)
+    return [concurrencies_at[end] for end in trie.ends]
+
+
 class LifecycleConcurrencyFinder:
     """Analyses if instances of activities with lifecyle information overlap. All activities which occur
     between start and complete of an activity instance are considered concurrent to this activity.
@@ -153,3 +250,211 @@ class LifecycleConcurrencyFinder:
             concurrency = set()
 
         return concurrency, pos_concurrency, stopping_act_idx
+
+
+class IncrementalLifecycleConcurrencyFinder:
+    """Same analysis as LifecycleConcurrencyFinder for a trace which grows one event at a time, e.g. in an event
+    stream. Every start event opens an interval which collects the following events until its complete event
+    arrives; then the collected events become concurrent to the activity. The result of `find` is available at
+    any time and equals LifecycleConcurrencyFinder(trace).find() for the events added so far."""
+
+    def __init__(self, keyword_complete, keyword_start):
+        self._keyword_complete = keyword_complete
+        self._keyword_start = keyword_start
+        self.length = 0
+        self._open = []  # start position, base name, stopping activity and following positions per open interval
+        self._base_names = []
+        self.concurrencies = Concurrent()
+        self.positional_concurrencies = {}
+        self.positional_equivalences = {}
+
+    def _get_base_name(self, activity):
+        if activity.endswith(self._keyword_complete):
+            return activity.removesuffix(self._keyword_complete)
+        elif activity.endswith(self._keyword_start):
+            return activity.removesuffix(self._keyword_start)
+        raise ValueError(
+            f"Lifecycle-activities have to end in either `{self._keyword_start}` or "
+            f"`{self._keyword_complete}`, but `{activity}` doesn't!"
+        )
+
+    def add(self, activity):
+        """Adds the next event of the trace and closes the intervals it completes."""
+
+        position = self.length
+        self.length += 1
+        base_name = self._get_base_name(activity)
+        self._base_names.append(base_name)
+
+        still_open = []
+        for interval in self._open:
+            start, start_name, stopping_activity, following = interval
+            if activity != stopping_activity:
+                following.append(position)
+                still_open.append(interval)
+                continue
+            for f in following:
+                self.concurrencies.add_pair(start_name, self._base_names[f])
+            if len(following) > 0:
+                concurrent_positions = self.positional_concurrencies.setdefault(position, [])
+                concurrent_positions.extend(
+                    f for f in following if f not in concurrent_positions
+                )
+            self.positional_equivalences[start] = position
+        self._open = still_open
+
+        if activity.endswith(self._keyword_start):
+            stopping_activity = activity.replace(self._keyword_start, self._keyword_complete)
+            self._open.append((position, base_name, stopping_activity, []))
+
+    def find(self):
+        positional_concurrencies = Concurrent()
+        for main, concurrents in self.positional_concurrencies.items():
+            for c in concurrents:
+                positional_concurrencies.add_pair(main, c)
+
+        return dict(
+            concurrencies=Concurrent(self.concurrencies),
+            positional_concurrencies=positional_concurrencies,
+            positional_equivalences=dict(sorted(self.positional_equivalences.items())),
+        )
+
+
+class LogLifecycleConcurrencyFinder:
+    """Same analysis as LifecycleConcurrencyFinder, for all variants of a log at once.
+
+    The variants are concatenated into one array of activity codes. Every start event is paired with the
+    first matching complete event after it in its trace by a binary search over the events sorted by
+    activity, and the events in between are enumerated with numpy instead of walking the trace in Python.
+    """
+
+    def __init__(self, variants, keyword_complete, keyword_start):
+        self.variants = list(variants)
+        self._keyword_complete = keyword_complete
+        self._keyword_start = keyword_start
+
+        self.alphabet = ActivityAlphabet()
+        lengths = [len(var) for var in self.variants]
+        self.codes = np.fromiter(
+            (self.alphabet.code(a) for var in self.variants for a in var),
+            dtype=np.int64,
+            count=sum(lengths),
+        )
+        self.trace = np.repeat(np.arange(len(self.variants)), lengths)
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)))
+
+        self.base_names = ActivityAlphabet()
+        self.base_code = np.array(
+            [self._base_code(a) for a in self.alphabet.activities], dtype=np.int64
+        )
+        self.stop_code = np.array(
+            [self._stop_code(a) for a in self.alphabet.activities], dtype=np.int64
+        )
+        self._intervals = None
+
+    def _base_code(self, activity):
+        if activity.endswith(self._keyword_complete):
+            return self.base_names.code(activity.removesuffix(self._keyword_complete))
+        elif activity.endswith(self._keyword_start):
+            return self.base_names.code(activity.removesuffix(self._keyword_start))
+        return -1
+
+    def _stop_code(self, activity):
+        if not activity.endswith(self._keyword_start):
+            return -1
+        stopping_activity_name = activity.replace(self._keyword_start, self._keyword_complete)
+        return self.alphabet.codes.get(stopping_activity_name, -1)
+
+    def intervals(self):
+        """Event indices of all start events with a matching complete event and of those complete events."""
+
+        if self._intervals is None:
+            n = len(self.codes)
+            starts = np.flatnonzero(self.stop_code[self.codes] >= 0)
+            stop_codes = self.stop_code[self.codes[starts]]
+
+            # events sorted by activity, then by position in the log
+            events = np.sort(self.codes * n + np.arange(n))
+            found = np.searchsorted(events, stop_codes * n + starts, side="right")
+            candidates = events[np.minimum(found, n - 1)]
+            stops = candidates % n
+            closed = (
+                (found < n)
+                & (candidates // n == stop_codes)
+                & (self.trace[stops] == self.trace[starts])
+            )
+            self._intervals = starts[closed], stops[closed]
+        return self._intervals
+
+    @staticmethod
+    def _between(starts, stops):
+        """Repeats every start once per event strictly between it and its stop, and enumerates those events."""
+
+        counts = stops - starts - 1
+        repeated = np.repeat(starts, counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        return repeated, repeated + 1 + np.arange(counts.sum()) - first
+
+    def _concurrent_name_pairs(self):
+        starts, stops = self.intervals()
+        repeated, between = self._between(starts, stops)
+        a = self.base_code[self.codes[repeated]]
+        b = self.base_code[self.codes[between]]
+        if (b < 0).any():
+            activity = self.alphabet.activities[self.codes[between[np.argmax(b < 0)]]]
+            raise ValueError(
+                f"Lifecycle-activities have to end in either `{self._keyword_start}` or "
+                f"`{self._keyword_complete}`, but this one (`{activity}` doesn't!"
+            )
+        return self.trace[repeated], np.minimum(a, b), np.maximum(a, b)
+
+    def _to_concurrent(self, low, high):
+        names = self.base_names.activities
+        return Concurrent(frozenset((names[a], names[b])) for a, b in zip(low, high))
+
+    def concurrencies(self):
+        """Union of the activity level concurrencies of all variants, as needed for logwise use."""
+
+        _, low, high = self._concurrent_name_pairs()
+        size = len(self.base_names) + 1
+        pairs = np.unique(low * size + high)
+        return self._to_concurrent(pairs // size, pairs % size)
+
+    def find(self):
+        """Returns the result of LifecycleConcurrencyFinder.find for every variant, in order."""
+
+        size = len(self.base_names) + 1
+        trace, low, high = self._concurrent_name_pairs()
+        pairs = np.unique((trace * size + low) * size + high)
+        pair_trace = pairs // (size * size)
+        pair_low, pair_high = (pairs // size) % size, pairs % size
+
+        starts, stops = self.intervals()
+        # the positional concurrencies of a complete event are the events after its first start
+        stops_once, first = np.unique(stops, return_index=True)
+        repeated, between = self._between(starts[first], stops_once)
+        stop_of = np.repeat(stops_once, stops_once - starts[first] - 1)
+
+        bounds = np.arange(len(self.variants) + 1)
+        pair_bounds = np.searchsorted(pair_trace, bounds)
+        pos_bounds = np.searchsorted(self.trace[repeated], bounds)
+        eq_bounds = np.searchsorted(self.trace[starts], bounds)
+
+        results = []
+        for t, offset in enumerate(self.offsets[:-1].tolist()):
+            p = slice(pair_bounds[t], pair_bounds[t + 1])
+            q = slice(pos_bounds[t], pos_bounds[t + 1])
+            r = slice(eq_bounds[t], eq_bounds[t + 1])
+            positional = Concurrent(
+                frozenset((main, c))
+                for main, c in zip((stop_of[q] - offset).tolist(), (between[q] - offset).tolist())
+            )
+            equivalences = dict(zip((starts[r] - offset).tolist(), (stops[r] - offset).tolist()))
+            results.append(
+                dict(
+                    concurrencies=self._to_concurrent(pair_low[p], pair_high[p]),
+                    positional_concurrencies=positional,
+                    positional_equivalences=equivalences,
+                )
+            )
+        return results
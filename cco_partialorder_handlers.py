@@ -1,7 +1,17 @@
+import hashlib
+import heapq
+import json
+import time
+from collections import Counter, OrderedDict
+
 import networkx as nx
+import numpy as np
 import networkx.algorithms.isomorphism as iso
+from func_timeout import FunctionTimedOut, func_timeout
 
-from Concurrent import Concurrent
+import cco_profiling
+from cco_prefix_trie import PrefixTrie
+from Concurrent import ActivityAlphabet, Concurrent, ConcurrencyMatrix
 
 
 def convert_seq_to_digraph(var):
@@ -20,7 +30,7 @@ def convert_seq_to_digraph(var):
     return seq
 
 
-def createPObyactivities_NxDiGraph(var, concurrent: Concurrent):
+def createPObyactivities_NxDiGraph(var, concurrent: Concurrent | ConcurrencyMatrix):
     """Transforms 'sequential' nxDiGraph to partially ordered nxDiGraph using name (label) based concurrency information."""
 
     potracesuccessor = {}
@@ -31,9 +41,13 @@ def createPObyactivities_NxDiGraph(var, concurrent: Concurrent):
 
     rlist = []
 
+    nodes_by_activity = {}
+    for x, activity in tc.nodes(data="activity"):
+        nodes_by_activity.setdefault(activity, []).append(x)
+
     for c1, c2 in concurrent.to_tuples():
-        nodes1 = [x for x, y in tc.nodes(data=True) if y["activity"] == c1]
-        nodes2 = [x for x, y in tc.nodes(data=True) if y["activity"] == c2]
+        nodes1 = nodes_by_activity.get(c1, [])
+        nodes2 = nodes_by_activity.get(c2, [])
         for n1 in nodes1:
             for n2 in nodes2:
                 rlist.append((n1, n2))
@@ -87,13 +101,540 @@ def createPObypositions_NxDiGraph(var, pos_concurrent: Concurrent, equivalents):
     return potracenachfolger, porel, po
 
 
+def _sequential_order(var):
+    """Boolean matrix of the total order of a sequential trace, i.e. its transitive closure."""
+
+    return np.triu(np.ones((len(var), len(var)), dtype=bool), k=1)
+
+
+def _transitive_reduction_bitset(order, nodes):
+    """Computes the successors of `nodes` in the transitive reduction of the DAG given by the boolean
+    matrix `order`, whose edges all point from lower to higher positions. Descendants are kept as integer
+    bitsets, so only edges of the reduction are visited."""
+
+    packed = np.packbits(order, axis=1, bitorder="little")
+    descendants = {}
+    successors = {}
+    for i in reversed(nodes):
+        remaining = int.from_bytes(packed[i].tobytes(), "little")
+        reached = 0
+        successors[i] = []
+        while remaining:
+            lowest = remaining & -remaining
+            j = lowest.bit_length() - 1
+            successors[i].append(j)
+            reached |= lowest | descendants[j]
+            remaining &= ~reached
+        descendants[i] = reached
+
+    return {i: successors[i] for i in nodes}
+
+
+def _po_from_successors(var, successors):
+    """Builds the partially ordered nxDiGraph and the label relation from a successor map."""
+
+    po = nx.DiGraph()
+    po.add_nodes_from((node, {"activity": var[node]}) for node in successors)
+    po.add_edges_from((u, v) for u, succ in successors.items() for v in succ)
+    porel = [(var[u], var[v]) for u, succ in successors.items() for v in succ]
+    return porel, po
+
+
+def createPObyactivities_Bitset(var, concurrent: Concurrent | ConcurrencyMatrix):
+    """Same as createPObyactivities_NxDiGraph, but removes concurrent pairs with a mask over label codes and
+    computes the transitive reduction on bitsets. Only the reduced partial order is built as nxDiGraph.
+    Successor lists are sorted by position."""
+
+    if isinstance(concurrent, ConcurrencyMatrix):
+        concurrent_events = concurrent.submatrix(var)
+    else:
+        concurrent_events = ConcurrencyMatrix.from_concurrent(
+            concurrent, ActivityAlphabet(var)
+        ).submatrix(var)
+
+    order = _sequential_order(var) & ~concurrent_events
+
+    potracesuccessor = _transitive_reduction_bitset(order, range(len(var)))
+    porel, po = _po_from_successors(var, potracesuccessor)
+
+    return potracesuccessor, porel, po
+
+
+def createPOsbyactivities_Trie(variants, concurrent: Concurrent | ConcurrencyMatrix):
+    """Same partial orders as createPObyactivities_Bitset for all `variants` at once, yielded in their order.
+
+    The variants are arranged in a PrefixTrie. As all orderings point forward, the partial order of a prefix is
+    the partial order of the variant restricted to the prefix, so the ancestors (as bitset over positions) and the
+    immediate predecessors of an event are computed once per trie node and shared by all variants with that prefix.
+    Of an activity which is not concurrent to itself, only the last occurrence can be an immediate predecessor.
+    """
+
+    if not isinstance(concurrent, ConcurrencyMatrix):
+        concurrent = ConcurrencyMatrix.from_concurrent(concurrent)
+    concurrent_to = {}
+
+    def concurrent_activities(activity):
+        if activity not in concurrent_to:
+            alphabet = concurrent.alphabet
+            concurrent_to[activity] = {
+                alphabet.activities[code] for code in np.flatnonzero(concurrent.row(activity))
+            }
+        return concurrent_to[activity]
+
+    trie = PrefixTrie(variants)
+    ancestors = [0] * (len(trie) + 1)
+    predecessors = [None] * (len(trie) + 1)
+    path = []
+    occurrences = {}  # positions of every activity in the current prefix
+
+    def enter(node):
+        activity = trie.activity[node]
+        concurrent_here = concurrent_activities(activity)
+        dependent = []
+        for other, positions in occurrences.items():
+            if other in concurrent_here:
+                continue
+            if other in concurrent_activities(other):
+                dependent.extend(positions)
+            else:  # earlier occurrences precede the last one
+                dependent.append(positions[-1])
+
+        covered = 0
+        for i in dependent:
+            covered |= ancestors[path[i]]
+        reached = covered
+        for i in dependent:
+            reached |= 1 << i
+        ancestors[node] = reached
+        predecessors[node] = sorted(i for i in dependent if not covered >> i & 1)
+
+        occurrences.setdefault(activity, []).append(len(path))
+        path.append(node)
+
+    def leave(node):
+        path.pop()
+        ancestors[node] = 0  # only needed by the subtree
+        positions = occurrences[trie.activity[node]]
+        positions.pop()
+        if not positions:
+            del occurrences[trie.activity[node]]
+
+    trie.walk(enter, leave)
+
+    for var, end in zip(trie.variants, trie.ends):
+        potracesuccessor = {i: [] for i in range(len(var))}
+        for j, node in enumerate(trie.path(end)):
+            for i in predecessors[node]:
+                potracesuccessor[i].append(j)
+        porel, po = _po_from_successors(var, potracesuccessor)
+        yield potracesuccessor, porel, po
+
+
+def createPObypositions_Bitset(var, pos_concurrent: Concurrent, equivalents):
+    """Same as createPObypositions_NxDiGraph, but computes the transitive reduction on bitsets.
+    Only the reduced partial order is built as nxDiGraph. Successor lists are sorted by position."""
+
+    order = _sequential_order(var)
+    for c1, c2 in pos_concurrent.to_tuples():
+        order[c1, c2] = False
+
+    removed = np.zeros(len(var), dtype=bool)
+    removed[list(equivalents)] = True
+    order[removed, :] = False  # remove "duplicate" nodes and arcs
+    order[:, removed] = False
+    nodes = [i for i in range(len(var)) if not removed[i]]
+
+    potracenachfolger = _transitive_reduction_bitset(order, nodes)
+    porel, po = _po_from_successors(var, potracenachfolger)
+
+    return potracenachfolger, porel, po
+
+
+def lexicographic_normal_form(var, concurrent_events):
+    """Positions of `var` in the order of the lexicographically smallest trace which only differs from `var`
+    by swapping adjacent concurrent events. All such traces have the same partial order."""
+
+    if not concurrent_events.any():
+        return list(range(len(var)))
+
+    dependent = np.triu(~concurrent_events, k=1)
+    waiting = dependent.sum(axis=0)
+    ready = [(var[j], j) for j in np.flatnonzero(waiting == 0)]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        _, i = heapq.heappop(ready)
+        order.append(int(i))
+        successors = np.flatnonzero(dependent[i])
+        waiting[successors] -= 1
+        for j in successors[waiting[successors] == 0]:
+            heapq.heappush(ready, (var[j], j))
+    return order
+
+
+class POCache:
+    """Bounded LRU cache of partial orders keyed by the normal form of a variant under a concurrency relation.
+
+    The key is the variant in lexicographic normal form together with the concurrent activity pairs occurring
+    in it, so variants which only differ in the order of concurrent activities share one entry. Successors
+    are stored by position in the normal form and mapped back to the positions of each variant.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, var, concurrent: ConcurrencyMatrix):
+        """Returns the cache key of `var` and the positions of `var` in normal form order."""
+
+        concurrent_events = concurrent.submatrix(var)
+        order = lexicographic_normal_form(var, concurrent_events)
+        i, j = np.nonzero(np.triu(concurrent_events))
+        pairs = tuple(sorted({tuple(sorted((var[a], var[b]))) for a, b in zip(i, j)}))
+        return (tuple(var[i] for i in order), pairs), order
+
+    def get(self, key, order):
+        """Returns the successors of the variant in `order` and the po name of a cached entry, None on a miss."""
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        successors, po_name = entry
+        position = np.empty(len(order), dtype=int)
+        position[order] = np.arange(len(order))
+        potn = {
+            i: sorted(order[k] for k in successors[int(position[i])])
+            for i in range(len(order))
+            if int(position[i]) in successors
+        }
+        return potn, po_name
+
+    def put(self, key, order, potn, po_name):
+        """Stores the successors `potn` of the variant in `order` and its po name, evicting the least recently used entry."""
+
+        if self.maxsize <= 0:
+            return
+        position = {p: k for k, p in enumerate(order)}
+        successors = {
+            position[node]: [position[s] for s in succ] for node, succ in potn.items()
+        }
+        self._entries[key] = (successors, po_name)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class POGraphCache:
+    """Partial orders of variants keyed by the variant and the concurrent activity pairs occurring in it.
+
+    Unlike POCache, it holds no po names, so analyses with different concurrency relations of the same log can
+    share it: a variant whose concurrent pairs agree with an earlier analysis reuses its partial order and is
+    only checked for isomorphs again.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Returns successors, relation and a copy of the nxDiGraph of a stored partial order without its po id."""
+
+        self.hits += 1
+        potn, partialorder, pograph = self._entries[key]
+        pograph = pograph.copy()
+        pograph.graph.pop("id", None)
+        pograph.graph.pop("provisional", None)
+        return {node: list(succ) for node, succ in potn.items()}, list(partialorder), pograph
+
+    def put(self, key, potn, partialorder, pograph):
+        self._entries.setdefault(key, (potn, partialorder, pograph))
+
+
 def is_iso(p1, p2):
     nm = iso.categorical_node_match("activity", "")
     return nx.is_isomorphic(p1, p2, nm)
 
 
-def check_for_po_isomorphs(partialorder, po_id, pograph, povariants):
-    """Checks partially ordered nxDiGraph variants for isomorphy."""
+def _refine(colors, predecessors, successors):
+    """Refines node colors until all nodes of a color have the same multisets of predecessor and successor colors.
+    Colors are numbered by their sorted signatures, so the result does not depend on the numbering of the nodes."""
+
+    while True:
+        signatures = [
+            (
+                colors[v],
+                tuple(sorted(colors[u] for u in predecessors[v])),
+                tuple(sorted(colors[w] for w in successors[v])),
+            )
+            for v in range(len(colors))
+        ]
+        ranks = {signature: i for i, signature in enumerate(sorted(set(signatures)))}
+        refined = [ranks[signature] for signature in signatures]
+        if len(ranks) == len(set(colors)):
+            return refined
+        colors = refined
+
+
+class _TooManyLeaves(Exception):
+    pass
+
+
+def _search_canonical(colors, labels, predecessors, successors, best, leaves):
+    """Individualization-refinement: individualizes every node of the first ambiguous color in turn and keeps the
+    smallest encoding of all discrete colorings. Of nodes with the same predecessors and successors (which can be
+    swapped by an automorphism) only one is individualized."""
+
+    colors = _refine(colors, predecessors, successors)
+    counts = Counter(colors)
+    ambiguous = [color for color, count in counts.items() if count > 1]
+    if not ambiguous:
+        order = sorted(range(len(colors)), key=colors.__getitem__)
+        position = {v: i for i, v in enumerate(order)}
+        form = (
+            tuple(labels[v] for v in order),
+            tuple(sorted((position[u], position[w]) for u in order for w in successors[u])),
+        )
+        if best[0] is None or form < best[0]:
+            best[0] = form
+        leaves[0] -= 1
+        return
+
+    cell = min(ambiguous)
+    twins = set()
+    for v in range(len(colors)):
+        if colors[v] != cell:
+            continue
+        twin = (frozenset(predecessors[v]), frozenset(successors[v]))
+        if twin in twins:
+            continue
+        twins.add(twin)
+        if leaves[0] <= 0:
+            raise _TooManyLeaves()
+        individualized = [
+            2 * color + (color == cell and x != v) for x, color in enumerate(colors)
+        ]
+        _search_canonical(individualized, labels, predecessors, successors, best, leaves)
+
+
+def canonical_form(pograph, max_leaves=1000):
+    """Canonical string of a partially ordered nxDiGraph with activity labels. Two graphs have the same canonical
+    form if and only if they are isomorphic, regardless of their node numbering, run or log. None if the search
+    for the canonical node order exceeds `max_leaves` discrete colorings; those graphs are compared with VF2++."""
+
+    if "canonical_form" in pograph.graph:
+        return pograph.graph["canonical_form"]
+
+    nodes = list(pograph.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    labels = [pograph.nodes[node]["activity"] for node in nodes]
+    predecessors = [[index[u] for u in pograph.predecessors(node)] for node in nodes]
+    successors = [[index[w] for w in pograph.successors(node)] for node in nodes]
+    label_ranks = {label: i for i, label in enumerate(sorted(set(labels), key=str))}
+
+    best = [None]
+    try:
+        _search_canonical(
+            [label_ranks[label] for label in labels],
+            labels,
+            predecessors,
+            successors,
+            best,
+            [max_leaves],
+        )
+    except _TooManyLeaves:
+        form = None
+    else:
+        labels_in_order, edges = best[0]
+        form = json.dumps(
+            [list(labels_in_order), [list(edge) for edge in edges]],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    pograph.graph["canonical_form"] = form
+    return form
+
+
+def canonical_id(pograph):
+    """Short stable id of a partially ordered variant, the first 16 hex digits of the sha256 of its canonical form.
+    None if the graph has no canonical form."""
+
+    form = canonical_form(pograph)
+    if form is None:
+        return None
+    return hashlib.sha256(form.encode()).hexdigest()[:16]
+
+
+class POVariantIndex(list):
+    """List of partially ordered variants, additionally indexed by their canonical form and bucketed by an
+    isomorphism invariant key.
+
+    Isomorphic graphs have the same canonical form, so variants are usually found with a dict lookup. Only graphs
+    without canonical form need an exact VF2++ check, against the variants without canonical form of their bucket.
+    """
+
+    def __init__(self, pographs=(), wl_iterations=3):
+        super().__init__()
+        self._wl_iterations = wl_iterations
+        self._buckets = {}
+        self._canonical = {}
+        self.extend(pographs)
+
+    def __reduce__(self):
+        # rebuilt from the graphs, whose invariant keys and canonical forms are cached in them
+        return self.__class__, (list(self), self._wl_iterations)
+
+    def invariant_key(self, pograph):
+        """Cheap isomorphism invariant: label multiset, node and edge counts, per-label degree signatures
+        and a Weisfeiler-Lehman hash over the activity labels."""
+
+        if "invariant_key" in pograph.graph:
+            return pograph.graph["invariant_key"]
+
+        labels = Counter(a for _, a in pograph.nodes(data="activity"))
+        degrees = Counter(
+            (a, pograph.in_degree(n), pograph.out_degree(n))
+            for n, a in pograph.nodes(data="activity")
+        )
+        wl_hash = nx.weisfeiler_lehman_graph_hash(
+            pograph, node_attr="activity", iterations=self._wl_iterations
+        )
+        key = (
+            pograph.number_of_nodes(),
+            pograph.number_of_edges(),
+            tuple(sorted(labels.items())),
+            tuple(sorted(degrees.items())),
+            wl_hash,
+        )
+        pograph.graph["invariant_key"] = key
+        return key
+
+    def candidates(self, pograph):
+        """Known variants which may be isomorphic to `pograph`, in insertion order."""
+
+        return self._buckets.get(self.invariant_key(pograph), [])
+
+    def find_canonical(self, pograph):
+        """The known variant with the canonical form of `pograph`, None if there is none."""
+
+        return self._canonical.get(canonical_form(pograph))
+
+    def append(self, pograph):
+        super().append(pograph)
+        self._buckets.setdefault(self.invariant_key(pograph), []).append(pograph)
+        form = canonical_form(pograph)
+        if form is not None:
+            self._canonical.setdefault(form, pograph)
+
+    def extend(self, pographs):
+        for pograph in pographs:
+            self.append(pograph)
+
+    def remove(self, pograph):
+        super().remove(pograph)
+        self._buckets[self.invariant_key(pograph)].remove(pograph)
+        form = canonical_form(pograph)
+        if self._canonical.get(form) is pograph:
+            del self._canonical[form]
+
+
+class IsomorphismBudget:
+    """Time budget of the VF2++ comparisons of a run, per comparison and in total, in seconds (None is unlimited).
+
+    Comparisons which do not finish within the budget are undecided. A po variant with undecided comparisons and
+    no match gets a provisional po id, its undecided comparisons are kept in `unresolved` to be re-checked later.
+    """
+
+    def __init__(self, per_comparison=None, total=None):
+        self.per_comparison = per_comparison
+        self.total = total
+        self.spent = 0.0
+        self.timed_out = 0
+        self.merged = 0
+        self.unresolved = []  # (provisional pograph, undecided candidates)
+
+    def _compare(self, candidate, pograph, limit):
+        if limit is None:
+            return nx.vf2pp_is_isomorphic(candidate, pograph, node_label="activity")
+        if limit <= 0:
+            return None
+        try:
+            return func_timeout(
+                limit,
+                nx.vf2pp_is_isomorphic,
+                args=(candidate, pograph),
+                kwargs=dict(node_label="activity"),
+            )
+        except FunctionTimedOut:
+            return None
+
+    def is_isomorphic(self, candidate, pograph):
+        """True or False, None if the comparison could not be decided within the budget."""
+
+        limit = self.per_comparison
+        if self.total is not None:
+            remaining = self.total - self.spent
+            limit = remaining if limit is None else min(limit, remaining)
+
+        start = time.perf_counter()
+        result = self._compare(candidate, pograph, limit)
+        self.spent += time.perf_counter() - start
+        if result is None:
+            self.timed_out += 1
+        return result
+
+    def recheck(self, povariants, timeout=None):
+        """Re-checks the undecided comparisons with `timeout` per comparison, regardless of the remaining budget.
+        Provisional variants isomorphic to an earlier variant are removed from `povariants`.
+        Returns the new po id of every merged provisional po id."""
+
+        renamed = {}
+        unresolved = []
+        for pograph, candidates in self.unresolved:
+            undecided = []
+            for candidate in candidates:
+                result = self._compare(candidate, pograph, timeout)
+                if result:
+                    candidate_id = candidate.graph["id"]
+                    renamed[pograph.graph["id"]] = renamed.get(candidate_id, candidate_id)
+                    povariants.remove(pograph)
+                    self.merged += 1
+                    break
+                if result is None:
+                    undecided.append(candidate)
+            else:
+                if undecided:
+                    unresolved.append((pograph, undecided))
+        self.unresolved = unresolved
+        return renamed
+
+
+def check_for_po_isomorphs(partialorder, po_id, pograph, povariants, budget=None):
+    """Checks partially ordered nxDiGraph variants for isomorphy.
+
+    If `povariants` is a POVariantIndex, only the variants in the matching bucket are checked.
+    With an IsomorphismBudget, comparisons are given up when they exceed it. If no variant matched and some
+    comparisons were given up, the new variant gets a provisional po id and `timeout` is True.
+    """
 
     timeout = False
 
@@ -101,9 +642,35 @@ def check_for_po_isomorphs(partialorder, po_id, pograph, povariants):
         pograph.graph["id"] = po_id
         po_id += 1
         povariants.extend([pograph])
-
-    for one_po_variant in povariants:
-        result = nx.vf2pp_is_isomorphic(one_po_variant, pograph, node_label="activity")
+        return pograph.graph["id"], po_id, timeout
+
+    if isinstance(povariants, POVariantIndex):
+        if canonical_form(pograph) is not None:
+            # isomorphic variants have the same canonical form, a new form is a new variant
+            known = povariants.find_canonical(pograph)
+            if known is not None:
+                cco_profiling.observe("isomorphism_comparisons", 0)
+                return known.graph["id"], po_id, timeout
+            candidates = []
+        else:
+            candidates = [
+                one_po_variant
+                for one_po_variant in povariants.candidates(pograph)
+                if canonical_form(one_po_variant) is None
+            ]
+    else:
+        candidates = povariants
+
+    comparisons = 0
+    undecided = []
+    for one_po_variant in candidates:
+        comparisons += 1
+        if budget is None:
+            result = nx.vf2pp_is_isomorphic(one_po_variant, pograph, node_label="activity")
+        else:
+            result = budget.is_isomorphic(one_po_variant, pograph)
+            if result is None:
+                undecided.append(one_po_variant)
         if result:
             poname_towrite = one_po_variant.graph["id"]
             break
@@ -113,5 +680,10 @@ def check_for_po_isomorphs(partialorder, po_id, pograph, povariants):
         poname_towrite = po_id
         po_id += 1
         povariants.extend([pograph])
+        if undecided:
+            timeout = True
+            pograph.graph["provisional"] = True
+            budget.unresolved.append((pograph, undecided))
 
+    cco_profiling.observe("isomorphism_comparisons", comparisons)
     return poname_towrite, po_id, timeout
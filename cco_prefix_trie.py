@@ -0,0 +1,55 @@
+class PrefixTrie:
+    """Prefix trie of sequential variants. Node 0 is the root, every other node stands for the last event of a prefix
+    shared by one or more variants, so analyses which only depend on a prefix can be done once per node instead of
+    once per variant."""
+
+    def __init__(self, variants=()):
+        self.variants = []
+        self.activity = [None]
+        self.parent = [-1]
+        self.children = [{}]
+        self.ends = []  # node of the last event of every variant
+        for var in variants:
+            self.add(var)
+
+    def __len__(self):
+        """Number of events stored, i.e. of nodes without the root."""
+
+        return len(self.activity) - 1
+
+    def add(self, var):
+        node = 0
+        for activity in var:
+            child = self.children[node].get(activity)
+            if child is None:
+                child = len(self.activity)
+                self.children[node][activity] = child
+                self.activity.append(activity)
+                self.parent.append(node)
+                self.children.append({})
+            node = child
+        self.variants.append(var)
+        self.ends.append(node)
+
+    def path(self, node):
+        """Nodes from the first event of the prefix to `node`."""
+
+        nodes = []
+        while node > 0:
+            nodes.append(node)
+            node = self.parent[node]
+        return nodes[::-1]
+
+    def walk(self, enter, leave):
+        """Depth-first traversal calling `enter(node)` before and `leave(node)` after the subtree of every node except
+        the root. Iterative, so variants may be longer than the recursion limit."""
+
+        stack = [(child, False) for child in reversed(self.children[0].values())]
+        while stack:
+            node, entered = stack.pop()
+            if entered:
+                leave(node)
+                continue
+            enter(node)
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(self.children[node].values()))
@@ -1,13 +1,130 @@
-import pm4py
+import gzip
+import sys
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
 import cco_writers
-from tqdm import tqdm
+import cco_profiling
+
+COMPLETE_TRANSITIONS = "COMPLETE", "complete", "Complete"
+START_TRANSITIONS = "START", "start", "Start"
+COMPACT_COLUMNS = "concept:name", "case:concept:name", "lifecycle:transition"
+XES_KEYS = {
+    "case": "case:concept:name",
+    "activity": "concept:name",
+    "lifecycle": "lifecycle:transition",
+    "timestamp": "time:timestamp",
+}
 
 
-def read_log(infilename, mode, scope):
+def read_log(infilename, mode, scope, column_mapping=None):
     """Reads log, filters for complete and (in lifecycle mode) start activites, writes unique event ids,
     extracts variant information and prepares logs for further transformation."""
 
-    log = pm4py.read_xes(infilename)
+    return prepare_log(read_event_log(infilename, column_mapping), mode, scope)
+
+
+def read_log_and_variants(infilename, mode, scope, column_mapping=None):
+    """read_log and the sequential variants of the prepared log, as cached by the cco."""
+
+    import pm4py
+
+    with cco_profiling.stage("read_log"):
+        prepared = read_log(infilename, mode, scope, column_mapping)
+    with cco_profiling.stage("get_variants"):
+        vars = pm4py.get_variants(prepared[0], activity_key="concept:name")
+    return prepared, vars
+
+
+def read_event_log(infilename, column_mapping=None):
+    """Parses an .xes log, or a .parquet or Arrow IPC log, into an event log DataFrame with compacted columns.
+    `column_mapping` maps columns of a columnar log to xes keys, see columnar_event_log."""
+
+    if cco_writers.columnar_format(infilename) is not None:
+        log = columnar_event_log(_read_table(infilename).to_pandas(), column_mapping)
+    else:
+        import pm4py
+
+        log = pm4py.read_xes(infilename)
+    return compact_columns(log)
+
+
+def column_mapping(case=None, activity=None, lifecycle=None, timestamp=None):
+    """Mapping of the given columns of a columnar log to the xes keys of case id, activity, lifecycle transition
+    and timestamp."""
+
+    columns = dict(case=case, activity=activity, lifecycle=lifecycle, timestamp=timestamp)
+    return {column: XES_KEYS[name] for name, column in columns.items() if column is not None}
+
+
+def columnar_event_log(log, column_mapping=None, required=("case", "activity", "timestamp")):
+    """Turns a table with one row per event into an event log DataFrame as pm4py reads it from .xes:
+    `column_mapping` renames columns to xes keys, case ids, activities and lifecycle transitions become strings
+    and timestamps datetimes. The events of every case are made adjacent, in the order of their rows."""
+
+    log = log.rename(columns=column_mapping or {})
+    missing = [XES_KEYS[name] for name in required if XES_KEYS[name] not in log.columns]
+    if len(missing) > 0:
+        raise ValueError(
+            f"The log has no column for {', '.join(missing)}, map a column of the log to it."
+        )
+
+    for key in XES_KEYS["case"], XES_KEYS["activity"], XES_KEYS["lifecycle"]:
+        if key in log.columns and not pd.api.types.is_string_dtype(log[key]):
+            log[key] = log[key].astype(str)
+    timestamp = XES_KEYS["timestamp"]
+    if timestamp in log.columns and not pd.api.types.is_datetime64_any_dtype(log[timestamp]):
+        log[timestamp] = pd.to_datetime(log[timestamp], utc=True)
+
+    # cases are written and reduced as consecutive events, like the traces of an .xes log
+    codes, _ = pd.factorize(log[XES_KEYS["case"]])
+    order = np.argsort(codes, kind="stable")
+    if np.any(order != np.arange(len(log))):
+        log = log.iloc[order]
+    return log.reset_index(drop=True)
+
+
+def _read_table(infilename, columns=None):
+    """Reads a .parquet or Arrow IPC log memory-mapped as pyarrow Table."""
+
+    pyarrow = cco_writers.import_pyarrow()
+    if cco_writers.columnar_format(infilename) == "parquet":
+        return pyarrow.parquet.read_table(infilename, columns=columns, memory_map=True)
+    return pyarrow.feather.read_table(infilename, columns=columns, memory_map=True)
+
+
+def _column_names(infilename):
+    pyarrow = cco_writers.import_pyarrow()
+    if cco_writers.columnar_format(infilename) == "parquet":
+        return pyarrow.parquet.read_schema(infilename, memory_map=True).names
+    with pyarrow.memory_map(infilename) as source:
+        return pyarrow.ipc.open_file(source).schema.names
+
+
+def compact_columns(log, columns=COMPACT_COLUMNS):
+    """Stores every distinct value of the given string columns only once: the values are factorized to integer
+    codes and taken back from the uniques, so that all events with the same activity, case id or transition share
+    one string object. The columns keep their string dtype, which pm4py requires for case ids and activities.
+    Strings stored by pyarrow are left as they are, they are not held as python objects.
+    Modifies and returns `log`."""
+
+    for column in columns:
+        if (
+            column in log.columns
+            and pd.api.types.is_string_dtype(log[column])
+            and getattr(log[column].dtype, "storage", None) != "pyarrow"
+        ):
+            codes, uniques = pd.factorize(log[column])
+            log[column] = pd.Series(uniques.array.take(codes, allow_fill=True), index=log.index)
+    return log
+
+
+def prepare_log(log, mode, scope, lifecycle=None):
+    """Prepares an already parsed log like read_log. `lifecycle` can pass the result of preprocess_lifecycle
+    for this log, so that it is only computed once for several preparations."""
+
+    import pm4py
 
     lc_available = "lifecycle:transition" in log.columns
     if mode == "lifecycle" and not lc_available:
@@ -19,23 +136,18 @@ def read_log(infilename, mode, scope):
         filog_towrite = pm4py.filter_event_attribute_values(
             log,
             "lifecycle:transition",
-            [
-                "COMPLETE",
-                "complete",
-                "Complete",
-            ],
+            list(COMPLETE_TRANSITIONS),
             "event",
             True,
         )
     else:
         filog_towrite = log
 
-    filog_towrite = filog_towrite.copy()
-
-    # normal preparation of log in order to write partial order information later on
+    # normal preparation of log in order to write partial order information later on, assign and set_index
+    # return a new frame, so the given log is not modified and need not be copied
     # XXX: Is there a good reason not to start at 0?
-    filog_towrite.loc[:, "identity:id"] = range(0, len(filog_towrite))
-    filog_towrite.set_index("identity:id", inplace=True)
+    filog_towrite = filog_towrite.assign(**{"identity:id": range(0, len(filog_towrite))})
+    filog_towrite = filog_towrite.set_index("identity:id")
 
     caseid_dict = {}
     keyword_c = "default_c"
@@ -50,14 +162,16 @@ def read_log(infilename, mode, scope):
 
     # lifecycle mode needs additional information in the log for concurrency identification and maybe to write
     if mode == "lifecycle":
-        filog_wlc, keyword_c, keyword_s = preprocess_lifecycle(log)
+        if lifecycle is None:
+            lifecycle = preprocess_lifecycle(log)
+        filog_wlc, keyword_c, keyword_s = lifecycle
         vars_wlc = pm4py.get_variants(filog_wlc, activity_key="new:activity:identifier")
 
         if scope == "tracewise":
             # only in this case, the log with start and complete lifecycle information is used for writing the .xes file
             # therefore special preparation of log and specific identification of variant ids including lc start and stop info
-            filog_wlc["identity:id"] = range(0, len(filog_wlc))
-            filog_wlc.set_index("identity:id", inplace=True)
+            filog_wlc = filog_wlc.assign(**{"identity:id": range(0, len(filog_wlc))})
+            filog_wlc = filog_wlc.set_index("identity:id")
 
             splitlog = pm4py.split_by_process_variant(
                 filog_wlc, activity_key="new:activity:identifier"
@@ -66,7 +180,10 @@ def read_log(infilename, mode, scope):
                 ids = v["case:concept:name"].unique()
                 caseid_dict[k] = ids.tolist()
 
-            filog_towrite = filog_wlc.copy()
+            filog_towrite = filog_wlc
+        else:
+            # only the lifecycle variants are needed, not the events with all their attributes
+            filog_wlc = filog_wlc[["case:concept:name", "new:activity:identifier"]]
 
     else:  # will not be used in non-lifecycle modes but must be set as return value
         filog_wlc = filog_towrite
@@ -75,15 +192,154 @@ def read_log(infilename, mode, scope):
     return filog_towrite, filog_wlc, vars_wlc, caseid_dict, keyword_c, keyword_s
 
 
-def preprocess_lifecycle(log):
-    filteredlogComplAndStart = pm4py.filter_event_attribute_values(
-        log,
-        "lifecycle:transition",
-        ["COMPLETE", "complete", "Complete", "START", "start", "Start"],
-        "event",
-        True,
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _key_values(element):
+    """Values of the direct (non-nested) attributes of an xes element, by key."""
+
+    return {
+        child.get("key"): child.get("value")
+        for child in element
+        if child.get("key") is not None
+    }
+
+
+def iter_xes_traces(infilename):
+    """Incrementally parses an .xes or .xes.gz file and yields (case id, events) per trace,
+    where events is a tuple of interned (activity, lifecycle transition) pairs. Parsed elements are discarded
+    immediately, so memory does not grow with the number of events."""
+
+    opener = gzip.open if infilename.endswith(".gz") else open
+    with opener(infilename, "rb") as xes:
+        root = None
+        events = []
+        for action, element in ET.iterparse(xes, events=("start", "end")):
+            if action == "start":
+                if root is None:
+                    root = element
+                continue
+
+            tag = _local_name(element.tag)
+            if tag == "event":
+                attributes = _key_values(element)
+                activity = attributes.get("concept:name")
+                transition = attributes.get("lifecycle:transition")
+                events.append(
+                    (
+                        sys.intern(activity) if activity is not None else None,
+                        sys.intern(transition) if transition is not None else None,
+                    )
+                )
+                element.clear()
+            elif tag == "trace":
+                caseid = _key_values(element).get("concept:name")
+                yield caseid, tuple(events)
+                events = []
+                root.clear()
+
+
+def iter_columnar_traces(infilename, column_mapping=None):
+    """Yields (case id, events) per case of a .parquet or Arrow IPC log like iter_xes_traces. Only the case id,
+    activity and lifecycle transition columns are read, memory-mapped."""
+
+    sources = {key: column for column, key in (column_mapping or {}).items()}
+    names = _column_names(infilename)
+    columns = [
+        sources.get(XES_KEYS[name], XES_KEYS[name]) for name in ("case", "activity", "lifecycle")
+    ]
+    log = columnar_event_log(
+        _read_table(infilename, [column for column in columns if column in names]).to_pandas(),
+        column_mapping,
+        required=("case", "activity"),
     )
-    lcattributes = filteredlogComplAndStart["lifecycle:transition"].unique()
+
+    def interned(column):
+        if column not in log.columns:
+            return [None] * len(log)
+        return [sys.intern(v) if isinstance(v, str) else None for v in log[column].to_numpy(dtype=object)]
+
+    caseids = log[XES_KEYS["case"]].to_numpy(dtype=object)
+    activities = interned(XES_KEYS["activity"])
+    transitions = interned(XES_KEYS["lifecycle"])
+    bounds = [0, *(np.flatnonzero(caseids[1:] != caseids[:-1]) + 1), len(log)]
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if end > start:
+            yield caseids[start], tuple(zip(activities[start:end], transitions[start:end]))
+
+
+def read_log_variants(infilename, mode, scope, column_mapping=None):
+    """Streaming alternative to read_log for runs which do not write a log: extracts the same variants,
+    case ids per variant and lifecycle keywords without materializing the event log as DataFrame.
+    Memory scales with the number of distinct traces instead of the number of events."""
+
+    if cco_writers.columnar_format(infilename) is not None:
+        traces = iter_columnar_traces(infilename, column_mapping)
+    else:
+        traces = iter_xes_traces(infilename)
+
+    # case ids per distinct sequence of (activity, lifecycle transition) events
+    raw_variants = {}
+    lc_available = False
+    for caseid, events in traces:
+        raw_variants.setdefault(events, []).append(caseid)
+        if not lc_available:
+            lc_available = any(transition is not None for _, transition in events)
+
+    if mode == "lifecycle" and not lc_available:
+        raise ValueError(
+            "Lifecycle oracle mode is not executable due to missing lifecycle information in log."
+        )
+
+    def group_variants(project):
+        # same variant order as pm4py.get_variants, which visits cases sorted by case id
+        grouped = {}
+        for events, caseids in raw_variants.items():
+            projected = project(events)
+            if len(projected) > 0:
+                grouped.setdefault(projected, []).extend(caseids)
+        ordered = sorted(grouped.items(), key=lambda item: min(item[1]))
+        vars = {variant: len(caseids) for variant, caseids in ordered}
+        caseids = {variant: caseids for variant, caseids in ordered}
+        return vars, caseids
+
+    if lc_available:
+        vars, caseid_dict = group_variants(
+            lambda events: tuple(a for a, t in events if t in COMPLETE_TRANSITIONS)
+        )
+    else:
+        vars, caseid_dict = group_variants(lambda events: tuple(a for a, _ in events))
+
+    keyword_c = "default_c"
+    keyword_s = "default_s"
+
+    if mode == "lifecycle":
+        lc_transitions = COMPLETE_TRANSITIONS + START_TRANSITIONS
+        lcattributes = {
+            t for events in raw_variants for _, t in events if t in lc_transitions
+        }
+        keyword_c, keyword_s = lifecycle_keywords(lcattributes)
+        vars_wlc, caseid_dict_wlc = group_variants(
+            lambda events: tuple(
+                sys.intern(a + "_" + t) for a, t in events if t in lc_transitions
+            )
+        )
+        if scope == "tracewise":
+            # read_log writes the log with start and complete events in this case
+            vars, _ = group_variants(
+                lambda events: tuple(a for a, t in events if t in lc_transitions)
+            )
+            caseid_dict = caseid_dict_wlc
+    else:
+        vars_wlc = vars
+
+    return vars, vars_wlc, caseid_dict, keyword_c, keyword_s
+
+
+def lifecycle_keywords(lcattributes):
+    """Suffixes of complete and start activities, depending on the spelling of lifecycle transitions in the log."""
+
     if "Complete" in lcattributes:
         keyword_c = "_Complete"
         keyword_s = "_Start"
@@ -93,17 +349,100 @@ def preprocess_lifecycle(log):
     else:
         keyword_c = "_COMPLETE"
         keyword_s = "_START"
+    return keyword_c, keyword_s
+
+
+def lifecycle_identifiers(activities, transitions):
+    """`<activity>_<transition>` per event. The string is built once per distinct combination of activity and
+    transition codes and shared by all its events, instead of concatenating strings for every event."""
+
+    activity_codes, activity_values = pd.factorize(activities)
+    transition_codes, transition_values = pd.factorize(transitions)
+    n_transitions = len(transition_values)
+    combined = activity_codes.astype(np.int64) * n_transitions + transition_codes
+    combined[(activity_codes < 0) | (transition_codes < 0)] = -1
+    codes, combinations = pd.factorize(combined)
+    identifiers = pd.array(
+        [
+            None
+            if code < 0
+            else activity_values[code // n_transitions] + "_" + transition_values[code % n_transitions]
+            for code in combinations
+        ],
+        dtype=activities.dtype,
+    )
+    return pd.Series(identifiers.take(codes), index=activities.index)
+
 
-    filog_wlc = filteredlogComplAndStart.copy()
-    filog_wlc["new:activity:identifier"] = (
-        filog_wlc.loc[:, "concept:name"]
-        + "_"
-        + filog_wlc.loc[:, "lifecycle:transition"]
+def preprocess_lifecycle(log):
+    import pm4py
+
+    filteredlogComplAndStart = pm4py.filter_event_attribute_values(
+        log,
+        "lifecycle:transition",
+        list(COMPLETE_TRANSITIONS + START_TRANSITIONS),
+        "event",
+        True,
+    )
+    lcattributes = filteredlogComplAndStart["lifecycle:transition"].unique()
+    keyword_c, keyword_s = lifecycle_keywords(lcattributes)
+
+    # the filtered log is a new frame, the identifier column can be added without copying it
+    filog_wlc = filteredlogComplAndStart.assign(
+        **{
+            "new:activity:identifier": lifecycle_identifiers(
+                filteredlogComplAndStart["concept:name"],
+                filteredlogComplAndStart["lifecycle:transition"],
+            )
+        }
     )
     # lifecycle mode braucht lifecycle Informationen im log zum extrahieren der concurrency
     return filog_wlc, keyword_c, keyword_s
 
 
+def most_frequent_variants(vars, coverage=None, top_variants=None):
+    """Most frequent variants of `vars` (variant -> number of cases): the `top_variants` most frequent ones and/or as
+    few as needed to cover a share `coverage` of the cases, the smaller selection if both are given. Variants with
+    equal frequency are taken in the order of `vars`.
+    Returns the selected variants with their frequencies in the order of `vars` and the number of omitted cases."""
+
+    if coverage is not None and not 0 < coverage <= 1:
+        raise ValueError("coverage must be a share of cases in (0, 1].")
+    if top_variants is not None and top_variants < 1:
+        raise ValueError("top_variants must be at least 1.")
+
+    ranked = sorted(vars, key=lambda v: vars[v], reverse=True)
+    n_selected = len(ranked) if top_variants is None else min(top_variants, len(ranked))
+    if coverage is not None:
+        required = coverage * sum(vars.values())
+        covered = 0
+        for n, v in enumerate(ranked[:n_selected], start=1):
+            covered += vars[v]
+            if covered >= required:
+                n_selected = n
+                break
+
+    selected = set(ranked[:n_selected])
+    omitted_cases = sum(vars[v] for v in ranked[n_selected:])
+    return {v: count for v, count in vars.items() if v in selected}, omitted_cases
+
+
+def select_variants(mode, scope, vars, vars_wlc, caseid_dict, coverage=None, top_variants=None):
+    """Restricts the analysis to the most frequent variants as selected by most_frequent_variants. The variants the
+    partial orders are built for (with lifecycle information in lifecycle tracewise scope) determine the cases kept
+    in `caseid_dict`. In logwise scope, all variants with lifecycle information are kept for the detection of
+    lifecycle concurrency, since those of the kept cases are not known without their events.
+    Returns the selected vars, vars_wlc and caseid_dict and the number of omitted cases."""
+
+    vars_selected, omitted_cases = most_frequent_variants(vars, coverage, top_variants)
+    selected = vars_selected
+    if mode == "lifecycle" and scope == "tracewise":
+        vars_wlc, omitted_cases = most_frequent_variants(vars_wlc, coverage, top_variants)
+        selected = vars_wlc
+    caseid_dict = {v: caseid_dict[v] for v in selected}
+    return vars_selected, vars_wlc, caseid_dict, omitted_cases
+
+
 def reduce_log_seq_variants(filog_towrite, mode, scope, vars, vars_wlc, caseid_dict):
     """Keeps only one sequential trace representative per sequential variant, discards duplicates"""
 
@@ -114,17 +453,18 @@ def reduce_log_seq_variants(filog_towrite, mode, scope, vars, vars_wlc, caseid_d
     else:
         seqv = vars.keys()
 
-    for v in tqdm(seqv, desc="reducing log, completed traces: "):
+    representatives = {}
+    discarded_caseids = []
+    for v in seqv:
         # vorverarbeitung kondensieren, multiplizitäten
-        multiplicity = vars[v]
         caseids_akt_variante = caseid_dict[v]
+        representatives[caseids_akt_variante[0]] = vars[v]
+        discarded_caseids.extend(caseids_akt_variante[1:])
         caseid_dict[v] = [caseids_akt_variante[0]]
 
-        # assert len(caseids_akt_variante) > 0, "no entries in teillog"
-
-        filog_towrite = cco_writers.keepOneRepresentativeAndMultiplicity(
-            filog_towrite, caseids_akt_variante, multiplicity
-        )
+    filog_towrite = cco_writers.keepRepresentativesAndMultiplicities(
+        filog_towrite, pd.Series(representatives, dtype=float), discarded_caseids
+    )
 
     return filog_towrite, caseid_dict
 
@@ -134,22 +474,30 @@ def reduce_log_po_variants(filog_towrite):
     trace variant which lead to the same partially ordered trace, and their combined multiplicities.
     """
 
-    po_ids = filog_towrite["case:po_name"].unique()
-    for id in tqdm(po_ids, desc="reducing log, completed variants: "):
-        filt_ = filog_towrite["case:po_name"] == id
-        seqvarid = filog_towrite.loc[filt_, "case:concept:name"].unique()
-        seqvarid = seqvarid.tolist()
+    caseids = filog_towrite["case:concept:name"]
 
-        multsum = 0
+    # every case belongs to exactly one po variant; cases are listed in order of their first appearance
+    po_cases = filog_towrite.loc[
+        filog_towrite["case:po_name"].notna(), ["case:concept:name", "case:po_name"]
+    ].drop_duplicates("case:concept:name")
+    case_multiplicities = filog_towrite.loc[
+        ~caseids.duplicated(), ["case:concept:name", "case:multiplicity"]
+    ].set_index("case:concept:name")["case:multiplicity"]
+    po_cases["case:multiplicity"] = po_cases["case:concept:name"].map(case_multiplicities)
 
-        if len(seqvarid) > 0:
-            for s in seqvarid:
-                filt2_ = filog_towrite["case:concept:name"] == s
-                casemult = filog_towrite.loc[filt2_, "case:multiplicity"].unique()
-                multsum = multsum + casemult[0]
+    per_po_variant = po_cases.groupby("case:po_name", sort=False).agg(
+        representative=("case:concept:name", "first"),
+        multiplicity=("case:multiplicity", "sum"),
+    )
+    multiplicities = pd.Series(
+        per_po_variant["multiplicity"].to_numpy(),
+        index=per_po_variant["representative"].to_numpy(),
+    )
+    discard = ~po_cases["case:concept:name"].isin(multiplicities.index)
+    discarded_caseids = po_cases.loc[discard, "case:concept:name"]
 
-            filog_towrite = cco_writers.keepOneRepresentativeAndMultiplicity(
-                filog_towrite, seqvarid, multsum
-            )
+    filog_towrite = cco_writers.keepRepresentativesAndMultiplicities(
+        filog_towrite, multiplicities, discarded_caseids
+    )
 
     return filog_towrite
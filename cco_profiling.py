@@ -0,0 +1,187 @@
+import cProfile
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+_active = None
+
+
+def peak_rss_bytes():
+    """Peak resident set size of the process so far, None where it cannot be determined."""
+
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss if sys.platform == "darwin" else maxrss * 1024  # kilobytes on Linux
+
+
+class _Frame:
+    def __init__(self, name):
+        self.name = name
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.rss = peak_rss_bytes()
+        self.memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        self.memory_peak = self.memory
+
+
+class Profiler:
+    """Records wall time, CPU time, peak RSS and tracemalloc deltas per stage of a cco run, accumulated time of
+    hot operations and statistics of per-variant counts, e.g. events, partial order edges and isomorphism checks.
+
+    Stages nest, a nested stage is recorded as `parent/child`. Hooks are called with the record of every
+    finished stage. With `pstats_file`, stages entered with `profile_calls=True` are additionally profiled
+    with cProfile, the stats are dumped when the profiler is closed.
+    """
+
+    def __init__(self, trace_memory=True, pstats_file=None, hooks=()):
+        self.trace_memory = trace_memory
+        self.pstats_file = pstats_file
+        self.hooks = list(hooks)
+        self.stages = []
+        self.timers = {}
+        self.counters = {}
+        self._stack = []
+        self._cprofile = cProfile.Profile() if pstats_file is not None else None
+        self._started_tracemalloc = False
+        self._start = None
+        self.total = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._start = _Frame("total")
+
+    def close(self):
+        self.total = self._finish(self._start)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(self.pstats_file)
+
+    def _fold_memory_peak(self):
+        """Hands the tracemalloc peak since the last reset to all open stages and resets it for the next one."""
+
+        if not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for frame in [self._start] + self._stack:
+            frame.memory_peak = max(frame.memory_peak, peak)
+        tracemalloc.reset_peak()
+
+    def _finish(self, frame):
+        self._fold_memory_peak()
+        memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+        rss = peak_rss_bytes()
+        return dict(
+            name=frame.name,
+            wall_s=time.perf_counter() - frame.wall,
+            cpu_s=time.process_time() - frame.cpu,
+            peak_rss_bytes=rss,
+            peak_rss_delta_bytes=None if rss is None else rss - frame.rss,
+            tracemalloc_delta_bytes=memory - frame.memory,
+            tracemalloc_peak_bytes=frame.memory_peak - frame.memory,
+        )
+
+    @contextmanager
+    def stage(self, name, profile_calls=False):
+        self._fold_memory_peak()
+        path = "/".join([frame.name for frame in self._stack] + [name])
+        frame = _Frame(name)
+        self._stack.append(frame)
+        profile = profile_calls and self._cprofile is not None
+        if profile:
+            self._cprofile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                self._cprofile.disable()
+            record = self._finish(frame)
+            record["name"] = path
+            self._stack.pop()
+            self.stages.append(record)
+            for hook in self.hooks:
+                hook(record)
+
+    @contextmanager
+    def timer(self, name):
+        """Accumulates the wall time and number of calls of a hot operation, without the per-stage overhead."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timer = self.timers.setdefault(name, dict(calls=0, wall_s=0.0))
+            timer["calls"] += 1
+            timer["wall_s"] += time.perf_counter() - start
+
+    def observe(self, name, value):
+        """Adds one observation, e.g. the number of events of a variant, to the statistics of `name`."""
+
+        counter = self.counters.get(name)
+        if counter is None:
+            self.counters[name] = dict(count=1, total=value, min=value, max=value)
+        else:
+            counter["count"] += 1
+            counter["total"] += value
+            counter["min"] = min(counter["min"], value)
+            counter["max"] = max(counter["max"], value)
+
+    def report(self):
+        return dict(
+            total=self.total,
+            stages=self.stages,
+            timers=self.timers,
+            counters=self.counters,
+        )
+
+
+@contextmanager
+def profiling(report_file=None, pstats_file=None, hooks=(), trace_memory=True):
+    """Activates a new Profiler for the block, so that the stages of the cco report to it.
+    The report is written as json to `report_file` on exit, if given."""
+
+    global _active
+    profiler = Profiler(trace_memory, pstats_file, hooks)
+    previous, _active = _active, profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        _active = previous
+        profiler.close()
+        if report_file is not None:
+            with open(report_file, "w") as f:
+                json.dump(profiler.report(), f, indent=1)
+
+
+def stage(name, profile_calls=False):
+    """Stage of the active profiler, does nothing without one."""
+
+    if _active is None:
+        return nullcontext()
+    return _active.stage(name, profile_calls)
+
+
+def timer(name):
+    if _active is None:
+        return nullcontext()
+    return _active.timer(name)
+
+
+def observe(name, value):
+    if _active is not None:
+        _active.observe(name, value)
@@ -0,0 +1,441 @@
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import cco_cache
+import cco_preparators
+import cco_transformer
+from cco_stream import _as_pair
+
+
+def _file_stat(filename):
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class LoadedLog:
+    """A log analysed once and kept in memory to answer queries: the prepared log, its sequential variants and
+    their case ids, the concurrency relation, the partial order and po name of every variant and the partially
+    ordered variants. Columnar logs are read with `column_mapping`, see cco_preparators.columnar_event_log."""
+
+    def __init__(
+        self,
+        infilename,
+        mode,
+        scope,
+        po_engine="networkx",
+        jobs=1,
+        cache_dir=None,
+        cache_bytes=2 * 1024**3,
+        column_mapping=None,
+    ):
+        self.file_stat = _file_stat(infilename)  # before reading, so a change while loading makes it stale
+        mapping_key = (tuple(sorted(column_mapping.items())),) if column_mapping else ()
+        prepared, vars = cco_cache.load_or_compute(
+            cache_dir,
+            infilename,
+            ("read_log", mode, scope, *mapping_key),
+            lambda: cco_preparators.read_log_and_variants(infilename, mode, scope, column_mapping),
+            cache_bytes,
+        )
+        self.infilename = infilename
+        self.mode = mode
+        self.scope = scope
+        self.column_mapping = column_mapping
+        self.filog_towrite, _, self.vars_wlc, self.caseid_dict, keyword_c, keyword_s = prepared
+        self.vars = vars
+
+        self.partialorders, self.povariants, self.concurrent = cco_transformer.generate_partial_orders(
+            mode,
+            scope,
+            vars,
+            self.vars_wlc,
+            keyword_c,
+            keyword_s,
+            po_engine,
+            jobs,
+            concurrencies_file=os.devnull,
+        )
+
+        self.variant_of_case = {
+            caseid: var for var, caseids in self.caseid_dict.items() for caseid in caseids
+        }
+        self.concurrent_to = {}
+        for concurrency in self.concurrent:
+            a, b = _as_pair(concurrency)
+            self.concurrent_to.setdefault(a, set()).add(b)
+            self.concurrent_to.setdefault(b, set()).add(a)
+        po_variants = {}
+        for var, (_, po_name) in self.partialorders.items():
+            variants, cases = po_variants.get(po_name, (0, 0))
+            po_variants[po_name] = variants + 1, cases + len(self.caseid_dict[var])
+        self.po_variants = [
+            dict(po_name=po_name, variants=variants, cases=cases)
+            for po_name, (variants, cases) in po_variants.items()
+        ]
+        self.nbytes = int(self.filog_towrite.memory_usage(deep=True).sum())
+
+    def is_current(self):
+        """Whether the file still has the size and mtime it had when it was loaded."""
+
+        return os.path.exists(self.infilename) and _file_stat(self.infilename) == self.file_stat
+
+    def summary(self):
+        return dict(
+            path=self.infilename,
+            mode=self.mode,
+            scope=self.scope,
+            cases=len(self.variant_of_case),
+            variants=len(self.partialorders),
+            po_variants=len(self.po_variants),
+            concurrencies=len(self.concurrent),
+            memory_bytes=self.nbytes,
+        )
+
+    def case(self, caseid):
+        """Sequential variant, po name and successors per event position of the partial order of a case."""
+
+        if caseid not in self.variant_of_case:
+            raise KeyError(f"unknown case {caseid}")
+        var = self.variant_of_case[caseid]
+        potn, po_name = self.partialorders[var]
+        return dict(case=caseid, variant=list(var), po_name=po_name, successors=potn)
+
+    def concurrencies(self, activity=None):
+        """Activities concurrent to `activity`, or all concurrent pairs of activities."""
+
+        if activity is None:
+            return sorted(_as_pair(concurrency) for concurrency in self.concurrent)
+        return sorted(self.concurrent_to.get(activity, ()))
+
+    def export(self, outfilename, keep="all", canonical_ids=False):
+        """Writes the partially ordered log, reduced as chosen by `keep`, to `outfilename`."""
+
+        if keep not in ("one_per_seq_variant", "all", "one_per_po_variant"):
+            raise ValueError(f"unknown keep {keep}")
+        cco_transformer.write_partially_ordered_log(
+            self.filog_towrite.copy(),
+            self.mode,
+            self.scope,
+            keep,
+            self.vars,
+            self.vars_wlc,
+            deepcopy(self.caseid_dict),
+            self.partialorders,
+            outfilename,
+            cco_transformer.canonical_ids(self.povariants) if canonical_ids else None,
+            self.column_mapping,
+        )
+        return outfilename
+
+
+class LogStore:
+    """Loaded logs by file, mode and scope. Beyond `max_logs` logs or `max_memory_mb` of event data, the least
+    recently used logs are evicted; a log is loaded only once, even if it is queried concurrently, and again
+    once its file changed."""
+
+    def __init__(self, max_logs=4, max_memory_mb=None, **load_options):
+        self.max_logs = max_logs
+        self.max_bytes = max_memory_mb * 1024**2 if max_memory_mb is not None else None
+        self.load_options = load_options
+        self._logs = OrderedDict()  # least recently used first
+        self._loading = {}  # lock per log being loaded
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(infilename, mode, scope):
+        if mode not in ("alpha", "lifecycle") or scope not in ("logwise", "tracewise"):
+            raise ValueError(f"unknown mode {mode} or scope {scope}")
+        return os.path.abspath(infilename), mode, scope
+
+    def _lookup(self, key):
+        with self._lock:
+            log = self._logs.get(key)
+            if log is None:
+                return None
+            if not log.is_current():  # changed on disk, like cco_cache entries
+                del self._logs[key]
+                return None
+            self._logs.move_to_end(key)
+            return log
+
+    def get(self, infilename, mode="alpha", scope="logwise"):
+        """The loaded log, analysed first if it is not loaded yet or its file changed since it was loaded."""
+
+        key = self.key(infilename, mode, scope)
+        log = self._lookup(key)
+        if log is not None:
+            return log
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.Lock())
+        with loading:
+            log = self._lookup(key)  # loaded by another request meanwhile
+            if log is not None:
+                return log
+            try:
+                if not os.path.exists(key[0]):
+                    raise FileNotFoundError(f"no log {key[0]}")
+                log = LoadedLog(*key, **self.load_options)
+                with self._lock:
+                    self._logs[key] = log
+                    self._evict()
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return log
+
+    def _evict(self):
+        while len(self._logs) > 1 and (
+            len(self._logs) > self.max_logs
+            or (self.max_bytes is not None and self.nbytes() > self.max_bytes)
+        ):
+            self._logs.popitem(last=False)
+
+    def nbytes(self):
+        return sum(log.nbytes for log in self._logs.values())
+
+    def evict(self, infilename, mode="alpha", scope="logwise"):
+        """Unloads a log, returns whether it was loaded."""
+
+        with self._lock:
+            return self._logs.pop(self.key(infilename, mode, scope), None) is not None
+
+    def summaries(self):
+        with self._lock:
+            return [log.summary() for log in self._logs.values()]
+
+
+def _param(params, name, default=None):
+    value = params.get(name, default)
+    if value is None:
+        raise ValueError(f"missing parameter {name}")
+    return value
+
+
+def _log(store, params):
+    return store.get(
+        _param(params, "path"), params.get("mode", "alpha"), params.get("scope", "logwise")
+    )
+
+
+def _evict(store, params):
+    return dict(
+        evicted=store.evict(
+            _param(params, "path"), params.get("mode", "alpha"), params.get("scope", "logwise")
+        )
+    )
+
+
+def _export(store, params):
+    canonical_ids = params.get("po_canonical_ids", False)
+    if isinstance(canonical_ids, str):
+        canonical_ids = canonical_ids.lower() in ("1", "true", "yes")
+    outfilename = _log(store, params).export(
+        _param(params, "outfilename"), params.get("keep", "all"), canonical_ids
+    )
+    return dict(outfilename=outfilename)
+
+
+ROUTES = {
+    ("GET", "/health"): lambda store, params: dict(status="ok"),
+    ("GET", "/logs"): lambda store, params: store.summaries(),
+    ("POST", "/logs"): lambda store, params: _log(store, params).summary(),
+    ("DELETE", "/logs"): _evict,
+    ("GET", "/case"): lambda store, params: _log(store, params).case(_param(params, "case")),
+    ("GET", "/concurrencies"): lambda store, params: _log(store, params).concurrencies(
+        params.get("activity")
+    ),
+    ("GET", "/po_variants"): lambda store, params: _log(store, params).po_variants,
+    ("POST", "/export"): _export,
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON API of the server: query parameters, for POST requests also a JSON object as body."""
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else "unix socket"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        url = urlparse(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        route = ROUTES.get((method, url.path))
+        try:
+            if method == "POST":
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                params.update(json.loads(body or b"{}"))
+            if route is None:
+                raise LookupError(f"unknown endpoint {method} {url.path}")
+            status, result = 200, route(self.server.store, params)
+        except (LookupError, FileNotFoundError) as e:
+            status, result = 404, dict(error=str(e.args[0]) if e.args else repr(e))
+        except (ValueError, NotImplementedError) as e:
+            status, result = 400, dict(error=str(e) or repr(e))
+        except Exception as e:
+            print(f"cco serve: {method} {self.path} failed: {e!r}", file=sys.stderr)
+            status, result = 500, dict(error=repr(e))
+
+        body = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CCOServer(ThreadingHTTPServer):
+    """HTTP server answering queries about the logs of `store`, one thread per request."""
+
+    daemon_threads = True
+
+    def __init__(self, address, store, verbose=False):
+        super().__init__(address, _Handler)
+        self.store = store
+        self.verbose = verbose
+
+
+class UnixCCOServer(CCOServer):
+    """CCOServer on a Unix domain socket, which replaces a socket left at its path, but no other file."""
+
+    address_family = socket.AF_UNIX
+    _bound = False
+
+    def server_bind(self):
+        if os.path.lexists(self.server_address):
+            if not stat.S_ISSOCK(os.lstat(self.server_address).st_mode):
+                raise FileExistsError(f"{self.server_address} exists and is not a socket")
+            os.unlink(self.server_address)
+        socketserver.TCPServer.server_bind(self)
+        self._bound = True
+        self.server_name = "localhost"
+        self.server_port = 0
+
+    def server_close(self):
+        super().server_close()
+        # also called if binding failed, when the path is not ours to remove
+        if self._bound and os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+def make_server(store, host="127.0.0.1", port=8765, socket_path=None, verbose=False):
+    """A server on `socket_path` if given, otherwise on `host` and `port`."""
+
+    if socket_path is not None:
+        return UnixCCOServer(socket_path, store, verbose)
+    return CCOServer((host, port), store, verbose)
+
+
+class CCOServerError(Exception):
+    """Error answered by the server, with the HTTP status and the message."""
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class _UnixHTTPConnection(HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class CCOClient:
+    """Client of a running `cco serve`, over TCP or a Unix socket. Paths of logs are sent as absolute paths,
+    so the server has to run on the same machine."""
+
+    def __init__(self, host="127.0.0.1", port=8765, socket_path=None, timeout=None):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _request(self, method, endpoint, params=None, body=None):
+        if self.socket_path is not None:
+            connection = _UnixHTTPConnection(self.socket_path, self.timeout)
+        else:
+            connection = HTTPConnection(self.host, self.port, timeout=self.timeout)
+        url = endpoint if not params else f"{endpoint}?{urlencode(params)}"
+        try:
+            if body is None:
+                connection.request(method, url)
+            else:
+                connection.request(
+                    method, url, json.dumps(body), {"Content-Type": "application/json"}
+                )
+            response = connection.getresponse()
+            result = json.loads(response.read())
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise CCOServerError(response.status, result.get("error"))
+        return result
+
+    @staticmethod
+    def _log(path, mode, scope):
+        return dict(path=os.path.abspath(path), mode=mode, scope=scope)
+
+    def health(self):
+        return self._request("GET", "/health")
+
+    def logs(self):
+        """Summaries of the loaded logs."""
+
+        return self._request("GET", "/logs")
+
+    def load(self, path, mode="alpha", scope="logwise"):
+        """Loads a log if it is not loaded yet and returns its summary."""
+
+        return self._request("POST", "/logs", body=self._log(path, mode, scope))
+
+    def evict(self, path, mode="alpha", scope="logwise"):
+        return self._request("DELETE", "/logs", self._log(path, mode, scope))["evicted"]
+
+    def case(self, path, case, mode="alpha", scope="logwise"):
+        return self._request("GET", "/case", dict(self._log(path, mode, scope), case=case))
+
+    def concurrencies(self, path, activity=None, mode="alpha", scope="logwise"):
+        params = self._log(path, mode, scope)
+        if activity is not None:
+            params["activity"] = activity
+        return self._request("GET", "/concurrencies", params)
+
+    def po_variants(self, path, mode="alpha", scope="logwise"):
+        return self._request("GET", "/po_variants", self._log(path, mode, scope))
+
+    def export(self, path, outfilename, keep="all", mode="alpha", scope="logwise", po_canonical_ids=False):
+        body = dict(
+            self._log(path, mode, scope),
+            outfilename=os.path.abspath(outfilename),
+            keep=keep,
+            po_canonical_ids=po_canonical_ids,
+        )
+        return self._request("POST", "/export", body=body)["outfilename"]
@@ -0,0 +1,71 @@
+import os
+import pickle
+
+import cco_concurrency_finders
+import cco_partialorder_handlers
+from Concurrent import Concurrent
+
+
+class AnalysisState:
+    """Snapshot of the analysis of a log, so that later runs on appended traces only process their new variants:
+    the concurrency relation and the directly-follows relation or lifecycle variants it was detected from, the
+    successors and po name of every known sequential variant, the partially ordered variants and the next po id.
+    """
+
+    VERSION = 1
+
+    def __init__(self, mode, scope):
+        self.version = self.VERSION
+        self.mode = mode
+        self.scope = scope
+        self.directly_follows = cco_concurrency_finders.DirectlyFollowsIndex()  # logwise alpha
+        self.lifecycle_variants = set()  # variants with lifecycle information analysed, logwise lifecycle
+        self.concurrent = Concurrent()  # logwise relation, or union of the tracewise relations
+        self.partialorders = {}  # successors and po name per known sequential variant
+        self.povariants = cco_partialorder_handlers.POVariantIndex()
+        self.po_id = 1
+
+    @classmethod
+    def load(cls, filename, mode, scope):
+        """Loads the state of earlier runs from `filename`, or returns a new state if it does not exist yet."""
+
+        if not os.path.exists(filename):
+            return cls(mode, scope)
+        with open(filename, "rb") as f:
+            state = pickle.load(f)
+        if not isinstance(state, cls) or state.version != cls.VERSION:
+            raise ValueError(f"{filename} is not a state file of this version of the cco.")
+        if (state.mode, state.scope) != (mode, scope):
+            raise ValueError(
+                f"{filename} holds the state of mode {state.mode} and scope {state.scope}, "
+                f"it cannot be resumed with mode {mode} and scope {scope}."
+            )
+        return state
+
+    def save(self, filename):
+        """Writes the state to `filename`, replacing the previous state only once it is completely written."""
+
+        tmpname = f"{filename}.tmp"
+        with open(tmpname, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpname, filename)
+
+    def new_variants(self, variants):
+        """The variants whose partial order is not known yet."""
+
+        return [var for var in variants if var not in self.partialorders]
+
+    def affected_variants(self, added):
+        """Known variants whose partial order changes with the `added` logwise concurrencies, i.e. which contain
+        both activities of an added pair, or an activity twice if it became concurrent to itself."""
+
+        if len(added) == 0:
+            return []
+        affected = []
+        for var in self.partialorders:
+            activities = set(var)
+            for concurrency in added:
+                if concurrency <= activities and (len(concurrency) == 2 or var.count(next(iter(concurrency))) > 1):
+                    affected.append(var)
+                    break
+        return affected
@@ -0,0 +1,277 @@
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+import cco_concurrency_finders
+import cco_partialorder_handlers
+from cco_preparators import COMPLETE_TRANSITIONS, START_TRANSITIONS
+from Concurrent import ActivityAlphabet, Concurrent, ConcurrencyMatrix
+
+KEYWORD_COMPLETE = "_complete"
+KEYWORD_START = "_start"
+
+
+def stream_time(timestamp):
+    """Seconds of a `time:timestamp` value of an event, either a number or an ISO 8601 string; the wall clock
+    time for events without timestamp."""
+
+    if timestamp is None:
+        return time.time()
+    if isinstance(timestamp, str):
+        return datetime.fromisoformat(timestamp).timestamp()
+    return float(timestamp)
+
+
+def _as_pair(concurrency):
+    if len(concurrency) == 1:  # self-concurrent activity
+        (activity,) = concurrency
+        return [activity, activity]
+    return sorted(concurrency)
+
+
+class _OpenCase:
+    """Trace of a case which has not been closed yet and the concurrency state built from its events."""
+
+    __slots__ = ("trace", "trace_wlc", "last_seen", "directly_follows", "lifecycle")
+
+    def __init__(self, mode, scope):
+        self.trace = []  # complete events
+        self.trace_wlc = []  # start and complete events in lifecycle mode
+        self.last_seen = None
+        self.directly_follows = None
+        self.lifecycle = None
+        if mode == "alpha" and scope == "tracewise":
+            self.directly_follows = cco_concurrency_finders.DirectlyFollowsIndex()
+        elif mode == "lifecycle":
+            self.lifecycle = cco_concurrency_finders.IncrementalLifecycleConcurrencyFinder(
+                KEYWORD_COMPLETE, KEYWORD_START
+            )
+
+
+class StreamingOracle:
+    """Concurrency oracle over a stream of events, without the whole log.
+
+    Events are dicts with the xes keys `case:concept:name`, `concept:name` and optionally
+    `lifecycle:transition` and `time:timestamp`; `case:end` set to true closes the case after the event (an event
+    without `concept:name` only closes it). Every open case keeps its trace so far and its concurrency state: in
+    alpha logwise scope, each event extends the directly-follows relation of the log right away; in alpha
+    tracewise scope, that of its case; in lifecycle mode, the open intervals of its case.
+
+    When a case is closed, its concurrencies are added to the relation (in logwise lifecycle and tracewise scope),
+    its partial order is built with the relation at that time and identified among the partially ordered variants
+    seen so far. `process` returns one result per closed case with its po name and the concurrencies added to the
+    relation since the previous closed case. Memory is bounded by closing cases which had no event for
+    `case_timeout` seconds of stream time, and the least recently active case when more than `max_open_cases`
+    are open. Partial orders of up to `po_cache_size` variants are memoized.
+    """
+
+    def __init__(
+        self,
+        mode="alpha",
+        scope="logwise",
+        case_timeout=None,
+        max_open_cases=10000,
+        po_cache_size=10000,
+        po_engine="bitset",
+    ):
+        if mode not in ("alpha", "lifecycle") or scope not in ("logwise", "tracewise"):
+            raise NotImplementedError()
+        if po_engine == "networkx":
+            self._createPObyactivities = cco_partialorder_handlers.createPObyactivities_NxDiGraph
+            self._createPObypositions = cco_partialorder_handlers.createPObypositions_NxDiGraph
+        elif po_engine in ("bitset", "trie"):  # a single partial order at a time
+            self._createPObyactivities = cco_partialorder_handlers.createPObyactivities_Bitset
+            self._createPObypositions = cco_partialorder_handlers.createPObypositions_Bitset
+        else:
+            raise NotImplementedError()
+
+        self.mode = mode
+        self.scope = scope
+        self.case_timeout = case_timeout
+        self.max_open_cases = max_open_cases
+        self.open_cases = OrderedDict()  # least recently active first
+        self.concurrent = Concurrent()  # logwise relation, or union of the tracewise relations
+        self.concurrency_matrix = ConcurrencyMatrix()
+        self.directly_follows = cco_concurrency_finders.DirectlyFollowsIndex()
+        self.povariants = cco_partialorder_handlers.POVariantIndex()
+        self.po_cache = cco_partialorder_handlers.POCache(po_cache_size)
+        self.po_id = 1
+        self.now = None
+        self.events = 0
+        self.closed_cases = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self._added = []  # concurrencies added since the previous closed case
+
+    def _add_concurrency(self, concurrency):
+        if concurrency in self.concurrent:
+            return
+        self.concurrent.add(concurrency)
+        self.concurrency_matrix.add_pair(*concurrency)
+        self._added.append(concurrency)
+
+    def process(self, event):
+        """Adds one event and returns the results of the cases closed by it, by timeout or by eviction."""
+
+        now = stream_time(event.get("time:timestamp"))
+        self.now = now if self.now is None else max(self.now, now)
+        results = self._expire()
+
+        caseid = event["case:concept:name"]
+        activity = event.get("concept:name")
+        if activity is not None:
+            self.events += 1
+            self._add_event(caseid, activity, event.get("lifecycle:transition"))
+
+        if event.get("case:end"):
+            if caseid in self.open_cases:
+                results.append(self.close_case(caseid))
+        elif len(self.open_cases) > self.max_open_cases:
+            results.append(self.close_case(next(iter(self.open_cases)), "evicted"))
+        return results
+
+    def _add_event(self, caseid, activity, transition):
+        case = self.open_cases.get(caseid)
+        if case is None:
+            case = self.open_cases[caseid] = _OpenCase(self.mode, self.scope)
+        else:
+            self.open_cases.move_to_end(caseid)
+        case.last_seen = self.now
+
+        if self.mode == "lifecycle":
+            if transition in START_TRANSITIONS:
+                case.trace_wlc.append(activity + KEYWORD_START)
+            elif transition in COMPLETE_TRANSITIONS:
+                case.trace_wlc.append(activity + KEYWORD_COMPLETE)
+                case.trace.append(activity)
+            else:
+                return
+            case.lifecycle.add(case.trace_wlc[-1])
+            return
+
+        if transition is not None and transition not in COMPLETE_TRANSITIONS:
+            return  # like the log, only complete events are analysed in alpha mode
+        if len(case.trace) > 0:
+            if self.scope == "logwise":
+                concurrency = self.directly_follows.add_directly_follows(case.trace[-1], activity)
+                if concurrency is not None:
+                    self._add_concurrency(concurrency)
+            else:
+                case.directly_follows.add_directly_follows(case.trace[-1], activity)
+        case.trace.append(activity)
+
+    def _expire(self):
+        results = []
+        if self.case_timeout is None:
+            return results
+        while len(self.open_cases) > 0:
+            caseid, case = next(iter(self.open_cases.items()))
+            if case.last_seen >= self.now - self.case_timeout:
+                break
+            results.append(self.close_case(caseid, "timeout"))
+        return results
+
+    def _po_name(self, var, concurrent):
+        """Po name of a variant under `concurrent`, a relation of activities or, in lifecycle tracewise scope,
+        the result of the lifecycle concurrency finder for its events."""
+
+        if len(var) == 0:
+            return None
+        if self.mode == "lifecycle" and self.scope == "tracewise":
+            key, order = (var, ()), np.arange(len(var))  # the partial order only depends on the variant
+        else:
+            key, order = self.po_cache.key(var, concurrent)
+        cached = self.po_cache.get(key, order)
+        if cached is not None:
+            return cached[1]
+
+        if self.mode == "lifecycle" and self.scope == "tracewise":
+            potn, partialorder, pograph = self._createPObypositions(
+                var, concurrent["positional_concurrencies"], concurrent["positional_equivalences"]
+            )
+        else:
+            potn, partialorder, pograph = self._createPObyactivities(var, concurrent)
+        po_name, self.po_id, _ = cco_partialorder_handlers.check_for_po_isomorphs(
+            partialorder, self.po_id, pograph, self.povariants
+        )
+        self.po_cache.put(key, order, potn, po_name)
+        return po_name
+
+    def close_case(self, caseid, reason="closed"):
+        """Closes an open case and returns its result."""
+
+        start = time.perf_counter()
+        case = self.open_cases.pop(caseid)
+        var = tuple(case.trace)
+
+        if self.mode == "alpha" and self.scope == "logwise":
+            po_name = self._po_name(var, self.concurrency_matrix)
+        elif self.mode == "alpha":
+            concurrencies = case.directly_follows.concurrencies
+            for concurrency in concurrencies:
+                self._add_concurrency(concurrency)
+            relation = ConcurrencyMatrix.from_concurrent(concurrencies, ActivityAlphabet(var))
+            po_name = self._po_name(var, relation)
+        else:
+            result = case.lifecycle.find()
+            for concurrency in result["concurrencies"]:
+                self._add_concurrency(concurrency)
+            if self.scope == "logwise":
+                po_name = self._po_name(var, self.concurrency_matrix)
+            else:
+                var = tuple(case.trace_wlc)
+                po_name = self._po_name(var, result)
+
+        added = sorted(_as_pair(concurrency) for concurrency in self._added)
+        self._added = []
+        latency = time.perf_counter() - start
+        self.closed_cases += 1
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        return {
+            "case:concept:name": caseid,
+            "reason": reason,
+            "events": len(var),
+            "po_name": po_name,
+            "concurrencies_added": added,
+            "latency_s": latency,
+        }
+
+    def flush(self):
+        """Closes all open cases, at the end of the stream."""
+
+        return [self.close_case(caseid, "end_of_stream") for caseid in list(self.open_cases)]
+
+    def stats(self):
+        return dict(
+            events=self.events,
+            closed_cases=self.closed_cases,
+            open_cases=len(self.open_cases),
+            concurrencies=len(self.concurrent),
+            po_variants=len(self.povariants),
+            mean_latency_s=self.latency_total / self.closed_cases if self.closed_cases > 0 else None,
+            max_latency_s=self.latency_max,
+        )
+
+
+def run_stream(lines, output, oracle):
+    """Feeds JSON lines of events to `oracle`, writes one JSON line per closed case to `output` and closes the
+    remaining cases at the end. Returns the statistics of the oracle with the throughput in events per second."""
+
+    start = time.perf_counter()
+    for line in lines:
+        if line.strip() == "":
+            continue
+        for result in oracle.process(json.loads(line)):
+            output.write(json.dumps(result) + "\n")
+    for result in oracle.flush():
+        output.write(json.dumps(result) + "\n")
+    elapsed = time.perf_counter() - start
+
+    stats = oracle.stats()
+    stats["elapsed_s"] = elapsed
+    stats["events_per_s"] = oracle.events / elapsed if elapsed > 0 else None
+    return stats
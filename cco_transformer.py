@@ -1,11 +1,87 @@
 import cco_writers
+import cco_preparators
 import cco_concurrency_finders
 import cco_partialorder_handlers
+import cco_profiling
 from tqdm import tqdm
 import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
 
 
-from Concurrent import Concurrent
+from Concurrent import Concurrent, ConcurrencyMatrix
+from cco_prefix_trie import PrefixTrie
+
+
+def _run_chunk(worker, chunk, kwargs):
+    return [worker(var, **kwargs) for var in chunk]
+
+
+def map_variants(worker, variants, jobs=1, **kwargs):
+    """Yields `worker(var, **kwargs)` for every variant, in the order of `variants`.
+    With `jobs` != 1, variants are processed in chunks by a pool of worker processes."""
+
+    variants = list(variants)
+    if effective_n_jobs(jobs) == 1:
+        for var in variants:
+            yield worker(var, **kwargs)
+        return
+
+    chunksize = max(1, len(variants) // (effective_n_jobs(jobs) * 4))
+    chunks = [variants[i : i + chunksize] for i in range(0, len(variants), chunksize)]
+    results = Parallel(n_jobs=jobs, return_as="generator")(
+        delayed(_run_chunk)(worker, chunk, kwargs) for chunk in chunks
+    )
+    for chunk_results in results:
+        yield from chunk_results
+
+
+_exhausted = object()
+
+
+def _timed(name, iterable):
+    """Yields the items of `iterable`, accumulating the time spent producing them in the profiling timer `name`."""
+
+    iterator = iter(iterable)
+    while True:
+        with cco_profiling.timer(name):
+            item = next(iterator, _exhausted)
+        if item is _exhausted:
+            return
+        yield item
+
+
+def _observe_variant(var, potn):
+    cco_profiling.observe("variant_events", len(var))
+    cco_profiling.observe("po_edges", sum(len(succ) for succ in potn.values()))
+
+
+def _po_by_activities(var, concurrent, createPObyactivities):
+    potn, partialorder, pograph = createPObyactivities(var, concurrent)
+    cco_partialorder_handlers.canonical_form(pograph)  # computed by the worker, cached in the graph
+    return potn, partialorder, pograph
+
+
+def _alpha_po_tracewise(var, createPObyactivities):
+    successors, concurrent = cco_concurrency_finders.findAlphaConcurrency(var)
+    potn, partialorder, pograph = createPObyactivities(var, concurrent)
+    cco_partialorder_handlers.canonical_form(pograph)
+    return concurrent, potn, partialorder, pograph
+
+
+def _alpha_po_from_concurrencies(var_and_concurrent, createPObyactivities):
+    var, concurrent = var_and_concurrent
+    potn, partialorder, pograph = createPObyactivities(var, concurrent)
+    cco_partialorder_handlers.canonical_form(pograph)
+    return concurrent, potn, partialorder, pograph
+
+
+def _lifecycle_po_tracewise(var_and_result, createPObypositions):
+    var, result = var_and_result
+    potn, partialorder, pograph = createPObypositions(
+        var, result["positional_concurrencies"], result["positional_equivalences"]
+    )
+    cco_partialorder_handlers.canonical_form(pograph)
+    return result["concurrencies"], potn, partialorder, pograph
 
 
 def transform(
@@ -18,173 +94,442 @@ def transform(
     caseid_dict,
     keyword_c,
     keyword_s,
+    po_engine="networkx",
+    jobs=1,
+    po_cache_size=10000,
+    iso_timeout=None,
+    iso_budget=None,
+    iso_recheck_timeout=None,
 ):
     """Transforms sequential input log to partially ordered output log
     based on defined concurrency oracle parameters.
     """
 
-    successors = {}
-    concurrent = Concurrent()
+    partialorders, povariants, _ = generate_partial_orders(
+        mode,
+        scope,
+        vars,
+        vars_wlc,
+        keyword_c,
+        keyword_s,
+        po_engine,
+        jobs,
+        po_cache_size=po_cache_size,
+        iso_timeout=iso_timeout,
+        iso_budget=iso_budget,
+        iso_recheck_timeout=iso_recheck_timeout,
+    )
 
-    povariants = []
-    sequentialvariants = vars.keys()
-    sequentialvariants_w_lcinfo = vars_wlc.keys()
+    if not stats_only:
+        filog_towrite = write_partial_orders(filog_towrite, partialorders, caseid_dict)
 
-    if scope == "logwise":  # extract logwise concurrency in pre-run
-        if mode == "alpha":
-            seqv = sequentialvariants
-            for v in tqdm(seqv, desc="analyzing concurrency, completed variants:"):
-                successors, concurrent = cco_concurrency_finders.findAlphaConcurrency(
-                    v, successors, concurrent
-                )
-        elif mode == "lifecycle":
-            seqv_wlc = sequentialvariants_w_lcinfo
-            for v in seqv_wlc:
-                finder = cco_concurrency_finders.LifecycleConcurrencyFinder(
-                    v, keyword_c, keyword_s
-                )
-                result = finder.find()
-                concurrent = concurrent.union(result["concurrencies"])
+    return filog_towrite, povariants
 
-        else:
-            raise NotImplementedError()
 
-    elif scope == "tracewise":
-        pass
-    else:
-        raise NotImplementedError()
+def write_partial_orders(filog_towrite, partialorders, caseid_dict):
+    """Writes the partial orders of all variants to the cases of the log in one pass."""
 
-    if (
-        scope == "logwise"
-    ):  # use extracted concurrency information to build partially ordered traces
-        # in case of logwise concurrency detection, print report on console and export as .csv
-        print("")
-        print("The following concurrencies were detected:")
-        if len(concurrent) > 0:
-            for c in concurrent.to_tuples():
-                print(c)
-            export_df = pd.DataFrame(
-                concurrent.to_tuples(), columns=["activity_1", "activity_2"]
+    po_infos = [
+        (caseid_dict[var], potn, poname_towrite)
+        for var, (potn, poname_towrite) in partialorders.items()
+    ]
+    return cco_writers.writePOinfo(filog_towrite, po_infos)
+
+
+def write_partially_ordered_log(
+    filog_towrite,
+    mode,
+    scope,
+    keep,
+    vars,
+    vars_wlc,
+    caseid_dict,
+    partialorders,
+    outfilename,
+    canonical_ids=None,
+    column_mapping=None,
+):
+    """Reduces the log as chosen by `keep`, writes the partial orders into it and exports it as .xes file, or as
+    .parquet or Arrow IPC file with the columns named by `column_mapping` of the input log.
+    With `canonical_ids` per po name, the canonical id of every case's partially ordered variant is written, too."""
+
+    import pm4py
+
+    if keep != "all":
+        # reduce log to one representative per sequential trace variant
+        with cco_profiling.stage("reduce_seq_variants"):
+            filog_towrite, caseid_dict = cco_preparators.reduce_log_seq_variants(
+                filog_towrite, mode, scope, vars, vars_wlc, caseid_dict
+            )
+
+    # write partial orders into log
+    with cco_profiling.stage("write_po_info"):
+        filog_towrite = write_partial_orders(
+            filog_towrite, partialorders, caseid_dict
+        )
+        if canonical_ids is not None:
+            filog_towrite["case:po_canonical_id"] = filog_towrite["case:po_name"].map(
+                canonical_ids
             )
-            export_df.to_csv("concurrencies.csv", index=False)
+
+    # reduce log to one representative per partially ordered variant
+    if keep == "one_per_po_variant":
+        with cco_profiling.stage("reduce_po_variants"):
+            filog_towrite = cco_preparators.reduce_log_po_variants(filog_towrite)
+
+    # drop analysis column
+    with cco_profiling.stage("get_variants"):
+        if mode == "lifecycle" and scope == "tracewise":
+            vars_at_end = pm4py.get_variants(
+                filog_towrite, activity_key="new:activity:identifier"
+            )
+            filog_towrite = filog_towrite.drop(columns="new:activity:identifier")
         else:
-            print("No concurrencies found in the log.")
+            vars_at_end = pm4py.get_variants(filog_towrite, activity_key="concept:name")
 
-        po_id = 1
+    # check output and report
+    print("Number of variants contained in the exported log:")
+    print(len(vars_at_end))
 
-        for var in tqdm(
-            sequentialvariants, desc="generating partially ordered traces: "
-        ):
-            potn, partialorder, pograph = (
-                cco_partialorder_handlers.createPObyactivities_NxDiGraph(
-                    var, concurrent
-                )
-            )  # generate partial orders using log-concurrency info
+    # write xes or columnar file
+    filog_towrite.reset_index(inplace=True)
+    filog_towrite["is_part_of_po"] = pd.Series(dtype=bool)
+    # print(filog_towrite["po_successors"])
+    # print(filog_towrite["is_part_of_po"])
+    filog_towrite["is_part_of_po"] = filog_towrite["po_successors"].notna()
+    if cco_writers.columnar_format(outfilename) is not None:
+        with cco_profiling.stage("export_columnar"):
+            cco_writers.write_columnar(filog_towrite, outfilename, column_mapping)
+        return
+    filog_towrite["po_successors"] = filog_towrite["po_successors"].apply(
+        lambda x: {"value": None, "children": []} if pd.isna(x) else x
+    )
+    with cco_profiling.stage("export_xes"):
+        cco_writers.write_xes_streaming(filog_towrite, outfilename)
 
-            poname_towrite, po_id, timeout = (
-                cco_partialorder_handlers.check_for_po_isomorphs(
-                    partialorder, po_id, pograph, povariants
-                )
-            )  # check partial orders for isomorphy with already found partial orders
 
-            if not stats_only:
-                caseids_akt_var = caseid_dict[var]
-                filog_towrite = cco_writers.writePOinfo(
-                    filog_towrite, caseids_akt_var, potn, poname_towrite
-                )
+def canonical_ids(povariants):
+    """Canonical id per po name, to join partially ordered variants between logs."""
 
-    elif scope == "tracewise":
-        if mode == "alpha":
-            report_concurrency = Concurrent()
-            po_id = 1
+    return {
+        pograph.graph["id"]: cco_partialorder_handlers.canonical_id(pograph)
+        for pograph in povariants
+    }
 
-            for var in tqdm(
-                sequentialvariants,
-                desc="find concurrency and generate partially ordered traces, completed: ",
-            ):
-                successors, concurrent = cco_concurrency_finders.findAlphaConcurrency(
-                    var
-                )
-                report_concurrency = report_concurrency.union(concurrent)
 
-                potn, partialorder, pograph = (
-                    cco_partialorder_handlers.createPObyactivities_NxDiGraph(
-                        var, concurrent
-                    )
-                )
+def generate_partial_orders(
+    mode,
+    scope,
+    vars,
+    vars_wlc,
+    keyword_c,
+    keyword_s,
+    po_engine="networkx",
+    jobs=1,
+    concurrencies_file="concurrencies.csv",
+    po_cache_size=10000,
+    iso_timeout=None,
+    iso_budget=None,
+    iso_recheck_timeout=None,
+    state=None,
+    po_graphs=None,
+):
+    """Detects concurrency, builds the partial order of every sequential variant and identifies isomorphs,
+    prints the analysis report and exports the concurrencies to `concurrencies_file`.
+    Partial orders of the variants are generated by `jobs` worker processes, isomorphs are identified in order.
+    In logwise scope, partial orders are memoized for up to `po_cache_size` normal forms, 0 disables memoization.
+    Isomorphism checks are given up after `iso_timeout` seconds per comparison or `iso_budget` seconds in total,
+    the variants concerned get provisional po ids. With `iso_recheck_timeout`, their comparisons are re-checked
+    with that time per comparison at the end and variants found isomorphic get the po id of the earlier variant.
+    With an AnalysisState of earlier runs, only variants new to it are analysed and the state is updated; in logwise
+    scope, known variants are re-derived if the relation changed for a pair of their activities.
+    A POGraphCache `po_graphs` shares the logwise partial orders with other analyses of the same log, variants
+    whose concurrent pairs agree with an earlier analysis are not built again.
+    Returns the successors and po name per variant, the partially ordered variants and the concurrency relation,
+    logwise or the union of the tracewise relations, of all variants analysed so far.
+    """
 
-                poname_towrite, po_id, timeout = (
-                    cco_partialorder_handlers.check_for_po_isomorphs(
-                        partialorder, po_id, pograph, povariants
-                    )
+    if po_engine == "networkx":
+        createPObyactivities = cco_partialorder_handlers.createPObyactivities_NxDiGraph
+        createPObypositions = cco_partialorder_handlers.createPObypositions_NxDiGraph
+    elif po_engine in ("bitset", "trie"):  # the trie engine builds single partial orders with bitsets
+        createPObyactivities = cco_partialorder_handlers.createPObyactivities_Bitset
+        createPObypositions = cco_partialorder_handlers.createPObypositions_Bitset
+    else:
+        raise NotImplementedError()
+
+    concurrent = Concurrent()
+
+    povariants = cco_partialorder_handlers.POVariantIndex()
+    po_id = 1
+    budget = None
+    if iso_timeout is not None or iso_budget is not None:
+        budget = cco_partialorder_handlers.IsomorphismBudget(iso_timeout, iso_budget)
+    partialorders = {}  # successors and po name per sequential variant
+    re_derived = 0  # known variants analysed again after the relation changed
+    sequentialvariants = vars.keys()
+    sequentialvariants_w_lcinfo = vars_wlc.keys()
+    if state is not None:  # continue the analysis of earlier runs with the new variants
+        concurrent = Concurrent(state.concurrent)
+        povariants = state.povariants
+        po_id = state.po_id
+        sequentialvariants = state.new_variants(vars)
+        if mode == "lifecycle" and scope == "tracewise":
+            sequentialvariants_w_lcinfo = state.new_variants(vars_wlc)
+        elif mode == "lifecycle":
+            sequentialvariants_w_lcinfo = [
+                var for var in vars_wlc if var not in state.lifecycle_variants
+            ]
+
+    with cco_profiling.stage("concurrency_detection"):
+        if scope == "logwise":  # extract logwise concurrency in pre-run
+            if mode == "alpha":
+                seqv = sequentialvariants
+                directly_follows = cco_concurrency_finders.DirectlyFollowsIndex()
+                if state is not None:
+                    directly_follows = state.directly_follows
+                concurrent = directly_follows.add_variants(
+                    tqdm(seqv, desc="analyzing concurrency, completed variants:")
                 )
+            elif mode == "lifecycle":
+                seqv_wlc = sequentialvariants_w_lcinfo
+                concurrent = cco_concurrency_finders.LogLifecycleConcurrencyFinder(
+                    seqv_wlc, keyword_c, keyword_s
+                ).concurrencies()
+                if state is not None:
+                    concurrent = concurrent.union(state.concurrent)
+                    state.lifecycle_variants.update(seqv_wlc)
 
-                if not stats_only:
-                    caseids_variant = caseid_dict[var]
-                    filog_towrite = cco_writers.writePOinfo(
-                        filog_towrite, caseids_variant, potn, poname_towrite
-                    )
+            else:
+                raise NotImplementedError()
 
+            if state is not None:
+                # known variants with a pair of newly concurrent activities get a different partial order
+                added = Concurrent(c for c in concurrent if c not in state.concurrent)
+                affected = state.affected_variants(added)
+                sequentialvariants = sequentialvariants + affected
+                re_derived = len(affected)
+                print("")
+                print("Known variants re-derived after the concurrency relation changed:")
+                print(re_derived)
+
+        elif scope == "tracewise":
+            pass
+        else:
+            raise NotImplementedError()
+
+    with cco_profiling.stage("partial_orders", profile_calls=True):
+        if (
+            scope == "logwise"
+        ):  # use extracted concurrency information to build partially ordered traces
+            # in case of logwise concurrency detection, print report on console and export as .csv
             print("")
-            print("Concurrent in at least one trace variant:")
-            if len(report_concurrency) > 0:
-                for c in report_concurrency.to_tuples():
+            print("The following concurrencies were detected:")
+            if len(concurrent) > 0:
+                for c in concurrent.to_tuples():
                     print(c)
                 export_df = pd.DataFrame(
-                    report_concurrency.to_tuples(), columns=["activity_1", "activity_2"]
+                    concurrent.to_tuples(), columns=["activity_1", "activity_2"]
                 )
-                export_df.to_csv("concurrencies.csv", index=False)
+                export_df.to_csv(concurrencies_file, index=False)
             else:
                 print("No concurrencies found in the log.")
 
-        elif mode == "lifecycle":
-            po_id = 1
-            for var in tqdm(
-                sequentialvariants_w_lcinfo,
-                desc="find concurrency and generate partially ordered traces: ",
-            ):
-                finder = cco_concurrency_finders.LifecycleConcurrencyFinder(
-                    var, keyword_c, keyword_s
+            # intern the activities of the log once, partial orders look up concurrency in the compact relation
+            concurrency_matrix = ConcurrencyMatrix.from_concurrent(concurrent)
+
+            # variants with the same normal form share their partial order, only the first one is built
+            po_cache = cco_partialorder_handlers.POCache(po_cache_size)
+            keys = [po_cache.key(var, concurrency_matrix) for var in sequentialvariants]
+            if po_cache.maxsize > 0:
+                first_variants = {}
+                for var, (key, order) in zip(sequentialvariants, keys):
+                    first_variants.setdefault(key, var)
+                to_build = list(first_variants.values())
+            else:
+                to_build = list(sequentialvariants)
+            if po_graphs is not None:  # partial orders of other analyses whose concurrent pairs agree
+                graph_keys = {var: (var, key[1]) for var, (key, order) in zip(sequentialvariants, keys)}
+                to_build = [var for var in to_build if graph_keys[var] not in po_graphs]
+                reused = po_graphs.hits
+            built = set(to_build)
+
+            if po_engine == "trie":  # shared prefixes of the variants are processed once
+                pos = cco_partialorder_handlers.createPOsbyactivities_Trie(
+                    to_build, concurrency_matrix
                 )
-                result = finder.find()
-                concurrent = concurrent.union(result["concurrencies"])
-                pos_concurrent = result["positional_concurrencies"]
-                equis = result["positional_equivalences"]
-
-                potn, partialorder, pograph = (
-                    cco_partialorder_handlers.createPObypositions_NxDiGraph(
-                        var, pos_concurrent, equis
-                    )
+            else:
+                pos = map_variants(
+                    _po_by_activities,
+                    to_build,
+                    jobs,
+                    concurrent=concurrency_matrix,
+                    createPObyactivities=createPObyactivities,
                 )
+            pos = _timed("po_construction", pos)  # generate partial orders using log-concurrency info
+            for var, (key, order) in tqdm(
+                zip(sequentialvariants, keys),
+                total=len(sequentialvariants),
+                desc="generating partially ordered traces: ",
+            ):
+                cached = po_cache.get(key, order)
+                if cached is not None:
+                    partialorders[var] = cached
+                    _observe_variant(var, cached[0])
+                    continue
 
-                poname_towrite, po_id, timeout = (
-                    cco_partialorder_handlers.check_for_po_isomorphs(
-                        partialorder, po_id, pograph, povariants
+                if var in built:
+                    potn, partialorder, pograph = next(pos)
+                elif po_graphs is not None and graph_keys[var] in po_graphs:
+                    potn, partialorder, pograph = po_graphs.get(graph_keys[var])
+                else:  # entry was evicted after the first variant of its key was built
+                    with cco_profiling.timer("po_construction"):
+                        potn, partialorder, pograph = createPObyactivities(
+                            var, concurrency_matrix
+                        )
+                _observe_variant(var, potn)
+
+                with cco_profiling.timer("isomorphism_check"):
+                    poname_towrite, po_id, timeout = (
+                        cco_partialorder_handlers.check_for_po_isomorphs(
+                            partialorder, po_id, pograph, povariants, budget
+                        )
+                    )  # check partial orders for isomorphy with already found partial orders
+
+                po_cache.put(key, order, potn, poname_towrite)
+                if po_graphs is not None:
+                    po_graphs.put(graph_keys[var], potn, partialorder, pograph)
+                partialorders[var] = (potn, poname_towrite)
+
+            print("")
+            print("Partial order cache hits / lookups:")
+            print(
+                f"{po_cache.hits} / {po_cache.hits + po_cache.misses} ({po_cache.hit_rate:.1%})"
+            )
+            if po_graphs is not None:
+                print("Partial orders reused from other analyses:")
+                print(po_graphs.hits - reused)
+
+        elif scope == "tracewise":
+            if mode == "alpha":
+                report_concurrency = concurrent
+
+                if po_engine == "trie":  # directly-follows pairs of shared prefixes are analysed once
+                    with cco_profiling.timer("concurrency_by_prefix"):
+                        concurrencies = cco_concurrency_finders.findAlphaConcurrencyByPrefix(
+                            PrefixTrie(sequentialvariants)
+                        )
+                    pos = map_variants(
+                        _alpha_po_from_concurrencies,
+                        zip(sequentialvariants, concurrencies),
+                        jobs,
+                        createPObyactivities=createPObyactivities,
                     )
-                )
+                else:
+                    pos = map_variants(
+                        _alpha_po_tracewise,
+                        sequentialvariants,
+                        jobs,
+                        createPObyactivities=createPObyactivities,
+                    )
+                pos = _timed("po_construction", pos)
+                for var, (trace_concurrent, potn, partialorder, pograph) in tqdm(
+                    zip(sequentialvariants, pos),
+                    total=len(sequentialvariants),
+                    desc="find concurrency and generate partially ordered traces, completed: ",
+                ):
+                    report_concurrency.update(trace_concurrent)
+                    _observe_variant(var, potn)
+
+                    with cco_profiling.timer("isomorphism_check"):
+                        poname_towrite, po_id, timeout = (
+                            cco_partialorder_handlers.check_for_po_isomorphs(
+                                partialorder, po_id, pograph, povariants, budget
+                            )
+                        )
 
-                if not stats_only:
-                    caseids_variant = caseid_dict[var]
-                    filog_towrite = cco_writers.writePOinfo(
-                        filog_towrite, caseids_variant, potn, poname_towrite
+                    partialorders[var] = (potn, poname_towrite)
+
+                print("")
+                print("Concurrent in at least one trace variant:")
+                if len(report_concurrency) > 0:
+                    for c in report_concurrency.to_tuples():
+                        print(c)
+                    export_df = pd.DataFrame(
+                        report_concurrency.to_tuples(), columns=["activity_1", "activity_2"]
                     )
+                    export_df.to_csv(concurrencies_file, index=False)
+                else:
+                    print("No concurrencies found in the log.")
 
-            print("")
-            print("Concurrent in at least one trace variant:")
-            if len(concurrent) > 0:
-                for c in concurrent.to_tuples():
-                    print(c)
-                export_df = pd.DataFrame(
-                    concurrent.to_tuples(), columns=["activity_1", "activity_2"]
+            elif mode == "lifecycle":
+                # lifecycle concurrency of all variants is found at once, partial orders are built per variant
+                results = cco_concurrency_finders.LogLifecycleConcurrencyFinder(
+                    sequentialvariants_w_lcinfo, keyword_c, keyword_s
+                ).find()
+                pos = _timed(
+                    "po_construction",
+                    map_variants(
+                        _lifecycle_po_tracewise,
+                        zip(sequentialvariants_w_lcinfo, results),
+                        jobs,
+                        createPObypositions=createPObypositions,
+                    ),
                 )
-                export_df.to_csv("concurrencies.csv", index=False)
-            else:
-                print("No concurrencies found in the log.")
+                for var, (concurrencies, potn, partialorder, pograph) in tqdm(
+                    zip(sequentialvariants_w_lcinfo, pos),
+                    total=len(sequentialvariants_w_lcinfo),
+                    desc="find concurrency and generate partially ordered traces: ",
+                ):
+                    concurrent.update(concurrencies)
+                    _observe_variant(var, potn)
+
+                    with cco_profiling.timer("isomorphism_check"):
+                        poname_towrite, po_id, timeout = (
+                            cco_partialorder_handlers.check_for_po_isomorphs(
+                                partialorder, po_id, pograph, povariants, budget
+                            )
+                        )
+
+                    partialorders[var] = (potn, poname_towrite)
+
+                print("")
+                print("Concurrent in at least one trace variant:")
+                if len(concurrent) > 0:
+                    for c in concurrent.to_tuples():
+                        print(c)
+                    export_df = pd.DataFrame(
+                        concurrent.to_tuples(), columns=["activity_1", "activity_2"]
+                    )
+                    export_df.to_csv(concurrencies_file, index=False)
+                else:
+                    print("No concurrencies found in the log.")
 
+            else:
+                raise NotImplementedError()
         else:
             raise NotImplementedError()
-    else:
-        raise NotImplementedError()
+
+    if budget is not None and budget.unresolved and iso_recheck_timeout is not None:
+        with cco_profiling.stage("isomorphism_recheck"):
+            renamed = budget.recheck(povariants, iso_recheck_timeout)
+        for var, (potn, poname_towrite) in partialorders.items():
+            if poname_towrite in renamed:
+                partialorders[var] = (potn, renamed[poname_towrite])
+
+    if state is not None:
+        print("")
+        print("New sequential variants analysed in this run / in the log:")
+        analysed = vars_wlc if mode == "lifecycle" and scope == "tracewise" else vars
+        print(f"{len(partialorders) - re_derived} / {len(analysed)}")
+        state.partialorders.update(partialorders)
+        # re-derived variants may leave partially ordered variants behind which no known variant has any more
+        used = {po_name for _, po_name in state.partialorders.values()}
+        for pograph in [pograph for pograph in povariants if pograph.graph["id"] not in used]:
+            povariants.remove(pograph)
+        state.concurrent = Concurrent(concurrent)  # not the relation the next run extends in place
+        state.po_id = po_id
+        partialorders = {var: state.partialorders[var] for var in analysed}
 
     print("")
     print("***")
@@ -192,5 +537,13 @@ def transform(
     print("***")
     print("Number of partially ordered variants:")
     print(len(povariants))
+    if budget is not None:
+        print("Number of isomorphism comparisons exceeding the time budget:")
+        print(budget.timed_out)
+        if iso_recheck_timeout is not None:
+            print("Number of provisional partially ordered variants merged by re-check:")
+            print(budget.merged)
+        print("Number of partially ordered variants with unresolved isomorphism comparisons:")
+        print(len(budget.unresolved))
 
-    return filog_towrite, povariants
+    return partialorders, povariants, Concurrent(concurrent)
@@ -1,8 +1,68 @@
+import gzip
+import math
+import os
 import numpy as np
 import pandas as pd
-import pm4py
 from copy import copy
-from pm4py.objects.conversion.log import converter as log_converter
+from xml.sax.saxutils import quoteattr
+
+# standard xes extensions as (name, prefix, uri), in the order they are written to the log header
+XES_EXTENSIONS = (
+    ("ArtifactLifecycle", "artifactlifecycle", "http://www.xes-standard.org/artifactlifecycle.xesext"),
+    ("Concept", "concept", "http://www.xes-standard.org/concept.xesext"),
+    ("Cost", "cost", "http://www.xes-standard.org/cost.xesext"),
+    ("Identity", "identity", "http://www.xes-standard.org/identity.xesext"),
+    ("Lifecycle", "lifecycle", "http://www.xes-standard.org/lifecycle.xesext"),
+    ("Micro", "micro", "http://www.xes-standard.org/micro.xesext"),
+    ("Organizational", "org", "http://www.xes-standard.org/org.xesext"),
+    ("Semantic", "semantic", "http://www.xes-standard.org/semantic.xesext"),
+    ("Software Communication", "swcomm", "http://www.xes-standard.org/swcomm.xesext"),
+    ("Software Event", "swevent", "http://www.xes-standard.org/swevent.xesext"),
+    ("Software Telemetry", "swtelemetry", "http://www.xes-standard.org/swtelemetry.xesext"),
+    ("Time", "time", "http://www.xes-standard.org/time.xesext"),
+)
+
+# xes tags of python attribute types, all other types are written as strings
+XES_TYPES = {
+    "str": "string",
+    "int": "int",
+    "float": "float",
+    "datetime": "date",
+    "Timestamp": "date",
+    "bool": "boolean",
+    "dict": "list",
+}
+
+# columnar log formats by file extension, read and written with the optional dependency pyarrow
+COLUMNAR_FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "ipc",
+    ".feather": "ipc",
+    ".ipc": "ipc",
+}
+
+
+def columnar_format(filename):
+    """`parquet` or `ipc` (Arrow IPC file, as written by feather) for columnar logs by the extension of
+    `filename`, None for .xes logs."""
+
+    return COLUMNAR_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def import_pyarrow():
+    """pyarrow with its parquet, feather and ipc modules; only needed for columnar logs, so it is optional."""
+
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError(
+            "Reading and writing .parquet and Arrow IPC logs requires pyarrow, install it with `pip install pyarrow`."
+        ) from e
+    return pyarrow
 
 
 def generate_pm4py_list(my_list):
@@ -13,21 +73,24 @@ def generate_pm4py_list(my_list):
     return {"value": None, "children": children}
 
 
-def keepOneRepresentativeAndMultiplicity(log, caseids_variante, m):
-    """Reduces the input log to one representative of the same variant and adds its multiplicity."""
+def keepRepresentativesAndMultiplicities(log, multiplicities, discarded_caseids):
+    """Reduces the input log to one representative per variant and adds the variants' multiplicities.
+
+    `multiplicities` is a Series indexed by the case ids of the representatives, `discarded_caseids` are the
+    case ids of all other cases of the represented variants. The log is filtered with a single boolean mask.
+    """
 
-    if m == 0:
-        # sometimes there is no multiplicity in the log but if the trace is there, it must be 1
-        m = 1
-    repr = caseids_variante[0]  # case id des ersten repräsentanten/case dieser variante
+    # sometimes there is no multiplicity in the log but if the trace is there, it must be 1
+    multiplicities = multiplicities.where(multiplicities != 0, 1)
 
-    # filter part of log with this variant / representative
-    filter_ = log["case:concept:name"] == repr
-    log.loc[filter_, "case:multiplicity"] = m  # save multiplicity of trace variant
+    caseids = log["case:concept:name"]
+    is_repr = caseids.isin(multiplicities.index)
+    if "case:multiplicity" not in log.columns:
+        log["case:multiplicity"] = np.nan
+    # save multiplicity of trace variant
+    log.loc[is_repr, "case:multiplicity"] = caseids[is_repr].map(multiplicities)
 
-    # do not discard first index of part of log in order to keep one representative
-    caseids_variante.pop(0)
-    discard = log["case:concept:name"].isin(caseids_variante)
+    discard = caseids.isin(discarded_caseids)
     log = log[~discard]
 
     return log
@@ -41,34 +104,183 @@ def ordered_activities(case_id: str, log: pd.DataFrame):  # possibly not needed
     return tuple(this_case["concept:name"])
 
 
-def writePOinfo(log, caseids_variant, succ, po_name):
-    """Write successors for every event in the partial order as a 'list'/pm4py-'dict' to log for write_xes export"""
+def writePOinfo(log, po_infos):
+    """Write successors for every event in the partial order as a 'list'/pm4py-'dict' to log for write_xes export.
+
+    `po_infos` holds one (caseids_variant, succ, po_name) entry per variant. The offsets of all cases are taken
+    from a single groupby pass and both columns are filled with one bulk assignment each.
+    """
 
     if "po_successors" not in log.columns:
         log["po_successors"] = pd.Series(dtype="object")
     if "case:po_name" not in log.columns:
         log["case:po_name"] = pd.Series(dtype=int)
 
-    for caseid in caseids_variant:
-        trace = log.query("`case:concept:name` == @caseid")
-        offset = trace.index.min()  # activity id of first activity of current variant
+    case_positions = log.groupby("case:concept:name", sort=False).indices
+    event_ids = log.index.to_numpy()
+
+    target_ids = []
+    successor_lists = []
+    po_names = []
+    for caseids_variant, succ, po_name in po_infos:
+        for caseid in caseids_variant:
+            positions = case_positions.get(caseid)
+            if positions is None:
+                continue
+            offset = event_ids[positions].min()  # activity id of first activity of current variant
+
+            for event, event_successors in succ.items():
+                successor_ids = np.array(event_successors) + offset
+                target_ids.append(event + offset)
+                successor_lists.append(generate_pm4py_list(successor_ids))
+                po_names.append(po_name)
 
-        for event, event_successors in succ.items():
-            event_id = event + offset
-            successor_ids = np.array(event_successors) + offset
-            succ_ids_pm4pylist = generate_pm4py_list(successor_ids)
+    # assert log.index.name == "identity:id"
+    rows = log.index.get_indexer(target_ids)
+    successors_column = log["po_successors"].to_numpy(dtype=object, copy=True)
+    po_name_column = log["case:po_name"].to_numpy(copy=True)
+    for row, succ_ids_pm4pylist in zip(rows, successor_lists):
+        successors_column[row] = succ_ids_pm4pylist
+    po_name_column[rows] = po_names
 
-            # assert log.index.name == "identity:id"
-            log.at[event_id, "po_successors"] = succ_ids_pm4pylist
-            log.at[event_id, "case:po_name"] = po_name
+    log["po_successors"] = successors_column
+    log["case:po_name"] = po_name_column
 
     return log
 
 
 def write_xes_and_drop_NaNs(df: pd.DataFrame, output_file: str):
+    import pm4py
+    from pm4py.objects.conversion.log import converter as log_converter
+
     log_with_postp = log_converter.apply(
         df,
         variant=log_converter.Variants.TO_EVENT_LOG,
         parameters={"stream_postprocessing": True},
     )
     pm4py.write_xes(log_with_postp, output_file)
+
+
+def _is_missing(value):
+    return value is None or value is pd.NaT or (type(value) is float and math.isnan(value))
+
+
+def _xes_attribute(key, value, indent):
+    """Returns the xes lines of one attribute, with the same type mapping as the pm4py exporter."""
+
+    xes_type = "string" if key == "concept:name" else XES_TYPES.get(type(value).__name__, "string")
+    tabs = "\t" * indent
+
+    if xes_type != "list":
+        if xes_type == "date":
+            value = value.isoformat()
+        elif xes_type == "boolean":
+            value = str(value).lower()
+        return f"{tabs}<{xes_type} key={quoteattr(key)} value={quoteattr(str(value))} />\n"
+
+    lines = [f"{tabs}<list key={quoteattr(key)}>\n", f"{tabs}\t<values>\n"]
+    for child_key, child_value in value["children"]:
+        lines.append(_xes_attribute(child_key, child_value, indent + 2))
+    lines.append(f"{tabs}\t</values>\n")
+    lines.append(f"{tabs}</list>\n")
+    return "".join(lines)
+
+
+def _xes_trace(events, case_prefix="case:"):
+    """Returns the xes lines of one trace from its event records. Trace attributes are taken from the first
+    event, missing values are dropped."""
+
+    lines = ["\t<trace>\n"]
+    trace_attributes = {
+        k.replace(case_prefix, ""): v
+        for k, v in events[0].items()
+        if k.startswith(case_prefix) and not _is_missing(v)
+    }
+    trace_attributes.setdefault("concept:name", events[0]["case:concept:name"])
+    for key, value in trace_attributes.items():
+        lines.append(_xes_attribute(key, value, 2))
+
+    for event in events:
+        lines.append("\t\t<event>\n")
+        for key, value in event.items():
+            if not key.startswith(case_prefix) and not _is_missing(value):
+                lines.append(_xes_attribute(key, value, 3))
+        lines.append("\t\t</event>\n")
+    lines.append("\t</trace>\n")
+    return "".join(lines)
+
+
+def write_xes_streaming(df: pd.DataFrame, output_file: str, compress=None, chunksize=10000):
+    """Writes the partially ordered log trace by trace from the DataFrame, without converting it into a pm4py
+    EventLog first. Output matches write_xes_and_drop_NaNs: NaN values are dropped, case attributes are written
+    on trace level. Compresses with gzip if `compress` is True or, by default, if `output_file` ends in .gz."""
+
+    if compress is None:
+        compress = output_file.lower().endswith(".gz")
+
+    prefixes = {key for column in df.columns for key in column.split(":")}
+    extensions = [ext for ext in XES_EXTENSIONS if ext[1] in prefixes]
+
+    # traces in order of first appearance, events of a trace in log order
+    case_positions = df.groupby("case:concept:name", sort=False).indices
+    if len(case_positions) > 0:
+        order = np.concatenate(list(case_positions.values()))
+        if np.any(order != np.arange(len(df))):
+            df = df.iloc[order]
+    trace_ends = np.cumsum([len(positions) for positions in case_positions.values()])
+
+    opener = gzip.open if compress else open
+    with opener(output_file, "wt", encoding="utf-8") as xes:
+        xes.write('<?xml version="1.0" encoding="utf-8" ?>\n')
+        xes.write(
+            '<log xes.version="1849-2016" xes.features="nested-attributes" '
+            'xmlns="http://www.xes-standard.org/">\n'
+        )
+        for name, prefix, uri in extensions:
+            xes.write(f'\t<extension name="{name}" prefix="{prefix}" uri="{uri}" />\n')
+        xes.write('\t<string key="origin" value="csv" />\n')
+
+        trace_start = 0
+        chunk_start = 0
+        while trace_start < len(trace_ends):
+            # chunks always contain complete traces
+            chunk_traces = np.searchsorted(trace_ends, chunk_start + chunksize, side="right")
+            chunk_traces = max(chunk_traces, trace_start + 1)
+            chunk_end = trace_ends[chunk_traces - 1]
+            records = df.iloc[chunk_start:chunk_end].to_dict(orient="records")
+
+            event_start = 0
+            for trace_end in trace_ends[trace_start:chunk_traces]:
+                xes.write(_xes_trace(records[event_start : trace_end - chunk_start]))
+                event_start = trace_end - chunk_start
+
+            trace_start = chunk_traces
+            chunk_start = chunk_end
+
+        xes.write("</log>\n")
+
+
+def write_columnar(df: pd.DataFrame, output_file: str, column_mapping=None):
+    """Writes the partially ordered log as .parquet or Arrow IPC file with one row per event. The successors of
+    an event are written as list<int64> of their `identity:id`s, null for events which are not part of a partial
+    order. `column_mapping` of the input log is inverted, so columns are named as in the input log."""
+
+    pyarrow = import_pyarrow()
+    successors = pyarrow.array(
+        [
+            [int(successor) for _, successor in value["children"]] if isinstance(value, dict) else None
+            for value in df["po_successors"]
+        ],
+        type=pyarrow.list_(pyarrow.int64()),
+    )
+    table = pyarrow.Table.from_pandas(df.drop(columns="po_successors"), preserve_index=False)
+    table = table.add_column(df.columns.get_loc("po_successors"), "po_successors", successors)
+    if column_mapping:
+        columns = {key: column for column, key in column_mapping.items()}
+        table = table.rename_columns([columns.get(name, name) for name in table.column_names])
+
+    if columnar_format(output_file) == "parquet":
+        pyarrow.parquet.write_table(table, output_file)
+    else:
+        # uncompressed, so that reading the file again can memory-map it without decoding
+        pyarrow.feather.write_feather(table, output_file, compression="uncompressed")
@@ -0,0 +1,30 @@
+from benchmarks import synthetic
+
+
+def test_generated_traces_are_reproducible_and_well_formed():
+    traces = synthetic.generate_traces(50, trace_length=12, block_size=4, lifecycle=True, seed=7)
+    assert traces == synthetic.generate_traces(50, trace_length=12, block_size=4, lifecycle=True, seed=7)
+
+    for trace in traces:
+        assert len(trace) == 24
+        for position, (activity, transition) in enumerate(trace):
+            if transition == "complete":
+                assert (activity, "start") in trace[:position]
+
+
+def test_parallel_blocks_generate_variants():
+    sequential = synthetic.generate_variants(100, trace_length=10, parallel_share=0.0)
+    parallel = synthetic.generate_variants(100, trace_length=10, parallel_share=1.0)
+
+    assert len(sequential) == 1
+    assert len(parallel) > 1
+    assert sorted(parallel[0]) == sorted(sequential[0])
+    assert len(synthetic.generate_log(3, trace_length=10)) == 30
+
+
+def test_generated_events_interleave_cases():
+    events = synthetic.generate_events(20, open_cases=5, trace_length=6)
+
+    assert len(events) == 120
+    assert sum(1 for event in events if event.get("case:end")) == 20
+    assert len({event["case:concept:name"] for event in events[:10]}) > 1
@@ -1,26 +1,34 @@
+import os
+import subprocess
+import sys
+
 import pm4py
+import pytest
 from pandas.testing import assert_frame_equal
 
-from cco import cco
+from benchmarks import synthetic
+from typer.testing import CliRunner
+
+from cco import app, cco, sweep
 
 OUT_DIR = "generated_test_data/"
 MODES = "alpha", "lifecycle"
 SCOPES = "logwise", "tracewise"
-KEEPS = "one", "all"
+KEEPS = "one_per_seq_variant", "all", "one_per_po_variant"
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = "pm4py", "pandas", "networkx"
+IMPORT_BUDGET_S = 1.0
 
 
 def generate_test_logs(name):
     for m in MODES:
-        for s in SCOPES:
-            for k in KEEPS:
-                print(f"Processing {m}, {s}, {k}...")
-                if m == "alpha":
-                    inputfile = "repairExample.xes"
-                elif m == "lifecycle":
-                    inputfile = "christest.xes"
-                outputfile = gen_fname(m, s, k, name)
+        print(f"Processing {m}...")
+        if m == "alpha":
+            inputfile = "repairExample.xes"
+        elif m == "lifecycle":
+            inputfile = "christest.xes"
 
-                cco(m, s, k, inputfile, OUT_DIR + outputfile)
+        sweep(inputfile, f"{OUT_DIR}output_{name}", [m], SCOPES, KEEPS)
 
 
 def gen_fname(m, s, k, name):
@@ -45,5 +53,73 @@ def test_coo_regression():
                 assert_frame_equal(target, test)
 
 
+def run_python(code, cwd=REPO_DIR):
+    """Runs `code` in a fresh interpreter with the repository on the path and returns its output."""
+
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    ).stdout.split()
+
+
+def test_cli_import_time_budget():
+    output = run_python(
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import cco\n"
+        "print(time.perf_counter() - start)\n"
+        f"print(*[module for module in {HEAVY_MODULES} if module in sys.modules])"
+    )
+
+    assert output[1:] == []
+    assert float(output[0]) < IMPORT_BUDGET_S
+
+
+def test_stats_only_run_does_not_import_pm4py(tmp_path):
+    infilename = str(tmp_path / "log.xes")
+    synthetic.write_log(infilename, 10, trace_length=6)
+
+    output = run_python(
+        "import sys\n"
+        "from cco import cco\n"
+        f"cco({infilename!r}, None, 'alpha', 'logwise', 'all', True)\n"
+        "print('pm4py' in sys.modules)",
+        cwd=tmp_path,
+    )
+
+    assert output[-1] == "False"
+
+
+def test_sweep_matches_separate_cco_runs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    synthetic.write_log("log.xes", 40, lifecycle=True, trace_length=6, seed=2)
+
+    outfilenames = sweep("log.xes", "sweep")
+
+    assert len(outfilenames) == len(MODES) * len(SCOPES) * len(KEEPS)
+    for m in MODES:
+        for s in SCOPES:
+            for k in KEEPS:
+                cco("log.xes", "cco.xes", m, s, k, False)
+                with open(f"sweep_{m}_{s}_{k}.xes") as swept, open("cco.xes") as separate:
+                    assert swept.read() == separate.read()
+
+
+def test_sweep_without_lifecycle_information_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    synthetic.write_log("log.xes", 10, trace_length=6)
+
+    with pytest.raises(ValueError):
+        sweep("log.xes", "sweep")
+    assert os.listdir(tmp_path) == ["log.xes"]
+
+
+def test_zero_jobs_are_rejected():
+    result = CliRunner().invoke(app, ["log.xes", "out.xes", "--jobs", "0"])
+
+    assert result.exit_code == 2
+    assert "--jobs" in result.output
+
+
 if __name__ == "__main__":
     generate_test_logs("regression")
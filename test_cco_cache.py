@@ -0,0 +1,81 @@
+import os
+
+import cco_cache
+
+
+class Counter:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"calls": self.calls}
+
+
+def test_cache_hit_and_invalidation(tmp_path):
+    infile = tmp_path / "log.xes"
+    infile.write_text("<log />")
+    compute = Counter()
+    cache_dir = str(tmp_path / "cache")
+
+    first = cco_cache.load_or_compute(cache_dir, str(infile), ("alpha", "logwise"), compute)
+    second = cco_cache.load_or_compute(cache_dir, str(infile), ("alpha", "logwise"), compute)
+    other_key = cco_cache.load_or_compute(cache_dir, str(infile), ("alpha", "tracewise"), compute)
+    assert first == second == {"calls": 1}
+    assert other_key == {"calls": 2}
+
+    # touching the file keeps the entry valid, changing its content does not
+    stat = os.stat(infile)
+    os.utime(infile, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert cco_cache.load_or_compute(cache_dir, str(infile), ("alpha", "logwise"), compute) == {"calls": 1}
+    infile.write_text("<log></log>")
+    assert cco_cache.load_or_compute(cache_dir, str(infile), ("alpha", "logwise"), compute) == {"calls": 3}
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = cco_cache.LogCache(str(tmp_path / "cache"), max_bytes=3000)
+    infiles = []
+    for i in range(3):
+        infile = tmp_path / f"log{i}.xes"
+        infile.write_text(str(i))
+        infiles.append(str(infile))
+
+    cache.store(infiles[0], (), b"0" * 1000)
+    cache.store(infiles[1], (), b"1" * 1000)
+    assert cache.load(infiles[0], ())[0]
+    cache.store(infiles[2], (), b"2" * 1000)
+
+    assert cache.load(infiles[0], ())[0]
+    assert not cache.load(infiles[1], ())[0]
+    assert cache.load(infiles[2], ())[0]
+
+
+def test_entries_of_other_cache_versions_are_not_used(tmp_path, monkeypatch):
+    infile = tmp_path / "log.xes"
+    infile.write_text("<log />")
+    cache_dir = str(tmp_path / "cache")
+    compute = Counter()
+
+    cco_cache.load_or_compute(cache_dir, str(infile), ("alpha", "logwise"), compute)
+    monkeypatch.setattr(cco_cache, "CACHE_VERSION", cco_cache.CACHE_VERSION + 1)
+
+    assert cco_cache.load_or_compute(cache_dir, str(infile), ("alpha", "logwise"), compute) == {"calls": 2}
+
+
+def test_caches_sharing_a_directory_keep_each_others_entries(tmp_path):
+    # both caches are opened before either stores, like concurrent runs
+    first = cco_cache.LogCache(str(tmp_path / "cache"))
+    second = cco_cache.LogCache(str(tmp_path / "cache"))
+    infiles = []
+    for i in range(2):
+        infile = tmp_path / f"log{i}.xes"
+        infile.write_text(str(i))
+        infiles.append(str(infile))
+
+    first.store(infiles[0], (), "first")
+    second.store(infiles[1], (), "second")
+
+    cache = cco_cache.LogCache(str(tmp_path / "cache"))
+    assert cache.load(infiles[0], ()) == (True, "first")
+    assert cache.load(infiles[1], ()) == (True, "second")
+    assert len(cache.manifest) == 2
@@ -0,0 +1,104 @@
+from Concurrent import Concurrent
+import pytest
+
+from cco_concurrency_finders import (
+    DirectlyFollowsIndex,
+    IncrementalLifecycleConcurrencyFinder,
+    LifecycleConcurrencyFinder,
+    LogLifecycleConcurrencyFinder,
+    findAlphaConcurrency,
+    findAlphaConcurrencyByPrefix,
+)
+from cco_prefix_trie import PrefixTrie
+
+VARIANTS = [
+    ("a", "b", "c", "d"),
+    ("a", "c", "b", "d"),
+    ("a", "e", "e", "d"),
+    ("a", "d", "b"),
+]
+
+
+def expected_concurrencies():
+    expected = Concurrent()
+    expected.add_pair("b", "c")
+    expected.add_pair("b", "d")
+    return expected
+
+
+def test_find_alpha_concurrency_logwise():
+    successors, concurrent = {}, Concurrent()
+    for variant in VARIANTS:
+        successors, concurrent = findAlphaConcurrency(variant, successors, concurrent)
+
+    assert concurrent == expected_concurrencies()
+    assert successors["a"] == ["b", "c", "e", "d"]
+
+
+def test_find_alpha_concurrency_with_given_successors():
+    successors = {"a": ["b"], "b": ["a", "c"]}
+    _, concurrent = findAlphaConcurrency(("c", "b"), successors)
+
+    expected = Concurrent()
+    expected.add_pair("a", "b")
+    expected.add_pair("b", "c")
+    assert concurrent == expected
+
+
+def test_directly_follows_index_matches_find_alpha_concurrency():
+    index = DirectlyFollowsIndex()
+    concurrent = index.add_variants(VARIANTS)
+
+    assert concurrent == expected_concurrencies()
+    assert {k: set(v) for k, v in index.successors().items()} == {
+        "a": {"b", "c", "e", "d"},
+        "b": {"c", "d"},
+        "c": {"d", "b"},
+        "e": {"e", "d"},
+        "d": {"b"},
+    }
+
+
+def test_find_alpha_concurrency_by_prefix_matches_per_variant():
+    variants = VARIANTS + [("a", "b", "c"), ("a", "b", "c", "b"), ("e",)]
+    trie = PrefixTrie(variants)
+
+    assert len(trie) == 14
+    assert findAlphaConcurrencyByPrefix(trie) == [findAlphaConcurrency(var)[1] for var in variants]
+
+
+LIFECYCLE_VARIANTS = [
+    ("a_start", "b_start", "a_complete", "b_complete"),
+    ("a_start", "a_start", "b_complete", "a_complete", "c_start"),
+    ("c_start", "b_start", "b_complete", "c_complete", "a_start", "a_complete"),
+    ("a_complete", "a_start"),
+    (),
+]
+
+
+def test_log_lifecycle_finder_matches_finder_per_variant():
+    finder = LogLifecycleConcurrencyFinder(LIFECYCLE_VARIANTS, "_complete", "_start")
+    results = finder.find()
+
+    union = Concurrent()
+    for var, result in zip(LIFECYCLE_VARIANTS, results):
+        expected = LifecycleConcurrencyFinder(var, "_complete", "_start").find()
+        assert result == expected
+        union.update(expected["concurrencies"])
+    assert finder.concurrencies() == union
+    assert results[1]["positional_equivalences"] == {0: 3, 1: 3}
+
+
+def test_log_lifecycle_finder_rejects_activities_without_lifecycle():
+    finder = LogLifecycleConcurrencyFinder([("a_start", "b", "a_complete")], "_complete", "_start")
+    with pytest.raises(ValueError):
+        finder.concurrencies()
+
+
+def test_incremental_lifecycle_finder_matches_finder_per_variant():
+    for var in LIFECYCLE_VARIANTS[:3]:
+        finder = IncrementalLifecycleConcurrencyFinder("_complete", "_start")
+        for activity in var:
+            finder.add(activity)
+
+        assert finder.find() == LifecycleConcurrencyFinder(var, "_complete", "_start").find()
@@ -0,0 +1,182 @@
+import networkx as nx
+
+from Concurrent import Concurrent, ConcurrencyMatrix
+from cco_concurrency_finders import LifecycleConcurrencyFinder
+from cco_partialorder_handlers import (
+    canonical_form,
+    canonical_id,
+    IsomorphismBudget,
+    POCache,
+    POVariantIndex,
+    check_for_po_isomorphs,
+    createPObyactivities_Bitset,
+    createPObyactivities_NxDiGraph,
+    createPObypositions_Bitset,
+    createPObypositions_NxDiGraph,
+    createPOsbyactivities_Trie,
+)
+
+
+def build_po(var, *pairs):
+    concurrent = Concurrent()
+    for pair in pairs:
+        concurrent.add_pair(*pair)
+    return createPObyactivities_NxDiGraph(var, concurrent)
+
+
+def test_po_variant_index_matches_isomorphs_in_bucket():
+    povariants = POVariantIndex()
+    po_id = 1
+    names = []
+    for var in [("a", "b", "c", "d"), ("a", "c", "b", "d"), ("a", "b", "d", "c")]:
+        _, partialorder, pograph = build_po(var, ("b", "c"))
+        name, po_id, _ = check_for_po_isomorphs(partialorder, po_id, pograph, povariants)
+        names.append(name)
+
+    assert names == [1, 1, 2]
+    assert len(povariants) == 2
+    assert [g.graph["id"] for g in povariants] == [1, 2]
+
+
+def test_po_variant_index_separates_different_labels():
+    povariants = POVariantIndex()
+    _, _, g1 = build_po(("a", "b"))
+    _, _, g2 = build_po(("a", "c"))
+    povariants.append(g1)
+
+    assert povariants.candidates(g2) == []
+    assert povariants.candidates(build_po(("a", "b"))[2]) == [g1]
+
+
+def as_sets(successors):
+    return {node: set(succ) for node, succ in successors.items()}
+
+
+def test_bitset_engine_matches_networkx_by_activities():
+    var = ("a", "b", "c", "b", "d", "e", "c", "a", "e")
+    concurrent = Concurrent()
+    concurrent.add_pair("b", "c")
+    concurrent.add_pair("e", "e")
+    concurrent.add_pair("a", "d")
+
+    succ_nx, porel_nx, _ = createPObyactivities_NxDiGraph(var, concurrent)
+    succ_bs, porel_bs, _ = createPObyactivities_Bitset(var, concurrent)
+
+    assert list(succ_nx) == list(succ_bs)
+    assert as_sets(succ_nx) == as_sets(succ_bs)
+    assert sorted(porel_nx) == sorted(porel_bs)
+
+
+def test_trie_engine_matches_bitset_for_variants_sharing_prefixes():
+    variants = [
+        ("a", "b", "c", "b", "d", "e", "c", "a", "e"),
+        ("a", "b", "c", "b", "d"),
+        ("a", "b", "c", "e", "e"),
+        ("a", "c", "b"),
+        ("d", "e", "e", "x"),
+    ]
+    concurrent = Concurrent()
+    concurrent.add_pair("b", "c")
+    concurrent.add_pair("e", "e")
+    concurrent.add_pair("a", "d")
+    concurrency_matrix = ConcurrencyMatrix.from_concurrent(concurrent)
+
+    for var, (succ_trie, porel_trie, _) in zip(
+        variants, createPOsbyactivities_Trie(variants, concurrency_matrix)
+    ):
+        succ_bs, porel_bs, _ = createPObyactivities_Bitset(var, concurrency_matrix)
+        assert succ_trie == succ_bs
+        assert porel_trie == porel_bs
+
+
+def test_bitset_engine_matches_networkx_by_positions():
+    var = ("a_start", "b_start", "a_complete", "c_start", "b_complete", "c_complete")
+    result = LifecycleConcurrencyFinder(var, "_complete", "_start").find()
+    args = var, result["positional_concurrencies"], result["positional_equivalences"]
+
+    succ_nx, porel_nx, _ = createPObypositions_NxDiGraph(*args)
+    succ_bs, porel_bs, _ = createPObypositions_Bitset(*args)
+
+    assert list(succ_nx) == list(succ_bs)
+    assert as_sets(succ_nx) == as_sets(succ_bs)
+    assert sorted(porel_nx) == sorted(porel_bs)
+
+
+def test_po_cache_reuses_partial_order_of_equivalent_variants():
+    concurrent = Concurrent()
+    concurrent.add_pair("b", "c")
+    concurrent.add_pair("b", "d")
+    relation = ConcurrencyMatrix.from_concurrent(concurrent)
+    cache = POCache(maxsize=2)
+
+    first, second = ("a", "c", "b", "d", "b"), ("a", "b", "c", "b", "d")
+    key, order = cache.key(first, relation)
+    assert cache.get(key, order) is None
+    potn, _, _ = createPObyactivities_NxDiGraph(first, relation)
+    cache.put(key, order, potn, 1)
+
+    other_key, other_order = cache.key(second, relation)
+    assert other_key == key
+    expected, _, _ = createPObyactivities_NxDiGraph(second, relation)
+    assert cache.get(other_key, other_order) == (
+        {node: sorted(succ) for node, succ in expected.items()},
+        1,
+    )
+    assert cache.key(("a", "b", "d", "c", "b"), relation)[0] != key
+    assert (cache.hits, cache.misses, cache.hit_rate) == (1, 1, 0.5)
+
+    for i in range(2):
+        var = ("x",) * (i + 1)
+        cache.put(*cache.key(var, relation), {}, i)
+    assert len(cache) == 2
+    assert cache.get(key, order) is None
+
+
+def test_exhausted_budget_assigns_provisional_ids_which_recheck_merges():
+    povariants = POVariantIndex()
+    budget = IsomorphismBudget(total=0)
+    po_id = 1
+    names, timeouts = [], []
+    for var in [("a", "b", "c", "d"), ("a", "c", "b", "d"), ("a", "b", "d", "c")]:
+        _, partialorder, pograph = build_po(var, ("b", "c"))
+        pograph.graph["canonical_form"] = None  # as if the canonical form search gave up
+        name, po_id, timeout = check_for_po_isomorphs(
+            partialorder, po_id, pograph, povariants, budget
+        )
+        names.append(name)
+        timeouts.append(timeout)
+
+    assert names == [1, 2, 3]
+    assert timeouts == [False, True, False]
+    assert budget.timed_out == 1
+    assert budget.recheck(povariants, timeout=10) == {2: 1}
+    assert [pograph.graph["id"] for pograph in povariants] == [1, 3]
+    assert budget.merged == 1 and budget.unresolved == []
+
+
+def test_canonical_form_identifies_isomorphic_partial_orders():
+    first = build_po(("a", "b", "c", "b", "d"), ("b", "c"))[2]
+    swapped = build_po(("a", "c", "b", "b", "d"), ("b", "c"))[2]
+    other = build_po(("a", "b", "b", "c", "d"), ("b", "d"))[2]
+    renumbered = nx.relabel_nodes(first, {n: 10 - n for n in first.nodes})
+    renumbered.graph.clear()
+
+    assert canonical_form(first) == canonical_form(swapped) == canonical_form(renumbered)
+    assert canonical_form(first) != canonical_form(other)
+    assert canonical_id(first) == canonical_id(renumbered)
+    assert len(canonical_id(first)) == 16
+
+
+def test_canonical_form_of_large_antichain_and_fallback():
+    antichain = nx.DiGraph()
+    antichain.add_node("start", activity="s")
+    antichain.add_node("end", activity="e")
+    for i in range(50):
+        antichain.add_node(i, activity="x")
+        antichain.add_edges_from([("start", i), (i, "end")])
+    assert canonical_form(antichain) is not None
+
+    two_chains = nx.DiGraph()
+    two_chains.add_nodes_from((i, {"activity": "x"}) for i in range(6))
+    two_chains.add_edges_from([(0, 1), (1, 2), (3, 4), (4, 5)])
+    assert canonical_form(two_chains, max_leaves=1) is None
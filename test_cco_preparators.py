@@ -0,0 +1,234 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pm4py
+import pytest
+
+import cco_preparators
+
+TRACES = {
+    "c2": [("a", "start"), ("a", "complete"), ("b", "start"), ("c", "start"), ("b", "complete"), ("c", "complete")],
+    "c1": [("a", "start"), ("a", "complete"), ("c", "start"), ("b", "start"), ("c", "complete"), ("b", "complete")],
+    "c3": [("a", "start"), ("a", "complete"), ("b", "start"), ("c", "start"), ("b", "complete"), ("c", "complete")],
+    "c0": [("a", "start"), ("a", "complete"), ("b", "start"), ("b", "complete"), ("c", "start"), ("c", "complete")],
+}
+
+
+def write_xes(path):
+    lines = [
+        '<?xml version="1.0" encoding="utf-8" ?>',
+        '<log xes.version="1849-2016" xmlns="http://www.xes-standard.org/">',
+    ]
+    minute = 0
+    for caseid, events in TRACES.items():
+        lines.append(f'<trace><string key="concept:name" value="{caseid}" />')
+        for activity, transition in events:
+            minute += 1
+            lines.append(
+                f'<event><string key="concept:name" value="{activity}" />'
+                f'<string key="lifecycle:transition" value="{transition}" />'
+                f'<date key="time:timestamp" value="2024-01-01T00:{minute:02d}:00+00:00" /></event>'
+            )
+        lines.append("</trace>")
+    lines.append("</log>")
+    content = "\n".join(lines).encode()
+
+    if path.suffix == ".gz":
+        with gzip.open(path, "wb") as xes:
+            xes.write(content)
+    else:
+        path.write_bytes(content)
+
+
+@pytest.mark.parametrize("mode", ["alpha", "lifecycle"])
+@pytest.mark.parametrize("scope", ["logwise", "tracewise"])
+def test_read_log_variants_matches_read_log(tmp_path, mode, scope):
+    infilename = tmp_path / "log.xes"
+    write_xes(infilename)
+
+    filog_towrite, _, vars_wlc, caseid_dict, keyword_c, keyword_s = cco_preparators.read_log(
+        str(infilename), mode, scope
+    )
+    vars = pm4py.get_variants(filog_towrite, activity_key="concept:name")
+
+    streamed = cco_preparators.read_log_variants(str(infilename), mode, scope)
+
+    assert list(streamed[0].items()) == list(vars.items())
+    assert list(streamed[1].items()) == list(vars_wlc.items())
+    assert {k: sorted(v) for k, v in streamed[2].items()} == {
+        k: sorted(v) for k, v in caseid_dict.items()
+    }
+    assert streamed[3:] == (keyword_c, keyword_s)
+
+
+def test_read_log_variants_reads_gzip(tmp_path):
+    infilename = tmp_path / "log.xes.gz"
+    write_xes(infilename)
+
+    vars, vars_wlc, caseid_dict, keyword_c, keyword_s = cco_preparators.read_log_variants(
+        str(infilename), "lifecycle", "logwise"
+    )
+
+    assert vars == {("a", "b", "c"): 3, ("a", "c", "b"): 1}
+    assert len(vars_wlc) == 3
+    assert (keyword_c, keyword_s) == ("_complete", "_start")
+
+
+def test_most_frequent_variants_by_coverage_and_top_variants():
+    vars = {("a",): 1, ("b",): 5, ("c",): 3, ("d",): 1}
+
+    assert cco_preparators.most_frequent_variants(vars, coverage=0.5) == ({("b",): 5}, 5)
+    assert cco_preparators.most_frequent_variants(vars, coverage=0.9) == (
+        {("a",): 1, ("b",): 5, ("c",): 3},
+        1,
+    )
+    assert cco_preparators.most_frequent_variants(vars, top_variants=2) == (
+        {("b",): 5, ("c",): 3},
+        2,
+    )
+    assert cco_preparators.most_frequent_variants(vars, coverage=0.9, top_variants=2)[1] == 2
+    assert cco_preparators.most_frequent_variants(vars) == (vars, 0)
+    with pytest.raises(ValueError):
+        cco_preparators.most_frequent_variants(vars, coverage=0)
+
+
+def test_select_variants_keeps_cases_of_selected_variants(tmp_path):
+    path = tmp_path / "log.xes"
+    write_xes(path)
+    vars, vars_wlc, caseid_dict, _, _ = cco_preparators.read_log_variants(
+        str(path), "lifecycle", "tracewise"
+    )
+
+    vars, vars_wlc, caseid_dict, omitted_cases = cco_preparators.select_variants(
+        "lifecycle", "tracewise", vars, vars_wlc, caseid_dict, top_variants=1
+    )
+
+    assert omitted_cases == 2
+    assert list(caseid_dict.values()) == [["c2", "c3"]]
+    assert list(vars_wlc.values()) == [2]
+
+
+def test_select_variants_keeps_interleavings_of_kept_cases_in_lifecycle_logwise(tmp_path):
+    path = tmp_path / "log.xes"
+    write_xes(path)
+    vars, all_vars_wlc, caseid_dict, _, _ = cco_preparators.read_log_variants(
+        str(path), "lifecycle", "logwise"
+    )
+
+    vars, vars_wlc, caseid_dict, omitted_cases = cco_preparators.select_variants(
+        "lifecycle", "logwise", vars, all_vars_wlc, caseid_dict, top_variants=1
+    )
+
+    assert omitted_cases == 1
+    assert sorted(caseid_dict[("a", "b", "c")]) == ["c0", "c2", "c3"]
+    # the interleaving of the kept case c0 is not the most frequent one
+    assert ("a_start", "a_complete", "b_start", "b_complete", "c_start", "c_complete") in vars_wlc
+    assert vars_wlc == all_vars_wlc
+
+
+def test_compact_columns_and_lifecycle_identifiers_share_strings():
+    # strings held as python objects, the default string dtype without pyarrow
+    dtype = pd.StringDtype("python", na_value=np.nan)
+    log = pd.DataFrame(
+        {
+            "case:concept:name": pd.Series(["c" + "1", "c" + "1", "c" + "2", None], dtype=dtype),
+            "concept:name": pd.Series(["a" + "x", "b", "a" + "x", "b"], dtype=dtype),
+            "lifecycle:transition": pd.Series(["start", "complete", "start", None], dtype=dtype),
+        }
+    )
+
+    log = cco_preparators.compact_columns(log)
+    identifiers = cco_preparators.lifecycle_identifiers(
+        log["concept:name"], log["lifecycle:transition"]
+    )
+
+    assert log["concept:name"].dtype == dtype
+    assert log["concept:name"].iloc[0] is log["concept:name"].iloc[2]
+    assert log["case:concept:name"].isna().tolist() == [False, False, False, True]
+    assert identifiers.iloc[0] is identifiers.iloc[2]
+    assert identifiers.tolist()[:3] == ["ax_start", "b_complete", "ax_start"]
+    assert pd.isna(identifiers.iloc[3])
+
+
+def event_table():
+    """TRACES as table with one row per event and pipeline column names, the cases interleaved."""
+
+    rows = [
+        {"case": caseid, "activity": activity, "lc": transition, "ts": f"2024-01-01T00:{position:02d}:00Z"}
+        for caseid, events in TRACES.items()
+        for position, (activity, transition) in enumerate(events)
+    ]
+    return pd.DataFrame(sorted(rows, key=lambda row: row["ts"]))
+
+
+MAPPING = cco_preparators.column_mapping(case="case", activity="activity", lifecycle="lc", timestamp="ts")
+
+
+def test_columnar_event_log_maps_columns_and_keeps_cases_together():
+    log = cco_preparators.columnar_event_log(event_table(), MAPPING)
+
+    assert list(log.columns) == ["case:concept:name", "concept:name", "lifecycle:transition", "time:timestamp"]
+    assert pd.api.types.is_datetime64_any_dtype(log["time:timestamp"])
+    assert log["case:concept:name"].tolist() == [caseid for caseid in TRACES for _ in range(6)]
+    assert list(zip(log["concept:name"][:6], log["lifecycle:transition"][:6])) == TRACES["c2"]
+
+    with pytest.raises(ValueError, match="time:timestamp"):
+        cco_preparators.columnar_event_log(event_table(), {"case": "case:concept:name", "activity": "concept:name"})
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow"])
+def test_columnar_log_matches_xes_log(tmp_path, monkeypatch, suffix):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.feather
+    import pyarrow.parquet
+
+    from cco import cco
+
+    xes = tmp_path / "log.xes"
+    write_xes(xes)
+    infilename = str(tmp_path / f"log{suffix}")
+    table = pyarrow.Table.from_pandas(event_table())
+    if suffix == ".parquet":
+        pyarrow.parquet.write_table(table, infilename)
+    else:
+        pyarrow.feather.write_feather(table, infilename)
+
+    assert cco_preparators.read_log_variants(
+        infilename, "lifecycle", "tracewise", MAPPING
+    ) == cco_preparators.read_log_variants(str(xes), "lifecycle", "tracewise")
+
+    outfilename = str(tmp_path / f"out{suffix}")
+    columns = dict(case_column="case", activity_column="activity", lifecycle_column="lc", timestamp_column="ts")
+    monkeypatch.chdir(tmp_path)  # the concurrencies are exported to the working directory
+    cco(infilename, outfilename, "lifecycle", "logwise", "all", False, **columns)
+    result = pyarrow.feather.read_table(outfilename) if suffix == ".arrow" else pyarrow.parquet.read_table(outfilename)
+
+    assert result.schema.field("po_successors").type == pyarrow.list_(pyarrow.int64())
+    assert {"case", "activity", "identity:id", "is_part_of_po", "case:po_name"} <= set(result.column_names)
+    assert result.num_rows == 12
+
+
+def test_sweep_and_server_read_columnar_logs_with_column_mapping(tmp_path, monkeypatch):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    import cco_server
+    from cco import cco, sweep
+
+    monkeypatch.chdir(tmp_path)
+    pyarrow.parquet.write_table(pyarrow.Table.from_pandas(event_table()), "log.parquet")
+    columns = dict(case_column="case", activity_column="activity", lifecycle_column="lc", timestamp_column="ts")
+
+    assert sweep("log.parquet", "sweep", ["lifecycle"], ["logwise"], ["all"], extension=".parquet", **columns) == [
+        "sweep_lifecycle_logwise_all.parquet"
+    ]
+    cco("log.parquet", "cco.parquet", "lifecycle", "logwise", "all", False, **columns)
+    assert pyarrow.parquet.read_table("sweep_lifecycle_logwise_all.parquet").equals(
+        pyarrow.parquet.read_table("cco.parquet")
+    )
+
+    loaded = cco_server.LoadedLog("log.parquet", "lifecycle", "tracewise", column_mapping=MAPPING)
+    assert loaded.summary()["cases"] == len(TRACES)
+    loaded.export("served.parquet")
+    assert {"case", "activity", "case:po_name"} <= set(pyarrow.parquet.read_table("served.parquet").column_names)
@@ -0,0 +1,53 @@
+import json
+
+import cco_profiling
+from benchmarks import synthetic
+from cco import cco
+
+
+def test_profiling_records_nested_stages_timers_and_counters(tmp_path):
+    report_file = tmp_path / "report.json"
+    finished = []
+
+    with cco_profiling.profiling(str(report_file), hooks=[finished.append]) as profiler:
+        with cco_profiling.stage("load_log"):
+            with cco_profiling.stage("read_log"):
+                data = [0] * 100000
+        for n in (3, 5):
+            with cco_profiling.timer("po_construction"):
+                cco_profiling.observe("variant_events", n)
+
+    assert [stage["name"] for stage in finished] == ["load_log/read_log", "load_log"]
+    assert finished[0]["tracemalloc_peak_bytes"] > 7 * len(data)
+    assert finished[1]["tracemalloc_peak_bytes"] >= finished[0]["tracemalloc_peak_bytes"]
+    assert profiler.timers["po_construction"]["calls"] == 2
+    assert profiler.counters["variant_events"] == dict(count=2, total=8, min=3, max=5)
+
+    report = json.loads(report_file.read_text())
+    assert report["total"]["wall_s"] >= report["stages"][1]["wall_s"]
+    assert report["counters"] == profiler.counters
+
+
+def test_instrumentation_without_active_profiler_does_nothing():
+    with cco_profiling.stage("read_log"):
+        with cco_profiling.timer("po_construction"):
+            cco_profiling.observe("variant_events", 1)
+
+
+def test_cli_traces_memory_only_on_request(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    infilename = "log.xes"
+    synthetic.write_log(infilename, 10, trace_length=6)
+
+    peaks = []
+    for profile_memory in (False, True):
+        report_file = tmp_path / f"report_{profile_memory}.json"
+        cco(
+            infilename, None, "alpha", "logwise", "all", True,
+            profile_report=str(report_file), profile_memory=profile_memory,
+        )
+        report = json.loads(report_file.read_text())
+        peaks.append(max(stage["tracemalloc_peak_bytes"] for stage in report["stages"]))
+
+    assert peaks[0] == 0
+    assert peaks[1] > 0
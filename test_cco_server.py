@@ -0,0 +1,106 @@
+import contextlib
+import io
+import threading
+
+import pytest
+
+import cco_server
+from benchmarks import synthetic
+
+
+@pytest.fixture
+def server(tmp_path):
+    store = cco_server.LogStore(max_logs=2)
+    server = cco_server.make_server(store, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield cco_server.CCOClient(port=server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def log(tmp_path):
+    infile = str(tmp_path / "log.xes")
+    synthetic.write_log(infile, 30, trace_length=8, lifecycle=True, seed=3)
+    return infile
+
+
+def test_queries_on_loaded_log(server, log, tmp_path):
+    summary = server.load(log)
+    assert summary["cases"] == 30
+    assert [entry["path"] for entry in server.logs()] == [summary["path"]]
+
+    case = server.case(log, "case_1")
+    assert len(case["variant"]) == 8
+    assert case["po_name"] in [entry["po_name"] for entry in server.po_variants(log)]
+    assert sum(entry["cases"] for entry in server.po_variants(log)) == 30
+
+    pairs = server.concurrencies(log)
+    assert len(pairs) == summary["concurrencies"]
+    a, b = pairs[0]
+    assert b in server.concurrencies(log, a)
+
+    outfile = tmp_path / "out.xes"
+    assert server.export(log, str(outfile), keep="one_per_po_variant") == str(outfile)
+    assert outfile.stat().st_size > 0
+
+    with pytest.raises(cco_server.CCOServerError) as error:
+        server.case(log, "no such case")
+    assert error.value.status == 404
+
+
+@pytest.mark.parametrize("mode, scope", [("alpha", "logwise"), ("lifecycle", "tracewise")])
+def test_loaded_log_reports_like_a_single_run(log, mode, scope):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        loaded = cco_server.LoadedLog(log, mode, scope)
+
+    assert "in this run" not in output.getvalue()
+    assert len(loaded.concurrent) > 0
+    for a, b in loaded.concurrencies():
+        assert b in loaded.concurrencies(a)
+
+
+def test_least_recently_used_log_is_evicted(server, log):
+    server.load(log, "alpha", "logwise")
+    server.load(log, "lifecycle", "logwise")
+    server.load(log, "alpha", "logwise")  # now the most recently used
+    server.load(log, "alpha", "tracewise")
+
+    loaded = {(entry["mode"], entry["scope"]) for entry in server.logs()}
+    assert loaded == {("alpha", "logwise"), ("alpha", "tracewise")}
+    assert server.evict(log, "alpha", "tracewise")
+    assert not server.evict(log, "alpha", "tracewise")
+
+
+def test_changed_log_is_loaded_again(server, log):
+    assert server.load(log)["cases"] == 30
+    synthetic.write_log(log, 20, trace_length=8, lifecycle=True, seed=4)
+
+    assert server.load(log)["cases"] == 20
+    assert sum(entry["cases"] for entry in server.po_variants(log)) == 20
+
+
+def test_unix_socket(tmp_path, log):
+    socket_path = str(tmp_path / "cco.sock")
+    server = cco_server.make_server(cco_server.LogStore(), socket_path=socket_path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = cco_server.CCOClient(socket_path=socket_path)
+        assert client.health() == {"status": "ok"}
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert client.load(log, "lifecycle", "tracewise")["cases"] == 30
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_unix_socket_does_not_replace_other_files(tmp_path):
+    socket_path = tmp_path / "cco.sock"
+    socket_path.write_text("not a socket")
+
+    with pytest.raises(FileExistsError):
+        cco_server.make_server(cco_server.LogStore(), socket_path=str(socket_path))
+    assert socket_path.read_text() == "not a socket"
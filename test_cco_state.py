@@ -0,0 +1,89 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+import cco_transformer
+from cco_state import AnalysisState
+
+
+def run(mode, scope, vars, state=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        partialorders, _, _ = cco_transformer.generate_partial_orders(
+            mode, scope, vars, vars, "_complete", "_start", concurrencies_file=os.devnull, state=state
+        )
+    return {var: po_name for var, (_, po_name) in partialorders.items()}
+
+
+def partition(po_names):
+    groups = {}
+    for var, po_name in po_names.items():
+        groups.setdefault(po_name, set()).add(var)
+    return sorted(sorted(group) for group in groups.values())
+
+
+@pytest.mark.parametrize("scope", ["logwise", "tracewise"])
+def test_resumed_analysis_matches_analysis_of_whole_log(tmp_path, scope):
+    day_1 = {("a", "b", "c"): 2, ("a", "c"): 1}
+    day_2 = {("b", "a", "c"): 1, ("a", "b", "c"): 1}
+    whole = run("alpha", scope, {**day_1, **day_2})
+
+    state_file = str(tmp_path / "state.pkl")
+    state = AnalysisState.load(state_file, "alpha", scope)
+    run("alpha", scope, day_1, state)
+    state.save(state_file)
+    state = AnalysisState.load(state_file, "alpha", scope)
+    resumed = run("alpha", scope, day_2, state)
+
+    # po ids of re-derived variants are new, but the variants are grouped the same way
+    assert partition(resumed) == partition({var: whole[var] for var in day_2})
+    assert partition({var: po_name for var, (_, po_name) in state.partialorders.items()}) == partition(whole)
+
+
+def test_logwise_relation_change_re_derives_affected_variants():
+    state = AnalysisState("alpha", "logwise")
+    first = run("alpha", "logwise", {("a", "b", "c"): 1, ("c", "d"): 1}, state)
+
+    assert state.affected_variants({frozenset(("a", "b"))}) == [("a", "b", "c")]
+    assert state.affected_variants({frozenset(("d",))}) == []
+
+    second = run("alpha", "logwise", {("b", "a", "c"): 1}, state)
+
+    # a and b became concurrent, so both orders share the partial order, (c, d) is unchanged
+    assert state.partialorders[("a", "b", "c")][1] == second[("b", "a", "c")]
+    assert state.partialorders[("c", "d")][1] == first[("c", "d")]
+
+
+def report(vars, state):
+    """Analysis report of a logwise alpha run, the line after each heading by heading."""
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        cco_transformer.generate_partial_orders(
+            "alpha", "logwise", vars, vars, "_complete", "_start", concurrencies_file=os.devnull, state=state
+        )
+    lines = output.getvalue().splitlines()
+    return dict(zip(lines, lines[1:]))
+
+
+def test_re_derived_variants_leave_no_unused_po_variants():
+    whole = report(
+        {("a", "b", "c"): 1, ("c", "d"): 1, ("b", "a", "c"): 1}, AnalysisState("alpha", "logwise")
+    )
+    state = AnalysisState("alpha", "logwise")
+    report({("a", "b", "c"): 1, ("c", "d"): 1}, state)
+    resumed = report({("b", "a", "c"): 1}, state)
+
+    heading = "Number of partially ordered variants:"
+    assert resumed[heading] == whole[heading] == "2"
+    assert resumed["Known variants re-derived after the concurrency relation changed:"] == "1"
+    assert resumed["New sequential variants analysed in this run / in the log:"] == "1 / 1"
+
+
+def test_state_of_other_configuration_is_rejected(tmp_path):
+    state_file = str(tmp_path / "state.pkl")
+    AnalysisState("alpha", "logwise").save(state_file)
+
+    with pytest.raises(ValueError):
+        AnalysisState.load(state_file, "lifecycle", "logwise")
@@ -0,0 +1,76 @@
+import io
+import json
+
+from cco_stream import StreamingOracle, run_stream
+
+
+def events(case, activities, start=0, transition=None):
+    for i, activity in enumerate(activities):
+        event = {"case:concept:name": case, "concept:name": activity, "time:timestamp": start + i}
+        if transition is not None:
+            event["lifecycle:transition"] = transition
+        yield event
+
+
+def test_alpha_logwise_reports_concurrencies_and_po_names_of_closed_cases():
+    oracle = StreamingOracle("alpha", "logwise")
+    for event in list(events("1", "abc")) + list(events("2", "bac", start=10)):
+        assert oracle.process(event) == []
+
+    (result,) = oracle.process({"case:concept:name": "1", "case:end": True})
+    assert result["case:concept:name"] == "1"
+    assert result["reason"] == "closed"
+    assert result["events"] == 3
+    assert result["po_name"] == 1
+    assert result["concurrencies_added"] == [["a", "b"]]
+
+    (result,) = oracle.flush()
+    assert result["reason"] == "end_of_stream"
+    assert result["po_name"] == 1  # isomorphic to case 1 under the logwise relation
+    assert result["concurrencies_added"] == []
+
+
+def test_lifecycle_tracewise_partial_order_of_overlapping_intervals():
+    oracle = StreamingOracle("lifecycle", "tracewise")
+    stream = [
+        ("1", "a", "start"),
+        ("1", "b", "start"),
+        ("1", "a", "complete"),
+        ("1", "b", "complete"),
+        ("2", "b", "start"),
+        ("2", "a", "start"),
+        ("2", "b", "complete"),
+        ("2", "a", "complete"),
+    ]
+    for case, activity, transition in stream:
+        oracle.process(
+            {"case:concept:name": case, "concept:name": activity, "lifecycle:transition": transition}
+        )
+
+    first, second = oracle.flush()
+    assert first["concurrencies_added"] == [["a", "b"]]
+    assert first["po_name"] == second["po_name"]
+
+
+def test_cases_are_closed_by_timeout_and_eviction():
+    oracle = StreamingOracle("alpha", "tracewise", case_timeout=10, max_open_cases=2)
+    for event in list(events("1", "ab")) + list(events("2", "ab", start=2)):
+        oracle.process(event)
+
+    assert [r["reason"] for r in oracle.process(next(events("3", "a", start=4)))] == ["evicted"]
+    (timed_out,) = oracle.process(next(events("3", "b", start=14)))
+    assert (timed_out["case:concept:name"], timed_out["reason"]) == ("2", "timeout")
+    assert list(oracle.open_cases) == ["3"]
+
+
+def test_run_stream_writes_json_lines():
+    lines = [json.dumps(event) for event in events("1", "abab")]
+    output = io.StringIO()
+
+    stats = run_stream(lines, output, StreamingOracle("alpha", "tracewise"))
+
+    (result,) = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert result["concurrencies_added"] == [["a", "b"]]
+    assert stats["events"] == 4
+    assert stats["closed_cases"] == 1
+    assert stats["events_per_s"] > 0
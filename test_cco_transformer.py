@@ -0,0 +1,34 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+import cco_preparators
+import cco_transformer
+from benchmarks import synthetic
+
+
+@pytest.fixture(scope="module")
+def log(tmp_path_factory):
+    infilename = str(tmp_path_factory.mktemp("log") / "log.xes")
+    synthetic.write_log(infilename, 60, lifecycle=True, trace_length=8, seed=5)
+    return infilename
+
+
+def po_names(log, mode, scope, jobs):
+    vars, vars_wlc, _, keyword_c, keyword_s = cco_preparators.read_log_variants(log, mode, scope)
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        partialorders, _, _ = cco_transformer.generate_partial_orders(
+            mode, scope, vars, vars_wlc, keyword_c, keyword_s, "bitset", jobs, concurrencies_file=os.devnull
+        )
+    return {var: po_name for var, (_, po_name) in partialorders.items()}
+
+
+@pytest.mark.parametrize("mode", ["alpha", "lifecycle"])
+@pytest.mark.parametrize("scope", ["logwise", "tracewise"])
+def test_worker_processes_give_the_same_po_names(log, mode, scope):
+    sequential = po_names(log, mode, scope, jobs=1)
+
+    assert len(sequential) > 1
+    assert po_names(log, mode, scope, jobs=2) == sequential
@@ -0,0 +1,188 @@
+import contextlib
+import io
+import os
+from copy import deepcopy
+
+import numpy as np
+import pandas as pd
+import pm4py
+import pytest
+from pandas.testing import assert_frame_equal
+
+import cco_preparators
+import cco_transformer
+import cco_writers
+
+TRACES = {
+    "c1": [("a", "start", "ann"), ("a", "complete", "ann"), ("b", "start", None), ("c", "start", "bob"),
+           ("b", "complete", None), ("c", "complete", "bob")],
+    "c2": [("a", "start", "ann"), ("a", "complete", None), ("c", "start", "bob"), ("b", "start", "bob"),
+           ("c", "complete", "bob"), ("b", "complete", "ann")],
+    "c3": [("a", "start", None), ("a", "complete", "ann"), ("b", "start", "ann"), ("c", "start", "bob"),
+           ("b", "complete", "ann"), ("c", "complete", "bob")],
+}
+
+
+def write_xes(path):
+    """Log with lifecycle transitions, events without resource and a case attribute on some traces."""
+
+    lines = [
+        '<?xml version="1.0" encoding="utf-8" ?>',
+        '<log xes.version="1849-2016" xmlns="http://www.xes-standard.org/">',
+    ]
+    minute = 0
+    for caseid, events in TRACES.items():
+        lines.append(f'<trace><string key="concept:name" value="{caseid}" />')
+        if caseid != "c2":
+            lines.append('<string key="priority" value="high" />')
+        for activity, transition, resource in events:
+            minute += 1
+            lines.append(
+                f'<event><string key="concept:name" value="{activity}" />'
+                f'<string key="lifecycle:transition" value="{transition}" />'
+                + (f'<string key="org:resource" value="{resource}" />' if resource else "")
+                + f'<date key="time:timestamp" value="2024-01-01T00:{minute:02d}:00+00:00" /></event>'
+            )
+        lines.append("</trace>")
+    lines.append("</log>")
+    path.write_text("\n".join(lines))
+
+
+def write_po_info_per_case(log, caseids_variant, succ, po_name):
+    """writePOinfo before it was rewritten as one bulk pass, which queried the log per case."""
+
+    if "po_successors" not in log.columns:
+        log["po_successors"] = pd.Series(dtype="object")
+    if "case:po_name" not in log.columns:
+        log["case:po_name"] = pd.Series(dtype=int)
+
+    for caseid in caseids_variant:
+        trace = log.query("`case:concept:name` == @caseid")
+        offset = trace.index.min()
+        for event, event_successors in succ.items():
+            event_id = event + offset
+            successor_ids = np.array(event_successors) + offset
+            log.at[event_id, "po_successors"] = cco_writers.generate_pm4py_list(successor_ids)
+            log.at[event_id, "case:po_name"] = po_name
+    return log
+
+
+def analyse(path, mode, scope):
+    with contextlib.redirect_stdout(io.StringIO()):
+        filog_towrite, _, vars_wlc, caseid_dict, keyword_c, keyword_s = cco_preparators.read_log(
+            str(path), mode, scope
+        )
+        vars = pm4py.get_variants(filog_towrite, activity_key="concept:name")
+        partialorders, _, _ = cco_transformer.generate_partial_orders(
+            mode, scope, vars, vars_wlc, keyword_c, keyword_s, concurrencies_file=os.devnull
+        )
+    return filog_towrite, vars, vars_wlc, caseid_dict, partialorders
+
+
+@pytest.mark.parametrize("mode, scope", [("alpha", "logwise"), ("lifecycle", "tracewise")])
+def test_bulk_po_info_matches_per_case_writer(tmp_path, mode, scope):
+    path = tmp_path / "log.xes"
+    write_xes(path)
+    filog_towrite, _, _, caseid_dict, partialorders = analyse(path, mode, scope)
+
+    bulk = cco_transformer.write_partial_orders(filog_towrite.copy(), partialorders, caseid_dict)
+    per_case = filog_towrite.copy()
+    for var, (potn, po_name) in partialorders.items():
+        per_case = write_po_info_per_case(per_case, caseid_dict[var], potn, po_name)
+
+    assert bulk["po_successors"].notna().sum() > 0
+    assert bulk["po_successors"].tolist() == per_case["po_successors"].tolist()
+    assert_frame_equal(
+        bulk.drop(columns="po_successors"),
+        per_case.drop(columns="po_successors"),
+        check_dtype=False,
+    )
+
+
+def export_frame(filog_towrite, caseid_dict, partialorders):
+    """Annotated log as write_partially_ordered_log passes it to the xes writer."""
+
+    log = cco_transformer.write_partial_orders(filog_towrite.copy(), partialorders, caseid_dict)
+    log = log.drop(columns="new:activity:identifier", errors="ignore").reset_index()
+    log["is_part_of_po"] = log["po_successors"].notna()
+    log["po_successors"] = log["po_successors"].apply(
+        lambda x: {"value": None, "children": []} if pd.isna(x) else x
+    )
+    return log
+
+
+@pytest.mark.parametrize("mode, scope", [("alpha", "logwise"), ("lifecycle", "tracewise")])
+def test_streaming_xes_writer_matches_pm4py_export(tmp_path, mode, scope):
+    path = tmp_path / "log.xes"
+    write_xes(path)
+    filog_towrite, _, _, caseid_dict, partialorders = analyse(path, mode, scope)
+    log = export_frame(filog_towrite, caseid_dict, partialorders)
+
+    streamed, exported = tmp_path / "streamed.xes", tmp_path / "exported.xes"
+    cco_writers.write_xes_streaming(log.copy(), str(streamed))
+    with contextlib.redirect_stderr(io.StringIO()):
+        cco_writers.write_xes_and_drop_NaNs(log.copy(), str(exported))
+
+    def lines(path):
+        # extensions are listed in a fixed order by the streaming writer, in hash order by pm4py
+        content = path.read_text().splitlines()
+        extensions = sorted(line for line in content if "<extension" in line)
+        return [line for line in content if "<extension" not in line], extensions
+
+    assert lines(streamed) == lines(exported)
+    assert "org:resource" in streamed.read_text()
+
+
+def keep_one_representative(log, caseids_variant, multiplicity):
+    """keepOneRepresentativeAndMultiplicity before the reductions were rewritten with a single mask."""
+
+    if multiplicity == 0:
+        multiplicity = 1
+    log.loc[log["case:concept:name"] == caseids_variant[0], "case:multiplicity"] = multiplicity
+    caseids_variant.pop(0)
+    return log[~log["case:concept:name"].isin(caseids_variant)]
+
+
+def reduce_seq_variants_per_variant(log, mode, scope, vars, vars_wlc, caseid_dict):
+    if mode == "lifecycle" and scope == "tracewise":
+        vars = vars_wlc
+    for v in vars:
+        caseids = caseid_dict[v]
+        caseid_dict[v] = [caseids[0]]
+        log = keep_one_representative(log, caseids, vars[v])
+    return log, caseid_dict
+
+
+def reduce_po_variants_per_variant(log):
+    for po_name in log["case:po_name"].unique():
+        caseids = log.loc[log["case:po_name"] == po_name, "case:concept:name"].unique().tolist()
+        if len(caseids) > 0:
+            multiplicity = sum(
+                log.loc[log["case:concept:name"] == caseid, "case:multiplicity"].unique()[0]
+                for caseid in caseids
+            )
+            log = keep_one_representative(log, caseids, multiplicity)
+    return log
+
+
+@pytest.mark.parametrize("mode, scope", [("alpha", "logwise"), ("lifecycle", "tracewise")])
+def test_reductions_match_per_variant_reductions(tmp_path, mode, scope):
+    path = tmp_path / "log.xes"
+    write_xes(path)
+    filog_towrite, vars, vars_wlc, caseid_dict, partialorders = analyse(path, mode, scope)
+
+    reduced, reduced_caseids = cco_preparators.reduce_log_seq_variants(
+        filog_towrite.copy(), mode, scope, vars, vars_wlc, deepcopy(caseid_dict)
+    )
+    expected, expected_caseids = reduce_seq_variants_per_variant(
+        filog_towrite.copy(), mode, scope, vars, vars_wlc, deepcopy(caseid_dict)
+    )
+    assert reduced_caseids == expected_caseids
+    assert_frame_equal(reduced, expected)
+    assert sorted(reduced.groupby("case:concept:name")["case:multiplicity"].first().tolist()) == [1, 2]
+
+    reduced = cco_transformer.write_partial_orders(reduced, partialorders, reduced_caseids)
+    expected = cco_transformer.write_partial_orders(expected, partialorders, expected_caseids)
+    assert_frame_equal(
+        cco_preparators.reduce_log_po_variants(reduced), reduce_po_variants_per_variant(expected)
+    )
@@ -0,0 +1,45 @@
+import numpy as np
+
+from Concurrent import ActivityAlphabet, Concurrent, ConcurrencyMatrix
+
+
+def test_concurrency_matrix_is_compatible_with_concurrent():
+    concurrent = Concurrent()
+    concurrent.add_pair("a", "b")
+    concurrent.add_pair("c", "c")
+    concurrent.add_pair("b", "d")
+
+    relation = ConcurrencyMatrix.from_concurrent(concurrent)
+
+    assert len(relation) == len(concurrent)
+    assert relation.to_concurrent() == concurrent
+    assert sorted(relation.to_tuples()) == sorted(concurrent.to_tuples())
+    assert relation.is_concurrent("b", "a")
+    assert relation.is_concurrent("c", "c")
+    assert not relation.is_concurrent("a", "d")
+    assert not relation.is_concurrent("a", "unknown")
+
+
+def test_concurrency_matrix_lookups():
+    alphabet = ActivityAlphabet(["a", "b", "c"])
+    relation = ConcurrencyMatrix(alphabet)
+    relation.add_pair("a", "c")
+
+    assert list(relation.row("a")) == [False, False, True]
+    assert list(alphabet.encode(("c", "x", "a"))) == [2, -1, 0]
+    assert np.array_equal(
+        relation.submatrix(("c", "x", "a")),
+        [[False, False, True], [False, False, False], [True, False, False]],
+    )
+
+
+def test_concurrency_matrix_follows_a_shared_alphabet():
+    alphabet = ActivityAlphabet()
+    relation = ConcurrencyMatrix(alphabet)
+    relation.add_pair("a", "b")
+    alphabet.code("c")  # e.g. by another relation over the same alphabet
+
+    assert not relation.is_concurrent("a", "c")
+    assert list(relation.row("c")) == [False, False, False]
+    assert list(relation.row("a")) == [False, True, False]
+    assert not relation.submatrix(("a", "c")).any()